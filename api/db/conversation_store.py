@@ -0,0 +1,41 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+SESSION_TTL_SECONDS = 3600  # 1 hour
+
+
+class ConversationStore:
+    """
+    Append-only storage for a single conversation's history in Redis.
+
+    History items live in a Redis list (one JSON document per item) and the small
+    amount of per-conversation metadata (e.g. the last active agent) lives in a hash,
+    so a turn only ever writes the items it added instead of the whole history.
+    """
+
+    def __init__(self, redis: Redis, user_id: str, conversation_id: str):
+        self.redis = redis
+        base_key = f"user_session:{user_id}:{conversation_id}"
+        self.items_key = f"{base_key}:items"
+        self.meta_key = f"{base_key}:meta"
+
+    async def load(self) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Loads the history and the last agent name in a single pipelined round trip."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.lrange(self.items_key, 0, -1)
+            pipe.hget(self.meta_key, "last_agent_name")
+            raw_items, last_agent_name = await pipe.execute()
+
+        return [json.loads(item) for item in raw_items], last_agent_name
+
+    async def append(self, new_items: List[Dict[str, Any]], last_agent_name: str):
+        """Appends only the items produced by the latest turn and refreshes the TTL."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if new_items:
+                pipe.rpush(self.items_key, *[json.dumps(item) for item in new_items])
+            pipe.hset(self.meta_key, "last_agent_name", last_agent_name)
+            pipe.expire(self.items_key, SESSION_TTL_SECONDS)
+            pipe.expire(self.meta_key, SESSION_TTL_SECONDS)
+            await pipe.execute()
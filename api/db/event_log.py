@@ -0,0 +1,93 @@
+from typing import AsyncIterator, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from core.config import get_settings
+
+settings = get_settings()
+
+END_EVENTS = {"end"}
+
+
+class ConversationEventLog:
+    """
+    Bounded, per-conversation Redis stream holding the events of agent runs.
+
+    Runs publish into the stream independently of any HTTP connection and SSE
+    clients tail it, so a client can drop and resume from its `Last-Event-ID`.
+    """
+
+    def __init__(self, redis: Redis, user_id: str, conversation_id: str):
+        self.redis = redis
+        self.stream_key = f"chat_events:{user_id}:{conversation_id}"
+        self.run_lock_key = f"{self.stream_key}:run_lock"
+        self.run_start_key = f"{self.stream_key}:run_start"
+
+    async def acquire_run(self, run_id: str) -> bool:
+        """Marks a run as in progress. Returns False if another run already holds the conversation."""
+        return bool(
+            await self.redis.set(
+                self.run_lock_key, run_id, nx=True, ex=settings.CHAT_RUN_LOCK_TTL_SECONDS
+            )
+        )
+
+    async def release_run(self, run_id: str):
+        if await self.redis.get(self.run_lock_key) == run_id:
+            await self.redis.delete(self.run_lock_key)
+
+    async def is_running(self) -> bool:
+        return bool(await self.redis.exists(self.run_lock_key))
+
+    async def begin_run(self) -> str:
+        """
+        Records where the new run starts in the stream and returns that position.
+        Tailing from it yields exactly the events of the new run.
+        """
+        last_entry = await self.redis.xrevrange(self.stream_key, count=1)
+        start_id = last_entry[0][0] if last_entry else "0-0"
+        await self.redis.set(
+            self.run_start_key, start_id, ex=settings.CHAT_EVENT_LOG_TTL_SECONDS
+        )
+        return start_id
+
+    async def latest_run_start(self) -> Optional[str]:
+        return await self.redis.get(self.run_start_key)
+
+    async def publish(self, event: str, payload: str) -> str:
+        """Appends a serialized event to the stream and returns its entry ID."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(
+                self.stream_key,
+                {"event": event, "payload": payload},
+                maxlen=settings.CHAT_EVENT_LOG_MAXLEN,
+                approximate=True,
+            )
+            pipe.expire(self.stream_key, settings.CHAT_EVENT_LOG_TTL_SECONDS)
+            entry_id, _ = await pipe.execute()
+        return entry_id
+
+    async def tail(self, last_id: str) -> AsyncIterator[List[Tuple[str, str, str]]]:
+        """
+        Yields batches of `(entry_id, event, payload)` after `last_id` until the run's end
+        event. Stops early if nothing arrives and no run is in progress (e.g. the log expired).
+        """
+        while True:
+            response = await self.redis.xread(
+                {self.stream_key: last_id}, count=100, block=settings.CHAT_EVENT_TAIL_BLOCK_MS
+            )
+            if not response:
+                if await self.is_running():
+                    continue
+                # The run may have finished between the read and the check; drain once more.
+                response = await self.redis.xread({self.stream_key: last_id}, count=100)
+                if not response:
+                    return
+
+            batch = []
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id
+                batch.append((entry_id, fields["event"], fields["payload"]))
+                if fields["event"] in END_EVENTS:
+                    yield batch
+                    return
+            yield batch
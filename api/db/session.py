@@ -1,5 +1,11 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from core.config import get_settings
+from core.metrics import metrics
 
 settings = get_settings()
 
@@ -13,12 +19,90 @@ engine = create_engine(
     connect_args=settings.DB_CONNECT_ARGS,
 )
 
+def _build_async_url(database_url: str):
+    """
+    Converts the sync DATABASE_URL into an asyncpg URL. asyncpg does not understand
+    libpq's `sslmode` query parameter, so it is moved into the connect args instead.
+    """
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    connect_args = dict(settings.ASYNC_DB_CONNECT_ARGS)
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        connect_args["ssl"] = sslmode
+        url = url.difference_update_query(["sslmode"])
+    return url, connect_args
+
+_async_url, _async_connect_args = _build_async_url(settings.DATABASE_URL)
+
+# Separate pool for the async (event loop) side of the app: chat streams and agent tools.
+async_engine = create_async_engine(
+    _async_url,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_timeout=settings.ASYNC_DB_POOL_TIMEOUT,
+    connect_args=_async_connect_args,
+)
+
+async_session_maker = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 def get_db_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_db_session():
+    """
+    FastAPI dependency to get an AsyncSession from the async connection pool.
+    """
+    async with async_session_maker() as session:
+        yield session
+
+def _pool_stats(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+metrics.register_gauge_callback("db_pool.sync", lambda: _pool_stats(engine.pool))
+metrics.register_gauge_callback("db_pool.async", lambda: _pool_stats(async_engine.pool))
+
+def _dedupe_appointment_event_ids(connection):
+    """Keeps the earliest row per Google event ID; older write-behind code could insert one twice."""
+    result = connection.execute(text(
+        "DELETE FROM appointment WHERE id NOT IN "
+        "(SELECT MIN(id) FROM appointment GROUP BY google_calendar_event_id)"
+    ))
+    if result.rowcount:
+        print(f"INFO:     Removed {result.rowcount} duplicate appointment rows before adding the event ID index.")
+
+# Data fixes that must run before an index can be added to an existing table
+_INDEX_MIGRATIONS = {
+    "ix_appointment_google_calendar_event_id": _dedupe_appointment_event_ids,
+}
+
 def create_db_and_tables():
     """
     Utility function to create database tables.
     """
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    # create_all skips existing tables, so add indexes that were introduced after a table was created.
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with engine.begin() as connection:
+                    migration = _INDEX_MIGRATIONS.get(index.name)
+                    if migration:
+                        migration(connection)
+                    index.create(connection)
+            except Exception as e:
+                # Boot anyway: a missing index should not take the whole API down.
+                print(f"❌ DATABASE ERROR: Could not create index {index.name} on {table.name}: {e}")
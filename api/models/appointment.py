@@ -1,9 +1,17 @@
 from typing import Optional
 from datetime import datetime, timezone
 from sqlmodel import Field, SQLModel
-from sqlalchemy import func, Column, DateTime
+from sqlalchemy import func, Column, DateTime, Index
 
 class Appointment(SQLModel, table=True):
+    __table_args__ = (
+        # Serves per-doctor schedule range queries (dashboard, doctor digests)
+        Index("ix_appointment_doctor_email_start_time", "doctor_email", "start_time"),
+        # Idempotency key for write-behind inserts (ON CONFLICT target). Declared as an index so
+        # `create_db_and_tables` also adds it to tables created before it existed.
+        Index("ix_appointment_google_calendar_event_id", "google_calendar_event_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_name: str
     patient_email: str
@@ -0,0 +1,11 @@
+from typing import Optional
+from pydantic import BaseModel
+
+# --- Pydantic Models for API Contract ---
+class ChatRequest(BaseModel):
+    user_message: str
+    conversation_id: Optional[str] = None
+
+class StreamEvent(BaseModel):
+    event: str
+    data: dict
@@ -0,0 +1,46 @@
+from typing import Optional
+from datetime import datetime, timezone
+from sqlmodel import Field, SQLModel
+from sqlalchemy import func, Column, DateTime, Text
+
+# Delivery states of an outbox row
+EMAIL_QUEUED = "queued"
+EMAIL_SENDING = "sending"
+EMAIL_SENT = "sent"
+EMAIL_DEAD = "dead"  # Gave up after a permanent error or too many attempts
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class EmailOutbox(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    dedupe_key: str = Field(unique=True) # e.g. "booking_confirmation:<event id>"; re-queueing is a no-op
+    google_calendar_event_id: Optional[str] = Field(default=None, index=True) # The appointment the email is about
+
+    kind: str
+    recipient: str
+    subject: str
+    html_body: str = Field(sa_column=Column(Text, nullable=False))
+    text_body: Optional[str] = Field(sa_column=Column(Text), default=None) # Plain-text alternative
+
+    status: str = Field(default=EMAIL_QUEUED, index=True)
+    attempts: int = 0
+    last_error: Optional[str] = None
+    provider_status_code: Optional[int] = None
+
+    # When the row may next be picked up. While a worker is sending it, this is the end
+    # of its lease, after which another worker may retry it.
+    next_attempt_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), index=True, nullable=False),
+        default_factory=_utcnow,
+    )
+    sent_at: Optional[datetime] = Field(
+        sa_column=Column(DateTime(timezone=True)),
+        default=None,
+    )
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), server_default=func.now()),
+        default=None,
+    )
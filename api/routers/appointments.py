@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, List, Optional
 from datetime import date
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from api.db.session import get_db_session
+from api.db.session import get_db_session, get_async_db_session
 from api.security.auth import get_current_user, User
 from api.models.appointment import Appointment
+from api.workers.email_outbox import get_delivery_statuses
 
 router = APIRouter()
 
@@ -30,4 +32,26 @@ def get_doctor_appointments(
     statement = statement.order_by(Appointment.start_time.asc())
     
     appointments = db.exec(statement).all()
-    return appointments
\ No newline at end of file
+    return appointments
+
+
+@router.get("/{appointment_id}/emails", response_model=List[Dict[str, Any]])
+async def get_appointment_email_statuses(
+    appointment_id: int,
+    db: AsyncSession = Depends(get_async_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns the delivery status (queued, sending, sent or dead) of every email
+    sent about one of the authenticated doctor's appointments.
+    """
+    statement = (
+        select(Appointment)
+        .where(Appointment.id == appointment_id)
+        .where(Appointment.doctor_email == current_user.email)
+    )
+    appointment = (await db.exec(statement)).one_or_none()
+    if appointment is None:
+        raise HTTPException(status_code=404, detail="Appointment not found.")
+
+    return await get_delivery_statuses(appointment.google_calendar_event_id)
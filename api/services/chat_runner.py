@@ -0,0 +1,238 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Set
+
+from agents import (
+    Agent,
+    Runner,
+    RunResultStreaming,
+    ToolCallItem,
+    ToolCallOutputItem,
+)
+
+from openai.types.responses import ResponseTextDeltaEvent
+
+from dental_agents import receptionist_agent, scheduler_agent, canceling_agent, AssistantContext
+from dental_agents.faq_cache import FaqMatch, faq_cache
+from dental_agents.history import compact_history
+from dental_agents.intent_router import BOOK_INTENT, CANCEL_INTENT, RESCHEDULE_INTENT, IntentRouter, intent_router
+from api.db.cache import redis_pool
+from api.db.conversation_store import ConversationStore
+from api.db.event_log import ConversationEventLog
+from api.db.session import async_session_maker
+from api.services.sse import TextDeltaCoalescer, encode_event
+from api.security.auth import User
+from api.workers.appointment_writer import enqueue_appointment
+from core.config import get_settings
+from core.metrics import metrics
+from tools.calendar_tools import create_appointment as create_appointment_tool
+
+settings = get_settings()
+
+# --- Agent Registry & State ---
+AGENTS_REGISTRY: Dict[str, Agent] = {
+    receptionist_agent.name: receptionist_agent,
+    scheduler_agent.name: scheduler_agent,
+    canceling_agent.name: canceling_agent
+}
+DEFAULT_AGENT_NAME = receptionist_agent.name
+
+# Agents the intent router may hand a conversation to directly, skipping the receptionist.
+INTENT_AGENTS: Dict[str, Agent] = {
+    BOOK_INTENT: scheduler_agent,
+    CANCEL_INTENT: canceling_agent,
+    RESCHEDULE_INTENT: canceling_agent,
+}
+
+# Strong references to in-flight runs so they are not garbage collected mid-run.
+_active_runs: Set[asyncio.Task] = set()
+
+
+class RunInProgressError(Exception):
+    """Raised when a conversation already has an agent run in progress."""
+
+
+def format_sse(entry_id: str, payload: str) -> str:
+    return "id: " + entry_id + "\ndata: " + payload + "\n\n"
+
+
+async def start_run(
+    user: User,
+    conversation_id: str,
+    user_message: str,
+    is_new_conversation: bool,
+) -> str:
+    """
+    Starts an agent run as a background task that publishes into the conversation's
+    event log. Returns the stream position from which the run's events can be tailed.
+    """
+    event_log = ConversationEventLog(redis_pool, user.id, conversation_id)
+    run_id = uuid.uuid4().hex
+    if not await event_log.acquire_run(run_id):
+        raise RunInProgressError(conversation_id)
+
+    start_id = await event_log.begin_run()
+    task = asyncio.create_task(
+        _execute_run(event_log, run_id, user, conversation_id, user_message, is_new_conversation)
+    )
+    _active_runs.add(task)
+    task.add_done_callback(_active_runs.discard)
+    return start_id
+
+
+async def wait_for_active_runs(timeout: float):
+    """Gives in-flight runs a chance to finish (and save their state) on shutdown."""
+    if _active_runs:
+        await asyncio.wait(set(_active_runs), timeout=timeout)
+
+
+async def _publish(event_log: ConversationEventLog, event: str, data: dict):
+    await event_log.publish(event, encode_event(event, data))
+
+
+async def _serve_faq_answer(
+    match: FaqMatch,
+    text_buffer: TextDeltaCoalescer,
+    conversation_store: ConversationStore,
+    user_message: str,
+):
+    """Streams a cached FAQ answer as ordinary text events and records the turn."""
+    started = time.perf_counter()
+    for line in match.entry.answer.splitlines(keepends=True):
+        await text_buffer.add(line)
+    await text_buffer.flush()
+
+    await conversation_store.append(
+        [{"role": "user", "content": user_message}, {"role": "assistant", "content": match.entry.answer}],
+        receptionist_agent.name,
+    )
+    metrics.observe("faq_cache_serve_seconds", time.perf_counter() - started)
+
+
+async def _execute_run(
+    event_log: ConversationEventLog,
+    run_id: str,
+    user: User,
+    conversation_id: str,
+    user_message: str,
+    is_new_conversation: bool,
+):
+    async def publish_text(payload: str):
+        await event_log.publish("text", payload)
+
+    text_buffer = TextDeltaCoalescer(
+        publish_text,
+        window_ms=settings.SSE_TEXT_COALESCE_WINDOW_MS,
+        max_bytes=settings.SSE_TEXT_COALESCE_MAX_BYTES,
+    )
+
+    try:
+        # Emit the conversation ID first if it's a new conversation
+        if is_new_conversation:
+            await _publish(event_log, "conversation_id", {"id": conversation_id})
+
+        conversation_store = ConversationStore(redis_pool, user.id, conversation_id)
+
+        # 1. Retrieve current state from Redis (single pipelined round trip)
+        message_history, last_agent_name = await conversation_store.load()
+        last_agent_name = last_agent_name or DEFAULT_AGENT_NAME
+        active_agent = AGENTS_REGISTRY.get(last_agent_name, AGENTS_REGISTRY[DEFAULT_AGENT_NAME])
+
+        # 2. Pre-route obvious booking/cancellation openings, saving the receptionist's LLM call
+        route = None
+        if intent_router and active_agent is receptionist_agent:
+            route = await intent_router.route(user_message)
+            if route:
+                active_agent = INTENT_AGENTS[route.intent]
+                await _publish(event_log, "handoff", {"new_agent": active_agent.name})
+
+        # 3. Answer common clinic questions from the FAQ cache without calling the LLM
+        if faq_cache and route is None and active_agent is receptionist_agent:
+            faq_match = faq_cache.lookup(user_message)
+            if faq_match:
+                await _serve_faq_answer(faq_match, text_buffer, conversation_store, user_message)
+                return
+
+        # 4. Compact the history to the active agent's token budget
+        user_item = {"role": "user", "content": user_message}
+        compacted_history = compact_history(message_history, active_agent.name).items
+        current_input = compacted_history + [user_item]
+
+        async with async_session_maker() as db:
+            dental_context = AssistantContext(db=db, user=user, conversation_id=conversation_id)
+            result: RunResultStreaming = Runner.run_streamed(
+                active_agent, current_input, context=dental_context
+            )
+
+            # Create a temporary map to store tool call names
+            tool_call_name_map: Dict[str, str] = {}
+
+            # Time-to-first-token is measured for every model call, per agent: from the
+            # run start, a handoff, or a tool result until the next raw response event.
+            current_agent_name = active_agent.name
+            awaiting_first_token_since = time.perf_counter()
+
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and awaiting_first_token_since is not None:
+                    metrics.observe(
+                        "llm_time_to_first_token_seconds",
+                        time.perf_counter() - awaiting_first_token_since,
+                        agent=current_agent_name,
+                    )
+                    awaiting_first_token_since = None
+
+                if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                    await text_buffer.add(event.data.delta)
+
+                elif event.type == "agent_updated_stream_event":
+                    current_agent_name = event.new_agent.name
+                    awaiting_first_token_since = time.perf_counter()
+                    await text_buffer.flush()
+                    await _publish(event_log, "handoff", {"new_agent": event.new_agent.name})
+
+                elif event.type == "run_item_stream_event":
+                    item = event.item
+                    if isinstance(item, ToolCallItem):
+                        await text_buffer.flush()
+                        tool_call_name_map[item.raw_item.call_id] = item.raw_item.name
+                        await _publish(event_log, "tool_start", item.raw_item.model_dump())
+
+                    elif isinstance(item, ToolCallOutputItem):
+                        awaiting_first_token_since = time.perf_counter()
+                        await text_buffer.flush()
+                        call_id = item.raw_item.get("call_id")
+                        await _publish(event_log, "tool_end", {"call_id": call_id, "output": str(item.output)})
+
+                        tool_name = tool_call_name_map.get(call_id)
+                        if tool_name == create_appointment_tool.name:
+                            tool_output = item.output
+                            if isinstance(tool_output, dict) and tool_output.get("status") == "success":
+                                # Persisted by the write-behind consumer, off the streaming path.
+                                details = tool_output.get("appointment_details", {})
+                                try:
+                                    await enqueue_appointment(redis_pool, details, user.id)
+                                except Exception as e:
+                                    print(f"❌ QUEUE ERROR: Failed to queue appointment for saving. Error: {e}")
+
+        await text_buffer.flush()
+
+        if route:
+            IntentRouter.record_outcome(route, active_agent.name, result.last_agent.name)
+
+        # After the run is complete, append only this turn's items to Redis.
+        # This happens whether or not a client is still attached to the stream.
+        # The stored history stays verbatim; compaction (and any handoff input filter)
+        # only applies to what the agent sees, so the run's input is never written back.
+        turn_items = [user_item] + [item.to_input_item() for item in result.new_items]
+        await conversation_store.append(turn_items, result.last_agent.name)
+    except Exception as e:
+        print(f"❌ AGENT RUN ERROR: Run {run_id} for conversation {conversation_id} failed. Error: {e}")
+        await text_buffer.flush()
+        await _publish(event_log, "error", {"message": "Something went wrong while generating a response."})
+    finally:
+        try:
+            # Signal the end of the stream
+            await _publish(event_log, "end", {})
+        finally:
+            await event_log.release_run(run_id)
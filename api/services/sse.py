@@ -0,0 +1,70 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, List, Optional
+
+from api.models.chat import StreamEvent
+from core.metrics import metrics
+
+
+def encode_text_event(delta: str) -> str:
+    """
+    Fast path for text deltas: builds the same JSON as `StreamEvent(...).model_dump_json()`
+    without instantiating or validating a pydantic model.
+    """
+    return '{"event":"text","data":{"delta":' + json.dumps(delta, ensure_ascii=False) + '}}'
+
+
+def encode_event(event: str, data: dict) -> str:
+    """Encodes any non-text event. These are rare, so the pydantic model is fine here."""
+    return StreamEvent(event=event, data=data).model_dump_json()
+
+
+class TextDeltaCoalescer:
+    """
+    Buffers consecutive text deltas and emits them as a single text event once the
+    buffer reaches `max_bytes` or has been open for `window_ms`, whichever comes first.
+    Callers must `flush()` before emitting any other event to preserve ordering.
+    """
+
+    def __init__(self, sink: Callable[[str], Awaitable[None]], window_ms: int, max_bytes: int):
+        self._sink = sink
+        self._window_seconds = window_ms / 1000
+        self._max_bytes = max_bytes
+        self._parts: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, delta: str):
+        if not delta:
+            return
+        metrics.incr("sse_text_deltas")
+        self._parts.append(delta)
+        self._size += len(delta.encode("utf-8"))
+
+        if self._size >= self._max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+
+    async def flush(self):
+        # Only a timer that is still sleeping is cancelled; one that is already
+        # emitting has cleared `_timer` and finishes under the lock.
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._emit()
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self._window_seconds)
+        self._timer = None
+        await self._emit()
+
+    async def _emit(self):
+        async with self._lock:
+            if not self._parts:
+                return
+            delta = "".join(self._parts)
+            self._parts, self._size = [], 0
+            metrics.incr("sse_text_events")
+            await self._sink(encode_text_event(delta))
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dateutil.parser import parse as date_parse
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from api.db.cache import redis_pool
+from api.db.session import async_session_maker
+from api.models.appointment import Appointment
+from core.config import get_settings
+from core.metrics import metrics
+
+settings = get_settings()
+
+STREAM_KEY = "appointments:write_behind"
+CONSUMER_GROUP = "appointment_writers"
+ATTEMPTS_KEY = "appointments:write_behind:attempts"  # Hash: entry ID -> times its row was rejected
+DEAD_LETTER_KEY = "appointments:write_behind:dead"  # List of JSON records for entries that were given up on
+
+# The database (not the row) is at fault: retry later without counting it against the row.
+_TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+
+async def enqueue_appointment(redis: Redis, details: Dict[str, Any], patient_supabase_id: str) -> str:
+    """
+    Queues an appointment created by the `create_appointment` tool for persistence.
+    Returns the Redis stream entry ID.
+    """
+    payload = {**details, "patient_supabase_id": patient_supabase_id}
+    entry_id = await redis.xadd(STREAM_KEY, {"payload": json.dumps(payload)})
+    metrics.incr("appointment_writer_enqueued")
+    return entry_id
+
+
+def _entry_age_seconds(entry_id: str) -> float:
+    """Stream IDs start with the millisecond timestamp at which they were added."""
+    millis = int(entry_id.split("-", 1)[0])
+    return max(0.0, time.time() - millis / 1000)
+
+
+def _to_appointment(payload: Dict[str, Any]) -> Appointment:
+    return Appointment(
+        patient_name=payload.get("patient_name"),
+        patient_email=payload.get("patient_email"),
+        patient_supabase_id=payload.get("patient_supabase_id"),
+        doctor_name=payload.get("doctor_name"),
+        doctor_email=payload.get("doctor_email"),
+        clinic_address=payload.get("clinic_address"),
+        service_type=payload.get("service_type"),
+        start_time=date_parse(payload.get("start_time")),
+        end_time=date_parse(payload.get("end_time")),
+        google_calendar_event_id=payload.get("google_calendar_event_id"),
+        google_calendar_event_link=payload.get("google_calendar_event_link"),
+    )
+
+
+class AppointmentWriter:
+    """
+    Batching consumer that drains the write-behind stream into the `Appointment` table.
+
+    Entries are read through a consumer group, inserted in bulk with `ON CONFLICT DO NOTHING`
+    on the event ID (so redelivery is harmless) and only acknowledged once committed. If a
+    batch fails, its rows are retried one at a time so a single bad row cannot hold up the
+    rest; a row rejected `APPOINTMENT_WRITER_MAX_ATTEMPTS` times is moved to a dead-letter list.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._retry_pending = True  # Re-read our own unacknowledged entries first
+
+    async def start(self):
+        try:
+            await self.redis.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the consumer loop and flushes everything still queued."""
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+        while await self.process_batch(block_ms=None):
+            pass
+        await self.update_lag_metrics()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await self._claim_abandoned()
+                await self.process_batch(block_ms=settings.APPOINTMENT_WRITER_BLOCK_MS)
+                await self.update_lag_metrics()
+            except Exception as e:
+                print(f"❌ APPOINTMENT WRITER ERROR: {e}")
+                await asyncio.sleep(1)
+
+    async def _claim_abandoned(self):
+        """Takes over entries left pending by consumers that died mid-batch."""
+        _, claimed, *_ = await self.redis.xautoclaim(
+            STREAM_KEY,
+            CONSUMER_GROUP,
+            self.consumer_name,
+            min_idle_time=settings.APPOINTMENT_WRITER_CLAIM_IDLE_MS,
+            count=settings.APPOINTMENT_WRITER_BATCH_SIZE,
+        )
+        if claimed:
+            self._retry_pending = True
+
+    async def process_batch(self, block_ms: Optional[int]) -> int:
+        """Reads, persists and acknowledges one batch. Returns the number of entries handled."""
+        entries = []
+        if self._retry_pending:
+            entries = await self._read("0", block_ms=None)
+            self._retry_pending = bool(entries)
+        if not entries:
+            entries = await self._read(">", block_ms=block_ms)
+        if not entries:
+            return 0
+
+        parsed: List[Tuple[str, Dict[str, str], Appointment]] = []
+        dead: List[Tuple[str, Dict[str, str], str]] = []
+        for entry_id, fields in entries:
+            try:
+                parsed.append((entry_id, fields, _to_appointment(json.loads(fields["payload"]))))
+            except Exception as e:
+                # A malformed entry can never succeed; set it aside instead of blocking the queue.
+                dead.append((entry_id, fields, f"Malformed entry: {e}"))
+
+        started = time.perf_counter()
+        try:
+            written = await self._write([row for _, _, row in parsed])
+            done = [entry_id for entry_id, _, _ in parsed]
+        except _TRANSIENT_ERRORS as e:
+            print(f"❌ DATABASE ERROR: Failed to save appointment batch. Error: {e}")
+            metrics.incr("appointment_writer_failures")
+            written, done = 0, []
+        except Exception as e:
+            print(f"❌ DATABASE ERROR: Failed to save appointment batch, retrying row by row. Error: {e}")
+            metrics.incr("appointment_writer_failures")
+            written, done, rejected = await self._write_individually(parsed)
+            dead += rejected
+
+        await self._finish(done, dead)
+        if len(done) + len(dead) < len(entries):
+            # The rest stay pending and are re-read first next round.
+            self._retry_pending = True
+            await asyncio.sleep(1)
+        metrics.observe("appointment_writer_batch_seconds", time.perf_counter() - started)
+        metrics.incr("appointment_writer_written", written)
+        return len(done) + len(dead)
+
+    async def _write_individually(
+        self, parsed: List[Tuple[str, Dict[str, str], Appointment]]
+    ) -> Tuple[int, List[str], List[Tuple[str, Dict[str, str], str]]]:
+        """
+        Writes rows one by one after a failed batch. Returns (rows written, entry IDs done,
+        entries to dead-letter). Rows that fail but have attempts left stay pending.
+        """
+        written, done, dead = 0, [], []
+        for index, (entry_id, fields, row) in enumerate(parsed):
+            try:
+                written += await self._write([row])
+                done.append(entry_id)
+            except _TRANSIENT_ERRORS as e:
+                print(f"❌ DATABASE ERROR: Database unavailable, will retry {len(parsed) - index} appointment(s). Error: {e}")
+                break
+            except Exception as e:
+                attempts = await self.redis.hincrby(ATTEMPTS_KEY, entry_id, 1)
+                if attempts >= settings.APPOINTMENT_WRITER_MAX_ATTEMPTS:
+                    dead.append((entry_id, fields, f"{type(e).__name__}: {e}"))
+                else:
+                    print(f"❌ DATABASE ERROR: Appointment entry {entry_id} rejected (attempt {attempts}). Error: {e}")
+        return written, done, dead
+
+    async def _finish(self, done: List[str], dead: List[Tuple[str, Dict[str, str], str]]):
+        """Acknowledges handled entries, moving the dead ones to the dead-letter list in the same transaction."""
+        entry_ids = done + [entry_id for entry_id, _, _ in dead]
+        if not entry_ids:
+            return
+        for entry_id, _, error in dead:
+            print(f"❌ APPOINTMENT WRITER: Dead-lettering entry {entry_id}. Error: {error}")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if dead:
+                pipe.rpush(DEAD_LETTER_KEY, *(
+                    json.dumps({"entry_id": entry_id, "payload": fields.get("payload"), "error": error, "failed_at": time.time()})
+                    for entry_id, fields, error in dead
+                ))
+            pipe.xack(STREAM_KEY, CONSUMER_GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            pipe.hdel(ATTEMPTS_KEY, *entry_ids)
+            await pipe.execute()
+        if dead:
+            metrics.incr("appointment_writer_dead_lettered", len(dead))
+
+    async def _read(self, read_id: str, block_ms: Optional[int]):
+        response = await self.redis.xreadgroup(
+            CONSUMER_GROUP,
+            self.consumer_name,
+            {STREAM_KEY: read_id},
+            count=settings.APPOINTMENT_WRITER_BATCH_SIZE,
+            block=block_ms,
+        )
+        return response[0][1] if response else []
+
+    async def _write(self, rows: List[Appointment]) -> int:
+        if not rows:
+            return 0
+        # Deduplicate inside the batch; the unique event ID index skips rows already persisted.
+        unique_rows = {row.google_calendar_event_id: row for row in rows}
+        statement = insert(Appointment).values([
+            row.model_dump(exclude={"id", "created_at"}) for row in unique_rows.values()
+        ]).on_conflict_do_nothing(index_elements=["google_calendar_event_id"])
+        async with async_session_maker() as session:
+            result = await session.execute(statement)
+            await session.commit()
+        return max(result.rowcount, 0)
+
+    async def update_lag_metrics(self):
+        """Publishes backlog size and the age of the oldest unwritten appointment."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xlen(STREAM_KEY)
+            pipe.xrange(STREAM_KEY, count=1)
+            pipe.llen(DEAD_LETTER_KEY)
+            backlog, oldest, dead_letters = await pipe.execute()
+        lag_seconds = _entry_age_seconds(oldest[0][0]) if oldest else 0.0
+        metrics.set_gauge("appointment_writer_backlog", backlog)
+        metrics.set_gauge("appointment_writer_lag_seconds", lag_seconds)
+        metrics.set_gauge("appointment_writer_dead_letters", dead_letters)
+
+
+appointment_writer = AppointmentWriter(redis_pool)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import pytz
+from googleapiclient.errors import HttpError
+from redis.asyncio import Redis
+
+from api.db.cache import redis_pool
+from core.config import get_settings, clinic_config
+from core.metrics import metrics
+from tools.calendar_mirror import CalendarMirror, calendar_mirror
+from tools.calendar_tools import get_google_service
+from tools.google_client import run_calendar_call
+
+settings = get_settings()
+
+
+class CalendarSyncWorker:
+    """
+    Keeps the local free/busy mirror up to date with each doctor's Google Calendar.
+
+    The first sync lists every event inside the mirror's horizon and stores the returned
+    sync token; later syncs only fetch changes since that token. When Google expires a
+    token (HTTP 410) the calendar is wiped and fully re-synced. A short Redis lock per
+    calendar makes sure only one API process syncs a given calendar at a time.
+    """
+
+    def __init__(self, redis: Redis, mirror: CalendarMirror):
+        self.redis = redis
+        self.mirror = mirror
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            await self.sync_all()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.CALENDAR_SYNC_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def sync_all(self):
+        await asyncio.gather(*(self._sync_doctor(doctor) for doctor in clinic_config['doctors']))
+
+    async def _sync_doctor(self, doctor: Dict[str, Any]):
+        calendar_id = doctor['calendar_id']
+        lock_key = f"calendar_sync_lock:{calendar_id}"
+        acquired = await self.redis.set(lock_key, self.owner, nx=True, ex=settings.CALENDAR_SYNC_LOCK_SECONDS)
+        if not acquired:
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.sync_calendar(doctor)
+            metrics.observe("calendar_sync_seconds", time.perf_counter() - started)
+        except Exception as e:
+            print(f"❌ CALENDAR SYNC ERROR for {doctor['email']}: {e}")
+            metrics.incr("calendar_sync_failures")
+        finally:
+            if await self.redis.get(lock_key) == self.owner:
+                await self.redis.delete(lock_key)
+
+    async def sync_calendar(self, doctor: Dict[str, Any]):
+        """Runs one incremental sync, falling back to a full sync without a valid token."""
+        calendar_id = doctor['calendar_id']
+        sync_token = await self.mirror.get_sync_token(calendar_id)
+        if sync_token:
+            try:
+                await self._sync_pages(doctor, sync_token)
+                return
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print(f"INFO:     Sync token for {doctor['email']} expired; running a full calendar sync.")
+
+        metrics.incr("calendar_sync_full_resyncs")
+        await self.mirror.reset(calendar_id)
+        await self._sync_pages(doctor, None)
+
+    async def _sync_pages(self, doctor: Dict[str, Any], sync_token: Optional[str]):
+        calendar_id = doctor['calendar_id']
+        service = get_google_service(doctor['email'], clinic_config['general_config']['google_api_scopes_calendar'])
+        tz = pytz.timezone(clinic_config['general_config']['default_timezone'])
+
+        page_token = None
+        while True:
+            params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500}
+            if sync_token:
+                params["syncToken"] = sync_token
+            else:
+                # Expanding every recurring event since the calendar began is slow, and the old
+                # instances would be pruned anyway. Google rejects timeMin with a sync token.
+                params["timeMin"] = self.mirror.horizon(datetime.now(pytz.utc)).isoformat()
+            if page_token:
+                params["pageToken"] = page_token
+            page = await run_calendar_call(doctor['email'], lambda: service.events().list(**params).execute())
+
+            events = page.get('items', [])
+            await self.mirror.apply_events(calendar_id, events, tz)
+            metrics.incr("calendar_sync_events", len(events))
+
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+        await self.mirror.prune(calendar_id, datetime.now(pytz.utc))
+        await self.mirror.mark_synced(calendar_id, page.get('nextSyncToken'))
+
+
+calendar_sync_worker = CalendarSyncWorker(redis_pool, calendar_mirror)
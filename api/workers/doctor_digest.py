@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import socket
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+import pytz
+from redis.asyncio import Redis
+from sqlmodel import select
+
+from api.db.cache import redis_pool
+from api.db.session import async_session_maker
+from api.models.appointment import Appointment
+from core.config import get_settings, clinic_config
+from core.email_client import send_mail, sendgrid_integration
+from core.metrics import metrics
+from tools.email_templates import DOCTOR_DIGEST, render_email
+
+settings = get_settings()
+
+LAST_SENT_KEY = "doctor_digest:last_sent"  # Hash of doctor email -> epoch seconds of their last digest
+LOCK_KEY = "doctor_digest_lock"
+
+# SendGrid limits for one mail/send request
+_MAX_PERSONALIZATIONS = 1000
+_MAX_SUBSTITUTION_BYTES = 10000  # Per personalization
+
+_HTML_TAG = "-digest_html-"
+_TEXT_TAG = "-digest_text-"
+
+
+def _period_length() -> timedelta:
+    return timedelta(hours=1) if settings.DOCTOR_DIGEST_FREQUENCY == "hourly" else timedelta(days=1)
+
+
+def current_period_start(now: datetime, tz) -> datetime:
+    """The start of the digest period `now` falls in, in the clinic's timezone."""
+    if settings.DOCTOR_DIGEST_FREQUENCY == "hourly":
+        return now.replace(minute=0, second=0, microsecond=0)
+    day = now.date() if now.hour >= settings.DOCTOR_DIGEST_HOUR else now.date() - timedelta(days=1)
+    return tz.localize(datetime.combine(day, time(hour=settings.DOCTOR_DIGEST_HOUR)))
+
+
+def _period_label(start: datetime, end: datetime) -> str:
+    if settings.DOCTOR_DIGEST_FREQUENCY == "hourly":
+        return f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}"
+    return start.strftime("%A, %B %d")
+
+
+def _booking_row(appointment: Appointment, tz) -> Dict[str, str]:
+    return {
+        "when": appointment.start_time.astimezone(tz).strftime("%a, %b %d at %I:%M %p"),
+        "patient_name": appointment.patient_name,
+        "patient_email": appointment.patient_email,
+        "service_type": appointment.service_type,
+    }
+
+
+class DoctorDigestWorker:
+    """
+    Sends each doctor a periodic (daily or hourly) summary instead of one email per booking.
+
+    A digest lists the appointments booked since the doctor's previous digest and their
+    schedule for the coming period. All doctors are covered by a single range query on the
+    (doctor_email, start_time) index, and the digests go out in as few SendGrid requests as
+    possible, one personalization per doctor. A doctor's last digest time is recorded only
+    after SendGrid accepts it, so a failed send is retried on the next check.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                # One instance sends the digests; the others skip this round.
+                if await self.redis.set(LOCK_KEY, self.owner, nx=True, ex=settings.DOCTOR_DIGEST_LOCK_SECONDS):
+                    try:
+                        await self.send_due_digests()
+                    finally:
+                        if await self.redis.get(LOCK_KEY) == self.owner:
+                            await self.redis.delete(LOCK_KEY)
+            except Exception as e:
+                print(f"❌ DOCTOR DIGEST ERROR: {e}")
+                metrics.incr("doctor_digest_failures")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.DOCTOR_DIGEST_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def send_due_digests(self) -> int:
+        """Sends the current period's digest to every doctor who has not had it yet. Returns the number sent."""
+        tz = pytz.timezone(clinic_config['general_config']['default_timezone'])
+        now = datetime.now(tz)
+        period_start = current_period_start(now, tz)
+        period_end = period_start + _period_length()
+
+        doctors = {doctor['email']: doctor for doctor in clinic_config['doctors']}
+        last_sent = await self.redis.hgetall(LAST_SENT_KEY)
+        due = [email for email in doctors if float(last_sent.get(email, 0)) < period_start.timestamp()]
+        if not due:
+            return 0
+
+        # One query for every due doctor: their future appointments, served by the composite index.
+        statement = (
+            select(Appointment)
+            .where(Appointment.doctor_email.in_(due))
+            .where(Appointment.start_time >= period_start)
+            .order_by(Appointment.doctor_email, Appointment.start_time)
+        )
+        async with async_session_maker() as session:
+            appointments = (await session.exec(statement)).all()
+
+        by_doctor: Dict[str, List[Appointment]] = {email: [] for email in due}
+        for appointment in appointments:
+            by_doctor[appointment.doctor_email].append(appointment)
+
+        personalizations = []
+        skipped = []
+        for email in due:
+            since = datetime.fromtimestamp(float(last_sent[email]), tz) if email in last_sent else period_start - _period_length()
+            new_bookings = [_booking_row(a, tz) for a in by_doctor[email] if a.created_at and a.created_at >= since]
+            upcoming = [_booking_row(a, tz) for a in by_doctor[email] if a.start_time < period_end]
+            if not new_bookings and not upcoming:
+                skipped.append(email)
+                continue
+            digest = render_email(
+                DOCTOR_DIGEST,
+                doctor_name=doctors[email]['name'],
+                new_bookings=new_bookings,
+                upcoming=upcoming,
+                since=since.strftime("%b %d, %I:%M %p"),
+                period_label=_period_label(period_start, period_end),
+            )
+            personalizations.append({
+                "to": [{"email": email, "name": doctors[email]['name']}],
+                "subject": f"Your appointment digest for {_period_label(period_start, period_end)}",
+                "substitutions": {_HTML_TAG: digest.html, _TEXT_TAG: digest.text},
+            })
+
+        sent = 0
+        for batch in self._batches(personalizations):
+            await self._send(batch)
+            await self.redis.hset(
+                LAST_SENT_KEY,
+                mapping={p["to"][0]["email"]: now.timestamp() for p in batch},
+            )
+            sent += len(batch)
+        if skipped:
+            # Nothing to report this period; don't look at these doctors again until the next one.
+            await self.redis.hset(LAST_SENT_KEY, mapping={email: now.timestamp() for email in skipped})
+
+        metrics.incr("doctor_digest_sent", sent)
+        return sent
+
+    @staticmethod
+    def _batches(personalizations: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Groups digests into as few requests as SendGrid allows. A digest too large for a
+        substitution is sent on its own with its body inlined.
+        """
+        batches, current = [], []
+        for personalization in personalizations:
+            if len(json.dumps(personalization["substitutions"]).encode()) > _MAX_SUBSTITUTION_BYTES:
+                batches.append([personalization])
+                continue
+            current.append(personalization)
+            if len(current) == _MAX_PERSONALIZATIONS:
+                batches.append(current)
+                current = []
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _send(self, batch: List[Dict[str, Any]]):
+        if len(batch) == 1:
+            # A single digest needs no substitutions, which also lifts their size limit.
+            substitutions = batch[0]["substitutions"]
+            personalizations = [{key: value for key, value in batch[0].items() if key != "substitutions"}]
+            content = [
+                {"type": "text/plain", "value": substitutions[_TEXT_TAG]},
+                {"type": "text/html", "value": substitutions[_HTML_TAG]},
+            ]
+        else:
+            personalizations = batch
+            content = [{"type": "text/plain", "value": _TEXT_TAG}, {"type": "text/html", "value": _HTML_TAG}]
+
+        payload = {
+            "from": {"email": settings.SENDGRID_FROM_EMAIL, "name": settings.SENDGRID_FROM_NAME},
+            "personalizations": personalizations,
+            "content": content,
+        }
+        response = await sendgrid_integration.run_async(lambda: send_mail(payload))
+        if not response.is_success:
+            raise RuntimeError(f"SendGrid rejected the digest batch ({response.status_code}): {response.text[:500]}")
+        metrics.incr("doctor_digest_requests")
+
+
+doctor_digest_worker = DoctorDigestWorker(redis_pool)
@@ -0,0 +1,250 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from api.db.session import async_session_maker
+from api.models.email_outbox import EMAIL_DEAD, EMAIL_QUEUED, EMAIL_SENDING, EMAIL_SENT, EmailOutbox
+from core.config import get_settings
+from core.email_client import deliver_email, sendgrid_integration
+from core.integrations import CircuitOpenError
+from core.metrics import metrics
+
+settings = get_settings()
+
+
+async def enqueue_emails(messages: List[Dict[str, Any]]) -> int:
+    """
+    Durably queues rendered emails for delivery. Each message needs `dedupe_key`, `kind`,
+    `recipient`, `subject` and `html_body`, and may carry a `text_body` and the
+    `google_calendar_event_id` it is about. Messages whose dedupe key is already queued or
+    sent are skipped. Returns the number of newly queued emails.
+    """
+    if not messages:
+        return 0
+    statement = insert(EmailOutbox).values([
+        {**message, "status": EMAIL_QUEUED, "attempts": 0, "next_attempt_at": datetime.now(timezone.utc)}
+        for message in messages
+    ]).on_conflict_do_nothing(index_elements=["dedupe_key"])
+    async with async_session_maker() as session:
+        result = await session.execute(statement)
+        await session.commit()
+    queued = max(result.rowcount, 0)
+    metrics.incr("email_outbox_enqueued", queued)
+    metrics.incr("email_outbox_deduplicated", len(messages) - queued)
+    email_outbox_worker.notify()
+    return queued
+
+
+async def send_emails(messages: List[Dict[str, Any]]) -> int:
+    """
+    Queues emails (see `enqueue_emails`) when `EMAIL_OUTBOX_ENABLED`, or otherwise sends
+    them right away, without dedupe or retries. Raises if any direct send fails. Returns the
+    number queued or sent.
+    """
+    if settings.EMAIL_OUTBOX_ENABLED:
+        return await enqueue_emails(messages)
+    outcomes = await asyncio.gather(
+        *(deliver_email(m["recipient"], m["subject"], m["html_body"], m.get("text_body")) for m in messages),
+        return_exceptions=True,
+    )
+    errors = [
+        f"{m['kind']}: {outcome}" if isinstance(outcome, Exception) else f"{m['kind']}: SendGrid returned {outcome.status_code}"
+        for m, outcome in zip(messages, outcomes)
+        if isinstance(outcome, Exception) or not outcome.is_success
+    ]
+    metrics.incr("email_direct_sent", len(messages) - len(errors))
+    if errors:
+        metrics.incr("email_direct_failures", len(errors))
+        raise RuntimeError(f"{len(errors)} of {len(messages)} email(s) could not be sent: {'; '.join(errors)}")
+    return len(messages)
+
+
+async def release_dedupe_keys(google_calendar_event_id: str) -> int:
+    """
+    Frees the dedupe keys of every email queued for an appointment, e.g. once it is canceled.
+    Event IDs are derived from the booking, so rebooking the same slot reuses the ID, and its
+    emails would otherwise be skipped as duplicates of the canceled booking's. The rows keep
+    their history under a key suffixed with their own ID. Returns the number of rows released.
+    """
+    statement = (
+        update(EmailOutbox)
+        .where(EmailOutbox.google_calendar_event_id == google_calendar_event_id)
+        .where(~EmailOutbox.dedupe_key.contains("#"))
+        .values(dedupe_key=func.concat(EmailOutbox.dedupe_key, "#", EmailOutbox.id))
+    )
+    async with async_session_maker() as session:
+        result = await session.execute(statement)
+        await session.commit()
+    return max(result.rowcount, 0)
+
+
+async def get_delivery_statuses(google_calendar_event_id: str) -> List[Dict[str, Any]]:
+    """Returns the delivery state of every email queued for an appointment."""
+    statement = (
+        select(EmailOutbox)
+        .where(EmailOutbox.google_calendar_event_id == google_calendar_event_id)
+        .order_by(EmailOutbox.id)
+    )
+    async with async_session_maker() as session:
+        rows = (await session.exec(statement)).all()
+    return [
+        {
+            "kind": row.kind,
+            "recipient": row.recipient,
+            "status": row.status,
+            "attempts": row.attempts,
+            "last_error": row.last_error,
+            "queued_at": row.created_at,
+            "sent_at": row.sent_at,
+        }
+        for row in rows
+    ]
+
+
+def _retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: roughly base, 2x base, 4x base ... up to the cap."""
+    delay = min(settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS, settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class EmailOutboxWorker:
+    """
+    Delivers emails queued in the `EmailOutbox` table, so agent turns never wait on SendGrid.
+
+    Due rows are claimed in batches with `FOR UPDATE SKIP LOCKED`, so several app instances
+    can drain the outbox without sending an email twice. A claimed row is leased: if the
+    worker dies mid-send, the row becomes due again once the lease runs out. Failures are
+    retried with exponential backoff and dead-lettered after `EMAIL_OUTBOX_MAX_ATTEMPTS`.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the delivery loop; anything still queued is picked up after the next start."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    def notify(self):
+        """Wakes the worker early, e.g. right after this process queued an email."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                handled = await self.process_batch()
+                await self.update_backlog_metrics()
+            except Exception as e:
+                print(f"❌ EMAIL OUTBOX ERROR: {e}")
+                handled = 0
+            if handled < settings.EMAIL_OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.EMAIL_OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def process_batch(self) -> int:
+        """Claims, sends and records one batch of due emails. Returns the number handled."""
+        rows = await self._claim()
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(deliver_email(row.recipient, row.subject, row.html_body, row.text_body) for row in rows),
+            return_exceptions=True,
+        )
+        async with async_session_maker() as session:
+            for row, outcome in zip(rows, outcomes):
+                await session.execute(
+                    update(EmailOutbox).where(EmailOutbox.id == row.id).values(**self._result_values(row, outcome))
+                )
+            await session.commit()
+        metrics.observe("email_outbox_batch_seconds", time.perf_counter() - started)
+        return len(rows)
+
+    async def _claim(self) -> List[EmailOutbox]:
+        now = datetime.now(timezone.utc)
+        statement = (
+            select(EmailOutbox)
+            .where(EmailOutbox.status.in_([EMAIL_QUEUED, EMAIL_SENDING]))
+            .where(EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        async with async_session_maker() as session:
+            rows = (await session.exec(statement)).all()
+            for row in rows:
+                row.status = EMAIL_SENDING
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            await session.commit()
+        return list(rows)
+
+    def _result_values(self, row: EmailOutbox, outcome: Any) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        if isinstance(outcome, httpx.Response) and outcome.is_success:
+            metrics.incr("email_outbox_sent", kind=row.kind)
+            return {"status": EMAIL_SENT, "sent_at": now, "provider_status_code": outcome.status_code, "last_error": None}
+
+        if isinstance(outcome, httpx.Response):
+            # A 4xx rejection (other than rate limiting, which is raised) fails the same way on every retry.
+            error = f"SendGrid rejected the email ({outcome.status_code}): {outcome.text[:500]}"
+            status_code, permanent = outcome.status_code, True
+        else:
+            error = f"{type(outcome).__name__}: {outcome}"
+            status_code = outcome.response.status_code if isinstance(outcome, httpx.HTTPStatusError) else None
+            permanent = False
+
+        attempts = row.attempts
+        retry_at = now + timedelta(seconds=_retry_delay(attempts))
+        if isinstance(outcome, CircuitOpenError):
+            # SendGrid was never called; wait for the breaker instead of using up an attempt.
+            attempts -= 1
+            retry_at = now + timedelta(seconds=sendgrid_integration.breaker.reset_timeout)
+
+        if permanent or attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            print(f"❌ EMAIL OUTBOX: Dead-lettering email {row.id} ({row.kind}) after {attempts} attempt(s). Error: {error}")
+            metrics.incr("email_outbox_dead_lettered", kind=row.kind)
+            return {"status": EMAIL_DEAD, "attempts": attempts, "provider_status_code": status_code, "last_error": error}
+
+        metrics.incr("email_outbox_retries", kind=row.kind)
+        return {
+            "status": EMAIL_QUEUED,
+            "attempts": attempts,
+            "next_attempt_at": retry_at,
+            "provider_status_code": status_code,
+            "last_error": error,
+        }
+
+    async def update_backlog_metrics(self):
+        """Publishes the number of undelivered emails and the age of the oldest one."""
+        statement = (
+            select(func.count(), func.min(EmailOutbox.created_at))
+            .where(EmailOutbox.status.in_([EMAIL_QUEUED, EMAIL_SENDING]))
+        )
+        async with async_session_maker() as session:
+            backlog, oldest = (await session.exec(statement)).one()
+        lag_seconds = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+        metrics.set_gauge("email_outbox_backlog", backlog)
+        metrics.set_gauge("email_outbox_lag_seconds", max(0.0, lag_seconds))
+
+
+email_outbox_worker = EmailOutboxWorker()
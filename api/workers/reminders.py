@@ -0,0 +1,179 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import pytz
+from dateutil.parser import parse as date_parse
+from redis.asyncio import Redis
+from sqlmodel import select
+
+from api.db.cache import redis_pool
+from api.db.session import async_session_maker
+from api.models.appointment import Appointment
+from api.workers.email_outbox import send_emails
+from core.config import get_settings, clinic_config
+from core.metrics import metrics
+from tools.email_templates import APPOINTMENT_REMINDER, render_email
+from tools.reminders import ReminderStore, appointment_reminders
+
+settings = get_settings()
+
+RECONCILE_LOCK_KEY = "reminders:reconcile_lock"
+
+
+def _time_until(start: datetime, now: datetime) -> str:
+    hours = round((start - now).total_seconds() / 3600)
+    if hours >= 20:
+        return "tomorrow"
+    if hours <= 1:
+        return "within the hour"
+    return f"in about {hours} hours"
+
+
+def _appointment_details(appointment: Appointment) -> Dict[str, Any]:
+    return {
+        "google_calendar_event_id": appointment.google_calendar_event_id,
+        "patient_name": appointment.patient_name,
+        "patient_email": appointment.patient_email,
+        "doctor_name": appointment.doctor_name,
+        "service_type": appointment.service_type,
+        "clinic_address": appointment.clinic_address,
+        "start_time": appointment.start_time.isoformat(),
+    }
+
+
+class ReminderWorker:
+    """
+    Turns due reminder jobs into patient emails.
+
+    Each round pops a batch of due jobs, checks them against the `Appointment` table in one
+    query (dropping jobs for appointments that have since moved), and queues the emails in
+    the outbox, whose dedupe keys make a redelivered job harmless. Jobs are acknowledged only
+    after that, so a crash mid-batch means the jobs are retried once their lease expires.
+
+    Once per `REMINDER_RECONCILE_INTERVAL_SECONDS`, one instance rebuilds the queue for
+    appointments starting soon enough to need a reminder, covering jobs that were lost
+    (e.g. a Redis flush) with a range read on the `start_time` index instead of a table scan.
+    """
+
+    def __init__(self, redis: Redis, store: ReminderStore):
+        self.redis = redis
+        self.store = store
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            handled = 0
+            try:
+                # The lock is never released: it expires after one interval, which rate-limits
+                # reconciliation across all instances.
+                if await self.redis.set(RECONCILE_LOCK_KEY, self.owner, nx=True, ex=settings.REMINDER_RECONCILE_INTERVAL_SECONDS):
+                    await self.reconcile()
+                await self.store.requeue_expired(settings.REMINDER_BATCH_SIZE)
+                handled = await self.process_batch()
+                await self.update_backlog_metrics()
+            except Exception as e:
+                print(f"❌ REMINDER WORKER ERROR: {e}")
+                metrics.incr("reminder_worker_failures")
+            if handled < settings.REMINDER_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=settings.REMINDER_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def process_batch(self) -> int:
+        """Pops, checks, queues and acknowledges one batch of due reminders. Returns the number handled."""
+        jobs = await self.store.pop_due(settings.REMINDER_BATCH_SIZE)
+        if not jobs:
+            return 0
+
+        event_ids = list({payload["google_calendar_event_id"] for _, payload in jobs})
+        async with async_session_maker() as session:
+            statement = select(Appointment).where(Appointment.google_calendar_event_id.in_(event_ids))
+            current = {row.google_calendar_event_id: row for row in (await session.exec(statement)).all()}
+
+        tz = pytz.timezone(clinic_config['general_config']['default_timezone'])
+        now = datetime.now(tz)
+        messages = []
+        for job_id, payload in jobs:
+            start = date_parse(payload["start_time"]).astimezone(tz)
+            appointment = current.get(payload["google_calendar_event_id"])
+            # A missing row is usually still in the write-behind queue; cancellations remove their jobs.
+            if appointment is not None and appointment.start_time != start:
+                metrics.incr("reminders_stale")
+                continue
+            if start <= now:
+                metrics.incr("reminders_expired")
+                continue
+            email = render_email(
+                APPOINTMENT_REMINDER,
+                patient_name=payload["patient_name"],
+                service_type=payload["service_type"],
+                formatted_date=start.strftime("%A, %B %d, %Y"),
+                formatted_time=start.strftime("%I:%M %p %Z"),
+                doctor_name=payload["doctor_name"],
+                clinic_address=payload["clinic_address"],
+                time_until=_time_until(start, now),
+            )
+            messages.append({
+                "kind": "reminder",
+                "dedupe_key": f"reminder:{job_id}",
+                "recipient": payload["patient_email"],
+                "subject": f"Reminder: your {payload['service_type']} appointment on {start.strftime('%A, %B %d')}",
+                "html_body": email.html,
+                "text_body": email.text,
+                "google_calendar_event_id": payload["google_calendar_event_id"],
+            })
+
+        await send_emails(messages)
+        await self.store.ack([job_id for job_id, _ in jobs])
+        metrics.incr("reminders_sent", len(messages))
+        return len(jobs)
+
+    async def reconcile(self) -> int:
+        """Re-schedules reminders for every appointment that may need one before the next reconciliation."""
+        started = time.perf_counter()
+        now = datetime.now(pytz.utc)
+        horizon = now + timedelta(
+            hours=max(settings.REMINDER_OFFSETS_HOURS, default=0),
+            seconds=2 * settings.REMINDER_RECONCILE_INTERVAL_SECONDS,
+        )
+        statement = (
+            select(Appointment)
+            .where(Appointment.start_time > now)
+            .where(Appointment.start_time <= horizon)
+        )
+        async with async_session_maker() as session:
+            appointments = (await session.exec(statement)).all()
+
+        scheduled = 0
+        for i in range(0, len(appointments), 100):
+            chunk = appointments[i:i + 100]
+            results = await asyncio.gather(*(self.store.schedule(_appointment_details(a)) for a in chunk))
+            scheduled += sum(results)
+        metrics.observe("reminder_reconcile_seconds", time.perf_counter() - started)
+        return scheduled
+
+    async def update_backlog_metrics(self):
+        pending, processing, overdue = await self.store.backlog()
+        metrics.set_gauge("reminders_pending", pending)
+        metrics.set_gauge("reminders_processing", processing)
+        metrics.set_gauge("reminders_overdue_seconds", overdue)
+
+
+reminder_worker = ReminderWorker(redis_pool, appointment_reminders)
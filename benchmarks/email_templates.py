@@ -0,0 +1,58 @@
+"""
+Bulk-renders the booking emails, comparing `render_email` (precompiled plain-text
+template) with converting every rendered HTML body to text.
+
+    python -m benchmarks.email_templates [--count 1000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from tools.email_templates import (
+    DOCTOR_NOTIFICATION,
+    PATIENT_CONFIRMATION,
+    _compiled,
+    _html_to_text,
+    render_email,
+)
+
+CONTEXTS = {
+    PATIENT_CONFIRMATION: dict(
+        service_type="Teeth Whitening", formatted_date="Monday, March 04, 2030", formatted_time="10:00 AM",
+        duration_minutes=60, doctor_name="Dr. Emily Carter", clinic_address="216 Dental Way, Tooth-Town, USA",
+        google_event_link="https://calendar.google.com/event?eid=1",
+        patient_add_to_calendar_link="https://www.google.com/calendar/render?action=TEMPLATE&text=Appointment",
+    ),
+    DOCTOR_NOTIFICATION: dict(
+        doctor_name="Dr. Emily Carter", patient_email="patient@example.com", service_type="Teeth Whitening",
+        formatted_date="Monday, March 04, 2030", formatted_time="10:00 AM",
+        google_event_link="https://calendar.google.com/event?eid=1",
+    ),
+}
+
+
+def _precompiled(name: str, count: int):
+    for n in range(count):
+        render_email(name, patient_name=f"Patient {n} <p{n}@example.com>", **CONTEXTS[name])
+
+
+def _convert_each(name: str, count: int):
+    template, _ = _compiled[name]
+    for n in range(count):
+        _html_to_text(template.render(patient_name=f"Patient {n} <p{n}@example.com>", **CONTEXTS[name]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'template':32} {'text part':16} {'emails/s':>10}")
+    for name in CONTEXTS:
+        for label, path in [("precompiled", _precompiled), ("convert each", _convert_each)]:
+            seconds = min(timeit.repeat(lambda: path(name, args.count), number=1, repeat=args.repeat))
+            print(f"{name:32} {label:16} {args.count / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
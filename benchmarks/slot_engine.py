@@ -0,0 +1,80 @@
+"""
+Times `compute_free_slots` over a multi-week window for every configured doctor and
+each service they offer, against a synthetic calendar that is mostly booked.
+
+    python -m benchmarks.slot_engine [--weeks 6] [--repeat 20]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pytz
+
+from core.config import clinic_config as config
+from tools.slot_engine import Interval, compute_free_slots, parse_clinic_hours
+
+
+def _busy_calendar(start: datetime, weeks: int, opening_hours: Dict, tz, seed: int) -> List[Interval]:
+    """Back-to-back 15-90 minute appointments with occasional gaps, during opening hours."""
+    rng = random.Random(seed)
+    busy = []
+    for offset in range(weeks * 7):
+        day = (start + timedelta(days=offset)).date()
+        hours = opening_hours.get(day.weekday())
+        if not hours:
+            continue
+        cursor = tz.localize(datetime.combine(day, hours[0]))
+        closing = tz.localize(datetime.combine(day, hours[1]))
+        while cursor < closing:
+            length = timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))
+            if rng.random() < 0.7:
+                busy.append((cursor, min(cursor + length, closing)))
+            cursor += length
+    rng.shuffle(busy)  # Google returns busy blocks per calendar, not necessarily sorted
+    return busy
+
+
+def run(weeks: int, repeat: int) -> List[Tuple[str, str, int, int, float]]:
+    general = config['general_config']
+    tz = pytz.timezone(general['default_timezone'])
+    opening_hours = parse_clinic_hours(config['clinic_hours'])
+    today = datetime.now(tz).date()
+    monday = tz.localize(datetime.combine(today + timedelta(days=7 - today.weekday()), datetime.min.time()))
+    window_end = monday + timedelta(weeks=weeks)
+
+    rows = []
+    for index, doctor in enumerate(config['doctors']):
+        busy = _busy_calendar(monday, weeks, opening_hours, tz, seed=index)
+        for service in doctor.get('services', config['services']):
+            duration = config['services'][service]
+
+            def call():
+                return compute_free_slots(
+                    monday, window_end, busy, opening_hours, duration, tz,
+                    buffer_minutes=general.get('appointment_buffer_minutes', 0),
+                    granularity_minutes=general.get('slot_granularity_minutes', 15),
+                )
+
+            slots = len(call())
+            seconds = min(timeit.repeat(call, number=1, repeat=repeat))
+            rows.append((doctor['email'], service, len(busy), slots, seconds))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = run(args.weeks, args.repeat)
+    print(f"{'doctor':32} {'service':32} {'busy':>6} {'slots':>6} {'best ms':>8}")
+    for doctor, service, busy, slots, seconds in rows:
+        print(f"{doctor:32} {service:32} {busy:>6} {slots:>6} {seconds * 1000:>8.2f}")
+    print(f"Total for every doctor and service: {sum(row[4] for row in rows) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares encoding a streamed reply as one pydantic `StreamEvent` per token with the
+`encode_text_event` fast path behind a `TextDeltaCoalescer`.
+
+    python -m benchmarks.sse [--tokens 2000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, List, Tuple
+
+from api.models.chat import StreamEvent
+from api.services.sse import TextDeltaCoalescer
+from core.config import Settings
+
+WINDOW_MS = Settings.model_fields["SSE_TEXT_COALESCE_WINDOW_MS"].default
+MAX_BYTES = Settings.model_fields["SSE_TEXT_COALESCE_MAX_BYTES"].default
+
+
+def _reply_tokens(count: int) -> List[str]:
+    """Token-sized deltas like an LLM stream, with some quotes and non-ASCII text to escape."""
+    rng = random.Random(0)
+    words = ["appointment", " Dr.", " Carter", " is", " free", " at", " 10:30", '"', "\n", " café", " 😊", ","]
+    return [rng.choice(words) for _ in range(count)]
+
+
+async def _per_token(tokens: List[str]) -> List[str]:
+    events = []
+    for token in tokens:
+        events.append(StreamEvent(event="text", data={"delta": token}).model_dump_json())
+    return events
+
+
+async def _coalesced(tokens: List[str]) -> List[str]:
+    events = []
+
+    async def sink(payload: str):
+        events.append(payload)
+
+    buffer = TextDeltaCoalescer(sink, window_ms=WINDOW_MS, max_bytes=MAX_BYTES)
+    for token in tokens:
+        await buffer.add(token)
+    await buffer.flush()
+    return events
+
+
+def _best(path: Callable, tokens: List[str], repeat: int) -> Tuple[float, int, int]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        events = asyncio.run(path(tokens))
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(events), sum(len(event) for event in events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = _reply_tokens(args.tokens)
+    print(f"{'path':40} {'events':>7} {'bytes':>8} {'best ms':>8}")
+    for name, path in [("StreamEvent.model_dump_json per token", _per_token), ("encode_text_event + coalescer", _coalesced)]:
+        seconds, events, size = _best(path, tokens, args.repeat)
+        print(f"{name:40} {events:>7} {size:>8} {seconds * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
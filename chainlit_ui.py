@@ -1,3 +1,4 @@
+import asyncio
 import chainlit as cl
 from supabase import create_client, Client
 from gotrue.errors import AuthApiError
@@ -15,6 +16,8 @@ _ = load_dotenv()
 settings = get_settings()
 supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
+MAX_STREAM_RECONNECTS = 3
+
 # --- STAGE 1: AUTHENTICATION ---
 @cl.password_auth_callback
 def auth_callback(email: str, password: str) -> Optional[cl.User]:
@@ -92,30 +95,53 @@ async def handle_message(message: cl.Message):
     # Prepare UI elements for streaming
     final_msg = cl.Message(content="")
     agent_step_removed = {"status": False} 
+    final_msg_sent = {"status": False}
     tool_steps = {}
 
+    backend_url = os.getenv('BACKEND_URL')
+    last_event_id = None
+
     try:
         async with cl.Step(name="Thinking...", type="llm", show_input=False) as agent_step:
-            async with httpx.AsyncClient() as client:
-                async with client.stream("POST", f"{os.getenv('BACKEND_URL')}/api/v1/chat/stream", headers=headers, json=payload, timeout=300) as response:
-                    response.raise_for_status()
-                    
-                    async for chunk in response.aiter_text():
-                        for line in chunk.splitlines():
-                            if line.startswith('data:'):
-                                json_data = line[5:].strip()
-                                if not json_data: continue
-                                try:
-                                    stream_event = json.loads(json_data)
-                                    await handle_stream_event(stream_event, agent_step, final_msg, tool_steps, agent_step_removed)
-                                except json.JSONDecodeError:
-                                    print(f"Warning: Could not decode JSON from stream: '{json_data}'")
+            async with httpx.AsyncClient(timeout=300) as client:
+                for attempt in range(MAX_STREAM_RECONNECTS + 1):
+                    if attempt == 0:
+                        stream = client.stream("POST", f"{backend_url}/api/v1/chat/stream", headers=headers, json=payload)
+                    else:
+                        # The run keeps going on the server; resume right after the last event we handled.
+                        resume_headers = {**headers, "Last-Event-ID": last_event_id} if last_event_id else headers
+                        conversation_id = cl.user_session.get("conversation_id")
+                        stream = client.stream("GET", f"{backend_url}/api/v1/chat/stream/{conversation_id}", headers=resume_headers)
+
+                    try:
+                        async with stream as response:
+                            response.raise_for_status()
+
+                            pending_event_id = None
+                            async for line in response.aiter_lines():
+                                if line.startswith('id:'):
+                                    pending_event_id = line[3:].strip()
+                                elif line.startswith('data:'):
+                                    json_data = line[5:].strip()
+                                    if not json_data: continue
+                                    try:
+                                        stream_event = json.loads(json_data)
+                                        await handle_stream_event(stream_event, agent_step, final_msg, tool_steps, agent_step_removed, final_msg_sent)
+                                    except json.JSONDecodeError:
+                                        print(f"Warning: Could not decode JSON from stream: '{json_data}'")
+                                    last_event_id = pending_event_id or last_event_id
+                        break
+                    except httpx.TransportError as e:
+                        if attempt == MAX_STREAM_RECONNECTS or not cl.user_session.get("conversation_id"):
+                            raise
+                        print(f"Stream interrupted ({e}), reconnecting...")
+                        await asyncio.sleep(1)
     
     except Exception as e:
         await cl.Message(content=f"Sorry, an error occurred: {e}").send()
 
 
-async def handle_stream_event(event_data, agent_step, final_msg, tool_steps, agent_step_removed):
+async def handle_stream_event(event_data, agent_step, final_msg, tool_steps, agent_step_removed, final_msg_sent):
     event_type = event_data.get("event")
     data = event_data.get("data", {})
 
@@ -130,5 +156,17 @@ async def handle_stream_event(event_data, agent_step, final_msg, tool_steps, age
         for token in data.get("delta", ""):
             await final_msg.stream_token(token)
             
+    elif event_type == "error":
+        if not agent_step_removed["status"]:
+            await agent_step.remove()
+            agent_step_removed["status"] = True
+
+        separator = "\n\n" if final_msg.content else ""
+        await final_msg.stream_token(separator + data.get("message", "Something went wrong."))
+        await final_msg.send()
+        final_msg_sent["status"] = True
+
     elif event_type == "end":
-        await final_msg.send()
\ No newline at end of file
+        if not final_msg_sent["status"]:
+            await final_msg.send()
+            final_msg_sent["status"] = True
\ No newline at end of file
@@ -1,6 +1,16 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Literal, Optional
+import hashlib
 import json
+import os
+
+class AgentModelConfig(BaseModel):
+    """Per-agent model tier and generation settings."""
+    model: str
+    max_tokens: int = 1024
+    temperature: float = 0.3
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -21,27 +31,166 @@ class Settings(BaseSettings):
     # --- Database Configuration ---
     DATABASE_URL: str
     DB_CONNECT_ARGS: dict = {"sslmode": "prefer"}
+    # Async (asyncpg) pool used by the chat stream and agent tools
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+    ASYNC_DB_POOL_TIMEOUT: int = 10
+    ASYNC_DB_CONNECT_ARGS: dict = {"ssl": "prefer"}
     
     # --- Redis ---
     REDIS_URL: str
 
+    # --- Chat Runs & Resumable Streams ---
+    CHAT_EVENT_LOG_MAXLEN: int = 2000  # Approximate cap on buffered events per conversation
+    CHAT_EVENT_LOG_TTL_SECONDS: int = 3600
+    CHAT_EVENT_TAIL_BLOCK_MS: int = 5000
+    CHAT_RUN_LOCK_TTL_SECONDS: int = 300
+    CHAT_RUN_SHUTDOWN_GRACE_SECONDS: int = 30
+    # Text deltas are coalesced until the window elapses or the buffer reaches the size limit
+    SSE_TEXT_COALESCE_WINDOW_MS: int = 20
+    SSE_TEXT_COALESCE_MAX_BYTES: int = 256
+
+    # --- Write-behind Appointment Persistence ---
+    APPOINTMENT_WRITER_BATCH_SIZE: int = 100
+    APPOINTMENT_WRITER_BLOCK_MS: int = 1000
+    APPOINTMENT_WRITER_CLAIM_IDLE_MS: int = 60000  # Reclaim entries from dead consumers
+    APPOINTMENT_WRITER_MAX_ATTEMPTS: int = 5  # Rows rejected this many times are dead-lettered
+
+    # --- Email Outbox ---
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_BATCH_SIZE: int = 20
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2
+    EMAIL_OUTBOX_LEASE_SECONDS: int = 120  # A row claimed by a worker that died is retried after this
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 6
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: float = 30
+    EMAIL_OUTBOX_RETRY_MAX_SECONDS: float = 3600
+
+    # --- Doctor Digest ---
+    DOCTOR_DIGEST_ENABLED: bool = False  # Replaces the per-booking doctor notification email
+    DOCTOR_DIGEST_FREQUENCY: Literal["daily", "hourly"] = "daily"
+    DOCTOR_DIGEST_HOUR: int = 7  # Local clinic hour at which the daily digest goes out
+    DOCTOR_DIGEST_CHECK_SECONDS: int = 60
+    DOCTOR_DIGEST_LOCK_SECONDS: int = 300
+
+    # --- Appointment Reminders ---
+    REMINDERS_ENABLED: bool = True
+    REMINDER_OFFSETS_HOURS: list[int] = [24, 2]  # Emails sent this long before each appointment
+    REMINDER_BATCH_SIZE: int = 200
+    REMINDER_POLL_SECONDS: float = 30
+    REMINDER_LEASE_SECONDS: int = 300  # Popped jobs not acknowledged by then are retried
+    REMINDER_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    # --- Calendar Free/Busy Mirror ---
+    CALENDAR_SYNC_ENABLED: bool = True
+    CALENDAR_SYNC_INTERVAL_SECONDS: int = 30
+    CALENDAR_SYNC_LOCK_SECONDS: int = 60
+    CALENDAR_MIRROR_MAX_STALENESS_SECONDS: int = 120  # Older mirrors fall back to live Free/Busy queries
+    CALENDAR_MIRROR_MAX_EVENT_HOURS: int = 336  # Longest event considered when looking back from a window
+    CALENDAR_FREEBUSY_MAX_WINDOW_DAYS: int = 30  # Live Free/Busy queries are split into windows of this size
+
+    # --- Outbound Integrations (bulkheads) ---
+    INTEGRATION_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before a provider's circuit opens
+    INTEGRATION_CIRCUIT_RESET_SECONDS: float = 30
+
+    # --- Google Calendar API ---
+    GOOGLE_API_MAX_WORKERS: int = 16  # Threads (and so pooled transports) for blocking Google calls
+    GOOGLE_API_MAX_CONCURRENCY_PER_DOCTOR: int = 4
+    GOOGLE_API_DOCTOR_CONCURRENCY: dict[str, int] = {}  # Per-doctor overrides, keyed by email
+    GOOGLE_API_SOCKET_TIMEOUT_SECONDS: float = 15
+    GOOGLE_API_CALL_TIMEOUT_SECONDS: float = 10
+    GOOGLE_API_MAX_RETRIES: int = 2
+    GOOGLE_API_RETRY_BASE_DELAY_SECONDS: float = 0.25
+
+    # --- Slot Holds ---
+    SLOT_HOLDS_ENABLED: bool = True
+    SLOT_HOLD_TTL_SECONDS: int = 600  # How long offered slots stay reserved for a conversation
+
+    # --- Booking Idempotency ---
+    BOOKING_IDEMPOTENCY_TTL_SECONDS: int = 86400  # How long a successful booking result is replayed
+
+    # --- Availability Search ---
+    AVAILABILITY_SEARCH_MAX_DAYS: int = 90
+    AVAILABILITY_SEARCH_SLOTS_PER_DOCTOR: int = 3
+
     # --- Models Configuration ---
     DEFAULT_MODEL: str = "groq/llama-3.3-70b-versatile"
     GROQ_API_KEY: str
+    # Model registry, keyed by agent role. Override with a JSON object in the environment.
+    AGENT_MODELS: dict[str, AgentModelConfig] = {
+        "receptionist": AgentModelConfig(model="groq/llama-3.1-8b-instant", max_tokens=512, temperature=0.4),
+        "scheduler": AgentModelConfig(model="groq/llama-3.3-70b-versatile", max_tokens=1024, temperature=0.2),
+        "canceling": AgentModelConfig(model="groq/llama-3.3-70b-versatile", max_tokens=768, temperature=0.2),
+    }
+
+    # --- Shared LLM HTTP Client ---
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5
+    LLM_READ_TIMEOUT_SECONDS: float = 60
+
+    # --- Intent Pre-routing ---
+    INTENT_ROUTER_ENABLED: bool = True
+    INTENT_ROUTER_CONFIDENCE_THRESHOLD: float = 0.8
+    INTENT_ROUTER_MODEL: Optional[str] = None  # Optional small local model, e.g. "ollama/llama3.2:1b"
+    INTENT_ROUTER_MODEL_CONFIDENCE: float = 0.85
+    INTENT_ROUTER_MODEL_TIMEOUT_SECONDS: float = 1.5
+
+    # --- Receptionist FAQ Cache ---
+    FAQ_CACHE_ENABLED: bool = True
+    FAQ_CACHE_SIMILARITY_THRESHOLD: float = 0.75
+    FAQ_CACHE_MAX_QUESTION_WORDS: int = 15
+
+    # --- Conversation History Compaction ---
+    HISTORY_DEFAULT_TOKEN_BUDGET: int = 6000
+    HISTORY_TOKEN_BUDGETS: dict = {
+        "Receptionist Agent": 3000,
+        "Scheduler Agent": 6000,
+        "Canceling Agent": 4000,
+    }
+    HISTORY_RECENT_TURNS: int = 4  # Turns kept verbatim, tool calls included
+    HISTORY_TOOL_SUMMARY_CHARS: int = 300
 
     # --- Sendgrid Email ---
     SENDGRID_FROM_NAME: str = "Bright Smiles Dental"
     SENDGRID_FROM_EMAIL: str
     SENDGRID_API_KEY: str
+    SENDGRID_API_BASE_URL: str = "https://api.sendgrid.com"
+    SENDGRID_MAX_CONNECTIONS: int = 10
+    SENDGRID_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    SENDGRID_CONNECT_TIMEOUT_SECONDS: float = 5
+    SENDGRID_TIMEOUT_SECONDS: float = 10
 
 @lru_cache()
 def get_settings():
     return Settings()
 
+CLINIC_CONFIG_PATH = "data/clinic_info.json"
+
 @lru_cache()
 def get_clinic_config():
     """Loads the clinic configuration from the JSON file."""
-    with open("data/clinic_info.json", "r") as f:
+    with open(CLINIC_CONFIG_PATH, "r") as f:
+        return json.load(f)
+
+_config_fingerprint = {"mtime": None, "hash": None}
+
+def get_clinic_config_fingerprint() -> str:
+    """
+    Returns a SHA-256 hash of the clinic configuration file. The file is only re-hashed
+    when its modification time changes, so this is cheap enough to call per request.
+    """
+    mtime = os.stat(CLINIC_CONFIG_PATH).st_mtime_ns
+    if mtime != _config_fingerprint["mtime"]:
+        with open(CLINIC_CONFIG_PATH, "rb") as f:
+            _config_fingerprint["hash"] = hashlib.sha256(f.read()).hexdigest()
+        _config_fingerprint["mtime"] = mtime
+    return _config_fingerprint["hash"]
+
+def load_clinic_config_file():
+    """Reads the clinic configuration from disk, bypassing the process-wide cache."""
+    with open(CLINIC_CONFIG_PATH, "r") as f:
         return json.load(f)
 
 clinic_config = get_clinic_config()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+# SendGrid helpers are only used to build the v3 mail/send payload
+from sendgrid.helpers.mail import Mail, From, To, Subject, HtmlContent, PlainTextContent
+
+from core.config import get_settings
+from core.integrations import Integration, register_integration
+from core.metrics import metrics
+
+settings = get_settings()
+
+
+def _is_provider_failure(error: BaseException) -> bool:
+    """Only server-side and connection errors count against the circuit breaker, not a rejected email."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code >= 500 or status_code == 429
+    return True
+
+
+sendgrid_integration = register_integration(Integration(
+    "sendgrid",
+    max_concurrency=settings.SENDGRID_MAX_CONNECTIONS,
+    timeout=settings.SENDGRID_TIMEOUT_SECONDS,
+    failure_threshold=settings.INTEGRATION_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.INTEGRATION_CIRCUIT_RESET_SECONDS,
+    is_failure=_is_provider_failure,
+))
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_email_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled client for the SendGrid v3 API. Connections are kept
+    alive between sends, so only the first email after startup pays for the TLS handshake.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=settings.SENDGRID_API_BASE_URL,
+            headers={"Authorization": f"Bearer {settings.SENDGRID_API_KEY}"},
+            limits=httpx.Limits(
+                max_connections=settings.SENDGRID_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SENDGRID_MAX_CONNECTIONS,
+                keepalive_expiry=settings.SENDGRID_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(settings.SENDGRID_TIMEOUT_SECONDS, connect=settings.SENDGRID_CONNECT_TIMEOUT_SECONDS),
+        )
+    return _http_client
+
+
+async def close_email_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def send_mail(payload: Dict[str, Any]) -> httpx.Response:
+    """
+    Posts a v3 mail/send payload (e.g. `Mail(...).get()`). 429 and 5xx responses are raised
+    as `httpx.HTTPStatusError`; other responses are returned for the caller to inspect.
+    """
+    started = time.perf_counter()
+    try:
+        response = await get_email_http_client().post("/v3/mail/send", json=payload)
+    finally:
+        metrics.observe("email_send_seconds", time.perf_counter() - started)
+    metrics.incr("email_send_responses", status=response.status_code)
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+
+async def deliver_email(recipient: str, subject: str, html_body: str, text_body: Optional[str] = None) -> httpx.Response:
+    """Sends one email from the clinic's address through the SendGrid bulkhead."""
+    message = Mail(
+        from_email=From(email=settings.SENDGRID_FROM_EMAIL, name=settings.SENDGRID_FROM_NAME),
+        to_emails=To(recipient),
+        subject=Subject(subject),
+        plain_text_content=PlainTextContent(text_body) if text_body else None,
+        html_content=HtmlContent(html_body)
+    )
+    return await sendgrid_integration.run_async(lambda: send_mail(message.get()))
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from core.metrics import metrics
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. After that a single trial call is let through: success
+    closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """The call ended without telling us anything about provider health."""
+        self._trial_in_flight = False
+
+
+class Integration:
+    """
+    A bulkhead for one external provider (Google Calendar, SendGrid, ...).
+
+    Each integration caps its own concurrency: blocking calls (`run`) get a dedicated,
+    sized thread pool and async calls (`run_async`) a semaphore of the same size, so a
+    slow provider can never exhaust the event loop's default executor or another
+    provider's capacity. Callers beyond the limit wait in line; the queue depth and wait
+    time are published per provider. Calls get a deadline, and a circuit breaker fails
+    fast while the provider is degraded. `is_failure` decides which exceptions count
+    against the breaker (e.g. 5xx responses, but not a 404).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        timeout: float,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.is_failure = is_failure
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._active = 0
+
+    async def run(self, call: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """Runs a blocking call on this integration's pool, within its deadline."""
+        return await self._guarded(
+            lambda: asyncio.get_running_loop().run_in_executor(self._executor, call),
+            timeout,
+            cancel_on_timeout=False,  # A thread cannot be interrupted; its slot is freed when it returns
+        )
+
+    async def run_async(self, call: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """Awaits an async call (e.g. `lambda: client.post(...)`) within this integration's limits."""
+        return await self._guarded(lambda: asyncio.ensure_future(call()), timeout, cancel_on_timeout=True)
+
+    async def _guarded(
+        self, start: Callable[[], "asyncio.Future[T]"], timeout: Optional[float], cancel_on_timeout: bool
+    ) -> T:
+        if not self.breaker.allow():
+            metrics.incr("integration_rejected", service=self.name)
+            raise CircuitOpenError(f"{self.name} is temporarily unavailable (circuit open).")
+
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self.breaker.record_ignored()
+            raise
+        finally:
+            self._waiting -= 1
+        metrics.observe("integration_wait_seconds", time.perf_counter() - queued, service=self.name)
+
+        self._active += 1
+        started = time.perf_counter()
+        try:
+            future = start()
+        except BaseException:
+            self.breaker.record_ignored()
+            self._release()
+            raise
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=timeout or self.timeout)
+        except BaseException as e:
+            if isinstance(e, asyncio.TimeoutError) or (isinstance(e, Exception) and self.is_failure(e)):
+                self.breaker.record_failure()
+                metrics.incr("integration_failures", service=self.name)
+            else:
+                self.breaker.record_ignored()
+            raise
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            metrics.observe("integration_call_seconds", time.perf_counter() - started, service=self.name)
+            if future.done():
+                self._release()
+            else:
+                # A timed-out call still occupies its slot until it actually finishes.
+                if cancel_on_timeout:
+                    future.cancel()
+                future.add_done_callback(lambda _: self._release())
+
+    def _release(self):
+        self._active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._waiting,
+            "in_flight": self._active,
+            "circuit_open": int(self.breaker.state != "closed"),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_integrations: Dict[str, Integration] = {}
+
+
+def register_integration(integration: Integration) -> Integration:
+    _integrations[integration.name] = integration
+    metrics.register_gauge_callback(f"integration.{integration.name}", integration.stats)
+    return integration
+
+
+def shutdown_integrations():
+    for integration in _integrations.values():
+        integration.shutdown()
@@ -0,0 +1,57 @@
+from typing import Optional
+
+import httpx
+import litellm
+from agents import ModelSettings
+from agents.extensions.models.litellm_model import LitellmModel
+
+from core.config import get_settings, AgentModelConfig
+
+settings = get_settings()
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_llm_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP/2 client used for every LLM call. It is installed
+    as LiteLLM's async client session so all agents share connections and keep-alive.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=settings.LLM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                settings.LLM_READ_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS
+            ),
+        )
+        litellm.aclient_session = _http_client
+    return _http_client
+
+
+async def close_llm_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        litellm.aclient_session = None
+
+
+def get_agent_model_config(role: str) -> AgentModelConfig:
+    return settings.AGENT_MODELS.get(role) or AgentModelConfig(model=settings.DEFAULT_MODEL)
+
+
+def build_agent_model(role: str) -> LitellmModel:
+    """Creates the model for an agent role from the registry, on the shared HTTP client."""
+    get_llm_http_client()
+    return LitellmModel(model=get_agent_model_config(role).model, api_key=settings.GROQ_API_KEY)
+
+
+def build_model_settings(role: str) -> ModelSettings:
+    config = get_agent_model_config(role)
+    return ModelSettings(max_tokens=config.max_tokens, temperature=config.temperature)
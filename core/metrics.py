@@ -0,0 +1,85 @@
+import threading
+from typing import Callable, Dict, Any
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """
+    A minimal in-process metrics registry (counters, gauges and summaries).
+    Values are exposed as a JSON snapshot through the `/metrics` endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._gauge_callbacks: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def register_gauge_callback(self, name: str, callback: Callable[[], Dict[str, float]]):
+        """Registers a callable returning a dict of gauge values, evaluated at snapshot time."""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def observe(self, name: str, value: float, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def counter_total(self, name: str) -> float:
+        """Sums a counter across all of its label combinations."""
+        with self._lock:
+            return sum(
+                value
+                for key, value in self._counters.items()
+                if key == name or key.startswith(name + "{")
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            summaries = {
+                key: {**summary, "avg": summary["sum"] / summary["count"]}
+                for key, summary in self._summaries.items()
+            }
+
+        for name, callback in callbacks.items():
+            try:
+                for key, value in callback().items():
+                    gauges[f"{name}.{key}"] = value
+            except Exception as e:
+                gauges[f"{name}.error"] = str(e)
+
+        return {"counters": counters, "gauges": gauges, "summaries": summaries}
+
+
+metrics = MetricsRegistry()
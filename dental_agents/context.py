@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.security.auth import User
 
 @dataclass
 class AssistantContext:
     """The context object to hold all shared dependencies for a run."""
-    db: Session
-    user: User
\ No newline at end of file
+    db: AsyncSession
+    user: User
+    conversation_id: str
\ No newline at end of file
@@ -0,0 +1,166 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.config import get_settings, get_clinic_config_fingerprint, load_clinic_config_file
+from core.metrics import metrics
+
+settings = get_settings()
+
+_NON_WORD = re.compile(r"[^a-z0-9&\s]")
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "do", "does", "you", "your", "yours", "i", "me", "my", "we",
+    "can", "could", "would", "please", "tell", "know", "want", "to", "of", "for", "at", "in",
+    "on", "hi", "hello", "hey", "there", "what", "whats", "which", "us", "about", "clinic",
+    "dental", "and", "it", "be", "will", "any", "have", "has", "r", "u", "ur",
+}
+
+
+def normalize_question(text: str) -> str:
+    """Lowercases, strips punctuation and filler words, and collapses whitespace."""
+    words = _NON_WORD.sub(" ", text.lower()).split()
+    return " ".join(word for word in words if word not in _STOPWORDS)
+
+
+@dataclass
+class FaqEntry:
+    key: str
+    answer: str
+
+
+@dataclass
+class FaqMatch:
+    entry: FaqEntry
+    match_type: str  # "exact" or "similar"
+    score: float
+
+
+class _FaqIndex:
+    """Exact-match table plus an inverted token index for Jaccard similarity lookups."""
+
+    def __init__(self):
+        self.entries: List[FaqEntry] = []
+        self.exact: Dict[str, int] = {}
+        self.variants: List[Tuple[Set[str], int]] = []
+        self.token_index: Dict[str, Set[int]] = {}
+
+    def add(self, entry: FaqEntry, questions: List[str]):
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        for question in questions:
+            normalized = normalize_question(question)
+            self.exact.setdefault(normalized, entry_id)
+            variant_id = len(self.variants)
+            tokens = set(normalized.split())
+            self.variants.append((tokens, entry_id))
+            for token in tokens:
+                self.token_index.setdefault(token, set()).add(variant_id)
+
+    def lookup(self, normalized: str, threshold: float) -> Optional[FaqMatch]:
+        if normalized in self.exact:
+            return FaqMatch(self.entries[self.exact[normalized]], "exact", 1.0)
+
+        tokens = set(normalized.split())
+        candidates = set().union(*(self.token_index.get(token, set()) for token in tokens)) if tokens else set()
+        best: Optional[Tuple[float, int]] = None
+        for variant_id in candidates:
+            variant_tokens, entry_id = self.variants[variant_id]
+            score = len(tokens & variant_tokens) / len(tokens | variant_tokens)
+            if best is None or score > best[0]:
+                best = (score, entry_id)
+
+        if best and best[0] >= threshold:
+            return FaqMatch(self.entries[best[1]], "similar", best[0])
+        return None
+
+
+def _build_index(config: dict) -> _FaqIndex:
+    index = _FaqIndex()
+    follow_up = "\n\nIs there anything else I can help you with, like booking an appointment?"
+
+    hours = "\n".join(f"- **{day}:** {hours}" for day, hours in config["clinic_hours"].items())
+    index.add(
+        FaqEntry("hours", f"Here are our clinic hours:\n\n{hours}{follow_up}"),
+        ["What are your hours?", "When are you open?", "Opening hours", "Clinic hours",
+         "What time do you open?", "What time do you close?", "What are your timings?",
+         "Are you open on weekends?", "Which days are you open?", "Working hours"],
+    )
+
+    index.add(
+        FaqEntry("address", f"{config['clinic_name']} is located at **{config['clinic_address']}**.{follow_up}"),
+        ["Where are you located?", "What is your address?", "Address", "Where is the clinic?",
+         "How do I find you?", "Location", "Where are you?"],
+    )
+
+    doctors = "\n".join(f"- **{doc['name']}** — {doc['specialty']}" for doc in config["doctors"])
+    index.add(
+        FaqEntry("doctors", f"Our dentists are:\n\n{doctors}{follow_up}"),
+        ["Who are your doctors?", "Which dentists do you have?", "List of doctors",
+         "Who are the dentists?", "Doctors", "Dentists", "Who works there?"],
+    )
+
+    services = "\n".join(f"- **{service}** ({minutes} minutes)" for service, minutes in config["services"].items())
+    index.add(
+        FaqEntry("services", f"We offer the following services:\n\n{services}{follow_up}"),
+        ["What services do you offer?", "What treatments do you provide?", "Services",
+         "List of services", "Treatments", "What do you offer?",
+         "How long do appointments take?", "Service durations"],
+    )
+
+    for service, minutes in config["services"].items():
+        index.add(
+            FaqEntry(f"duration:{service}", f"A **{service}** appointment takes about **{minutes} minutes**.{follow_up}"),
+            [f"How long does {service} take?", f"How long is {service}?", f"{service} duration",
+             f"Do you offer {service}?"],
+        )
+    return index
+
+
+class FaqCache:
+    """
+    Serves common receptionist questions (hours, address, doctors, services) straight
+    from `clinic_info.json`. The index is keyed on the config's content hash and rebuilt
+    automatically whenever the file changes.
+    """
+
+    def __init__(self, threshold: float, max_question_words: int):
+        self.threshold = threshold
+        self.max_question_words = max_question_words
+        self._fingerprint: Optional[str] = None
+        self._index: Optional[_FaqIndex] = None
+
+    def _current_index(self) -> _FaqIndex:
+        fingerprint = get_clinic_config_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._index = _build_index(load_clinic_config_file())
+            self._fingerprint = fingerprint
+            metrics.incr("faq_cache_rebuilds")
+        return self._index
+
+    def lookup(self, question: str) -> Optional[FaqMatch]:
+        metrics.incr("faq_cache_lookups")
+        # Long messages usually carry more than a bare FAQ; leave those to the agent.
+        if len(question.split()) > self.max_question_words:
+            return None
+
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+
+        match = self._current_index().lookup(normalized, self.threshold)
+        if match:
+            metrics.incr("faq_cache_hits", match_type=match.match_type)
+        return match
+
+
+def _hit_ratio() -> dict:
+    lookups = metrics.counter_total("faq_cache_lookups")
+    hits = metrics.counter_total("faq_cache_hits")
+    return {"hit_ratio": hits / lookups if lookups else 0.0}
+
+
+faq_cache = FaqCache(
+    threshold=settings.FAQ_CACHE_SIMILARITY_THRESHOLD,
+    max_question_words=settings.FAQ_CACHE_MAX_QUESTION_WORDS,
+) if settings.FAQ_CACHE_ENABLED else None
+metrics.register_gauge_callback("faq_cache", _hit_ratio)
@@ -0,0 +1,133 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from core.config import get_settings
+from core.metrics import metrics
+
+settings = get_settings()
+
+# Rough average for English text on Llama/GPT style tokenizers.
+CHARS_PER_TOKEN = 4
+# Fixed per-item overhead for role/type framing added by the chat template.
+ITEM_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(item: Dict[str, Any]) -> int:
+    """Estimates the number of prompt tokens an input item will cost."""
+    serialized = json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+    return ITEM_OVERHEAD_TOKENS + len(serialized) // CHARS_PER_TOKEN
+
+
+def count_history_tokens(items: List[Dict[str, Any]]) -> int:
+    return sum(count_tokens(item) for item in items)
+
+
+@dataclass
+class CompactionResult:
+    items: List[Dict[str, Any]]
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _is_user_message(item: Dict[str, Any]) -> bool:
+    return item.get("role") == "user" and item.get("type", "message") == "message"
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def _summarize_tool_call(call: Dict[str, Any], output: Dict[str, Any] | None, max_chars: int) -> Dict[str, Any]:
+    """Collapses a function call (and its output, if any) into a short assistant note."""
+    name = call.get("name", "tool") if call else "tool"
+    arguments = _truncate(str(call.get("arguments", "")), max_chars) if call else ""
+    result = _truncate(str(output.get("output", "")), max_chars) if output else "no output"
+    return {
+        "role": "assistant",
+        "content": f"[Earlier tool call] {name}({arguments}) -> {result}",
+    }
+
+
+def _collapse_tool_calls(items: List[Dict[str, Any]], max_chars: int) -> List[Dict[str, Any]]:
+    outputs = {
+        item.get("call_id"): item
+        for item in items
+        if item.get("type") == "function_call_output"
+    }
+    collapsed: List[Dict[str, Any]] = []
+    summarized_call_ids = set()
+
+    for item in items:
+        item_type = item.get("type")
+        if item_type == "function_call":
+            call_id = item.get("call_id")
+            collapsed.append(_summarize_tool_call(item, outputs.get(call_id), max_chars))
+            summarized_call_ids.add(call_id)
+        elif item_type == "function_call_output":
+            # Outputs are folded into their call's summary; orphans get their own note.
+            if item.get("call_id") not in summarized_call_ids:
+                collapsed.append(_summarize_tool_call({}, item, max_chars))
+        else:
+            collapsed.append(item)
+    return collapsed
+
+
+def _split_turns(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Groups items into turns, each starting at a user message."""
+    turns: List[List[Dict[str, Any]]] = []
+    for item in items:
+        if _is_user_message(item) or not turns:
+            turns.append([item])
+        else:
+            turns[-1].append(item)
+    return turns
+
+
+def get_token_budget(agent_name: str) -> int:
+    return settings.HISTORY_TOKEN_BUDGETS.get(agent_name, settings.HISTORY_DEFAULT_TOKEN_BUDGET)
+
+
+def compact_history(items: List[Dict[str, Any]], agent_name: str) -> CompactionResult:
+    """
+    Shrinks the stored history before it is sent to `agent_name`.
+
+    The most recent `HISTORY_RECENT_TURNS` turns are kept verbatim. Tool calls in older
+    turns are collapsed into short summaries, and if the history still exceeds the
+    agent's token budget the oldest turns are dropped.
+    """
+    tokens_before = count_history_tokens(items)
+    turns = _split_turns(items)
+
+    recent_turn_count = settings.HISTORY_RECENT_TURNS
+    stale_turns = turns[:-recent_turn_count] if recent_turn_count else turns
+    recent_turns = turns[len(stale_turns):]
+
+    stale_turns = [
+        _collapse_tool_calls(turn, settings.HISTORY_TOOL_SUMMARY_CHARS) for turn in stale_turns
+    ]
+
+    budget = get_token_budget(agent_name)
+    recent_tokens = sum(count_history_tokens(turn) for turn in recent_turns)
+    stale_tokens = [count_history_tokens(turn) for turn in stale_turns]
+
+    # Drop the oldest stale turns until the history fits (recent turns are never dropped).
+    while stale_turns and recent_tokens + sum(stale_tokens) > budget:
+        stale_turns.pop(0)
+        stale_tokens.pop(0)
+
+    compacted = [item for turn in stale_turns + recent_turns for item in turn]
+    result = CompactionResult(
+        items=compacted,
+        tokens_before=tokens_before,
+        tokens_after=recent_tokens + sum(stale_tokens),
+    )
+
+    metrics.observe("history_tokens_before", result.tokens_before, agent=agent_name)
+    metrics.observe("history_tokens_after", result.tokens_after, agent=agent_name)
+    metrics.observe("history_tokens_saved", result.tokens_saved, agent=agent_name)
+    return result
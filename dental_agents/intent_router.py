@@ -0,0 +1,199 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Protocol
+
+from core.config import get_settings
+from core.metrics import metrics
+
+settings = get_settings()
+
+BOOK_INTENT = "book"
+CANCEL_INTENT = "cancel"
+RESCHEDULE_INTENT = "reschedule"
+
+
+@dataclass
+class IntentPrediction:
+    intent: Optional[str]
+    confidence: float
+    source: str
+
+
+class IntentClassifier(Protocol):
+    async def classify(self, message: str) -> IntentPrediction: ...
+
+
+# First-person or polite request phrasing that must come right before the action verb
+_ACTION = (
+    r"(?:\b(?:i|we)(?:'d| would)? (?:like|want|need|have|wish|hope) to"
+    r"|\b(?:i|we)'?(?:m| am|re| are) (?:looking|trying|hoping|calling|writing) to"
+    r"|\bi wanna|\b(?:can|could|may) (?:i|we|you)|\bplease|\bhelp me|\blet me"
+    r"|^(?:need|want|have) to)"
+)
+_BOOK_VERB = r"(?:book|schedule|reserve|(?:make|set up|get) (?:me )?(?:an?|another|a new) (?:\w+ )?appointment)"
+_CANCEL_VERB = r"(?:cancel|call off)"
+_RESCHEDULE_VERB = (
+    r"(?:reschedule|postpone|push back"
+    r"|(?:move|change|shift) (?:my |our |the |this |that )?(?:\w+ )?(?:appointment|booking|visit|it)\b)"
+)
+
+
+def _action_patterns(verb: str) -> List[re.Pattern]:
+    """'I'd like to cancel ...', 'Can you please book ...' and imperative openings like 'Cancel my ...'."""
+    return [
+        re.compile(_ACTION + r"\s+(?:\w+\s+){0,3}?" + verb + r"\b"),
+        re.compile(r"^(?:please\s+)?" + verb + r"\b"),
+    ]
+
+
+class KeywordIntentClassifier:
+    """
+    Cheap regex classifier for the openings that make up most booking and cancellation
+    traffic. Only a single, non-negated request phrased as an action ("I'd like to cancel",
+    "Book me in ...") gets a high confidence. Bare keywords are weak matches that stay
+    below the routing threshold, and questions about the clinic's services, policies or
+    logistics are never routed, even when they mention booking or canceling.
+    """
+
+    ACTION_PATTERNS = {
+        BOOK_INTENT: _action_patterns(_BOOK_VERB) + [
+            re.compile(r"\b(?:i|we)(?:'d| would)? (?:like|want|need) (?:to (?:get|make) )?(?:an?|another|a new) (?:\w+ )?appointment\b"),
+        ],
+        CANCEL_INTENT: _action_patterns(_CANCEL_VERB),
+        RESCHEDULE_INTENT: _action_patterns(_RESCHEDULE_VERB),
+    }
+    KEYWORD_PATTERNS = {
+        BOOK_INTENT: [
+            re.compile(r"\b(book|schedule|reserve)\b"),
+            re.compile(r"\b(available|availability|free slots?|openings?|any slots?)\b"),
+        ],
+        CANCEL_INTENT: [
+            re.compile(r"\b(cancel|cancell?ing|cancell?ation|call off)\b"),
+            re.compile(r"\b(can'?t|cannot|won'?t be able to) (make it|come|attend)\b"),
+        ],
+        RESCHEDULE_INTENT: [
+            re.compile(r"\b(reschedul\w*|postpone|push back)\b"),
+            re.compile(r"\b(move|change|shift)\b.{0,20}\bappointment\b"),
+        ],
+    }
+    # "What's your cancellation policy?", "Do you schedule appointments on Saturdays?"
+    QUESTION_PATTERNS = [
+        re.compile(
+            r"^(what|what'?s|which|how|where|when|why|is|are|do|does)\b.*\b(polic(y|ies)|fees?|charged?|costs?|price"
+            r"|bring|services|hours|insurance|parking|directions|get to|late|saturdays?|sundays?|weekends?)\b"
+        ),
+        re.compile(r"^(do|does) (you|the clinic|your (clinic|office))\b"),
+    ]
+    NEGATION_PATTERN = re.compile(r"\b(don'?t|do not|not|never|no need to)\b\s+(\w+\s+){0,2}?(book|schedule|cancel|reschedule|move)")
+
+    ACTION_CONFIDENCE = 0.9
+    KEYWORD_CONFIDENCE = 0.6
+    AMBIGUOUS_CONFIDENCE = 0.4
+    NEGATED_CONFIDENCE = 0.3
+
+    @staticmethod
+    def _matches(patterns: dict, text: str) -> List[str]:
+        matched = [intent for intent, intent_patterns in patterns.items() if any(p.search(text) for p in intent_patterns)]
+        # "Can't make it, can we move it to Friday?" is a reschedule, not a cancel or a booking.
+        return [RESCHEDULE_INTENT] if RESCHEDULE_INTENT in matched else matched
+
+    async def classify(self, message: str) -> IntentPrediction:
+        text = message.lower().replace("’", "'").strip()
+        if any(pattern.search(text) for pattern in self.QUESTION_PATTERNS):
+            return IntentPrediction(intent=None, confidence=0.0, source="keyword")
+
+        # An action request ("I need to cancel my appointment") outranks any keyword, so a
+        # weak booking match elsewhere in the message does not make it ambiguous.
+        matched, confidence = self._matches(self.ACTION_PATTERNS, text), self.ACTION_CONFIDENCE
+        if not matched:
+            matched, confidence = self._matches(self.KEYWORD_PATTERNS, text), self.KEYWORD_CONFIDENCE
+
+        if len(matched) != 1:
+            # Nothing matched, or conflicting intents (e.g. "cancel and book another")
+            return IntentPrediction(intent=None, confidence=0.0 if not matched else self.AMBIGUOUS_CONFIDENCE, source="keyword")
+        if self.NEGATION_PATTERN.search(text):
+            return IntentPrediction(intent=matched[0], confidence=self.NEGATED_CONFIDENCE, source="keyword")
+        return IntentPrediction(intent=matched[0], confidence=confidence, source="keyword")
+
+
+class LocalModelIntentClassifier:
+    """
+    Optional fallback that asks a small (ideally local) model for a one-word label.
+    Enabled by setting `INTENT_ROUTER_MODEL`, e.g. `ollama/llama3.2:1b`.
+    """
+
+    PROMPT = (
+        "Classify the dental clinic patient's message. Reply with exactly one word: "
+        "'book' if they want to book an appointment or check availability, "
+        "'cancel' if they want to cancel an appointment, "
+        "'reschedule' if they want to move an existing appointment, otherwise 'other'."
+    )
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def classify(self, message: str) -> IntentPrediction:
+        import litellm
+
+        try:
+            response = await litellm.acompletion(
+                model=self.model,
+                messages=[{"role": "system", "content": self.PROMPT}, {"role": "user", "content": message}],
+                max_tokens=3,
+                temperature=0,
+                timeout=settings.INTENT_ROUTER_MODEL_TIMEOUT_SECONDS,
+            )
+            label = response.choices[0].message.content.strip().lower()
+        except Exception as e:
+            print(f"Intent router model failed, falling back to the receptionist: {e}")
+            return IntentPrediction(intent=None, confidence=0.0, source="model")
+
+        if label in (BOOK_INTENT, CANCEL_INTENT, RESCHEDULE_INTENT):
+            return IntentPrediction(intent=label, confidence=settings.INTENT_ROUTER_MODEL_CONFIDENCE, source="model")
+        return IntentPrediction(intent=None, confidence=0.0, source="model")
+
+
+class IntentRouter:
+    """Runs the classifiers in order and stops at the first confident prediction."""
+
+    def __init__(self, classifiers: List[IntentClassifier], threshold: float):
+        self.classifiers = classifiers
+        self.threshold = threshold
+
+    async def route(self, message: str) -> Optional[IntentPrediction]:
+        metrics.incr("intent_router_requests")
+        for classifier in self.classifiers:
+            prediction = await classifier.classify(message)
+            if prediction.intent and prediction.confidence >= self.threshold:
+                metrics.incr("intent_router_hits", intent=prediction.intent, source=prediction.source)
+                return prediction
+        return None
+
+    @staticmethod
+    def record_outcome(prediction: IntentPrediction, routed_agent_name: str, final_agent_name: str):
+        """A routed run that ends on a different agent means the route was wrong."""
+        if final_agent_name != routed_agent_name:
+            metrics.incr("intent_router_misroutes", intent=prediction.intent)
+
+
+def _router_rates() -> dict:
+    requests = metrics.counter_total("intent_router_requests")
+    hits = metrics.counter_total("intent_router_hits")
+    misroutes = metrics.counter_total("intent_router_misroutes")
+    return {
+        "hit_rate": hits / requests if requests else 0.0,
+        "misroute_rate": misroutes / hits if hits else 0.0,
+    }
+
+
+def build_intent_router() -> Optional[IntentRouter]:
+    if not settings.INTENT_ROUTER_ENABLED:
+        return None
+    classifiers: List[IntentClassifier] = [KeywordIntentClassifier()]
+    if settings.INTENT_ROUTER_MODEL:
+        classifiers.append(LocalModelIntentClassifier(settings.INTENT_ROUTER_MODEL))
+    return IntentRouter(classifiers, threshold=settings.INTENT_ROUTER_CONFIDENCE_THRESHOLD)
+
+
+intent_router = build_intent_router()
+metrics.register_gauge_callback("intent_router", _router_rates)
@@ -1,29 +1,30 @@
-from prompts import build_prompts
+from prompts import make_instructions
 from tools.calendar_tools import (
     find_free_slots,
+    search_availability,
     create_appointment
 )
 from tools.email_tools import send_booking_confirmation
 from core.config import get_settings
+from core.llm import build_agent_model, build_model_settings
 from .context import AssistantContext
 
 from agents import Agent, set_tracing_disabled
-from agents.extensions.models.litellm_model import LitellmModel
 
 settings = get_settings()
 
 set_tracing_disabled(True)
 
-agents_prompts = build_prompts()
-
 scheduler_agent = Agent[AssistantContext](
     name="Scheduler Agent",
-    instructions=agents_prompts["scheduler"],
+    instructions=make_instructions("scheduler"),
     tools=[
         create_appointment,
         find_free_slots,
+        search_availability,
         send_booking_confirmation,
     ],
-    model=LitellmModel(model=settings.DEFAULT_MODEL, api_key=settings.GROQ_API_KEY),
+    model=build_agent_model("scheduler"),
+    model_settings=build_model_settings("scheduler"),
     handoff_description="This agent specializes in appointment booking related tasks.",
 )
@@ -1,24 +1,68 @@
+import asyncio
+
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from pydantic import BaseModel
 
-from core.config import get_settings
+from core.config import get_settings, clinic_config
+from core.metrics import metrics
+from core.llm import close_llm_http_client
+from core.email_client import get_email_http_client, close_email_http_client
+from core.integrations import shutdown_integrations
 from api.db.session import create_db_and_tables
 from api.routers import chat, appointments
+from api.workers.appointment_writer import appointment_writer
+from api.workers.email_outbox import email_outbox_worker
+from api.workers.doctor_digest import doctor_digest_worker
+from api.workers.reminders import reminder_worker
+from api.workers.calendar_sync import calendar_sync_worker
+from api.services.chat_runner import wait_for_active_runs
+from tools.google_client import google_clients
 
 settings = get_settings()
 
+async def preload_google_clients():
+    """Builds every doctor's Google Calendar client before the first request needs it."""
+    scopes = clinic_config['general_config']['google_api_scopes_calendar']
+    loop = asyncio.get_event_loop()
+    timings = await loop.run_in_executor(None, google_clients.preload, scopes)
+    for email, seconds in timings.items():
+        print(f"INFO:     Google Calendar client for {email} ready in {seconds * 1000:.1f} ms.")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # On startup
     print(f"INFO:     Starting up {settings.APP_NAME} v{settings.APP_VERSION}...")
     print("INFO:     Database tables checked/created.")
     create_db_and_tables()
+    await appointment_writer.start()
+    await preload_google_clients()
+    get_email_http_client()
+    if settings.CALENDAR_SYNC_ENABLED:
+        await calendar_sync_worker.start()
+    if settings.EMAIL_OUTBOX_ENABLED:
+        await email_outbox_worker.start()
+    else:
+        print("INFO:     Email outbox disabled; emails are sent directly, without retries.")
+    if settings.DOCTOR_DIGEST_ENABLED:
+        await doctor_digest_worker.start()
+    if settings.REMINDERS_ENABLED:
+        await reminder_worker.start()
     yield
     # On shutdown
     print(f"INFO:     Shutting down {settings.APP_NAME}...")
+    await wait_for_active_runs(timeout=settings.CHAT_RUN_SHUTDOWN_GRACE_SECONDS)
+    await calendar_sync_worker.stop()
+    await reminder_worker.stop()
+    await doctor_digest_worker.stop()
+    await email_outbox_worker.stop()
+    await appointment_writer.stop()
+    print("INFO:     Pending appointments flushed to the database.")
+    await close_llm_http_client()
+    await close_email_http_client()
+    shutdown_integrations()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -56,4 +100,9 @@ app.include_router(config_router, prefix="/api/v1", tags=["Configuration"])
 
 @app.get("/health", tags=["Health"])
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics", tags=["Health"])
+def get_metrics():
+    """Returns a snapshot of the in-process performance metrics."""
+    return metrics.snapshot()
\ No newline at end of file
@@ -1,3 +1,3 @@
-from .prompt_builder import build_prompts
+from .prompt_builder import build_prompts, get_static_prompts, make_instructions
 
-__all__ = ["build_prompts"]
\ No newline at end of file
+__all__ = ["build_prompts", "get_static_prompts", "make_instructions"]
\ No newline at end of file
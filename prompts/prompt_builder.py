@@ -1,59 +1,79 @@
 import pytz
 from datetime import datetime
-from core.config import get_clinic_config
-
-def build_prompts():
+from typing import Any, Callable, Dict, Tuple
+
+from core.config import get_clinic_config_fingerprint, load_clinic_config_file
+from core.metrics import metrics
+
+# Rendered static prompts and the clinic timezone, keyed by the clinic config fingerprint.
+_prompt_cache: Dict[str, Tuple[Dict[str, str], str]] = {}
+
+
+def _render_clinic_details(data: dict) -> str:
+    lines = [
+        "## Clinic Details",
+        f"**Name:** {data['clinic_name']}",
+        f"**Address:** {data['clinic_address']}",
+        "---",
+        "",
+        "### 🕒 Clinic Days and Hours",
+        "",
+        "| Day       | Hours                |",
+        "|-----------|----------------------|",
+    ]
+    lines += [f"| {day:<9} | {hours:<20} |" for day, hours in data["clinic_hours"].items()]
+
+    lines += [
+        "",
+        "",
+        "### Doctors",
+        "",
+        "| Name            | Specialty                    | Email                       |",
+        "|-----------------|------------------------------|-----------------------------|",
+    ]
+    lines += [f"| {doc['name']} | {doc['specialty']} | {doc['email']} |" for doc in data["doctors"]]
+
+    lines += [
+        "",
+        "",
+        "### Services & Durations",
+        "",
+        "| Service                        | Duration (minutes) |",
+        "|--------------------------------|---------------------|",
+    ]
+    lines += [f"| {service:<30} | {duration:<19} |" for service, duration in data["services"].items()]
+    return "\n".join(lines) + "\n"
+
+
+def render_time_context(timezone_str: str) -> str:
     """
-    Loads clinic config and dynamically constructs a comprehensive "Operational Manual"
-    that is shared across all agents, followed by their specific role instructions.
+    The only per-run part of the prompts. It is appended after the static instructions
+    so the (much larger) prefix stays byte-identical across requests.
     """
+    primary_tz = pytz.timezone(timezone_str)
+    now = datetime.now(primary_tz)
+    current_time_str = now.strftime("%A, %B %d, %Y at %I:%M %p %Z")
+    return (
+        "\n---\n# CURRENT SYSTEM TIME\n"
+        f"- **Current Date & Time:** `{now.isoformat()}` ({current_time_str})\n"
+        "- Use this as your absolute reference for all relative time queries like 'today', 'tomorrow', or 'next week'.\n"
+    )
 
-    data = get_clinic_config()
-
-    # A. Current Time Context
-    primary_timezone_str = data["general_config"]["default_timezone"]
-    primary_tz = pytz.timezone(primary_timezone_str)
-    current_time_str = datetime.now(primary_tz).strftime("%A, %B %d, %Y at %I:%M %p %Z")
-    current_time_iso = datetime.now(primary_tz).isoformat()
-    
-    time_context_md = f"## 1. Current System Time\n- **Current Date & Time:** `{current_time_iso}` ({current_time_str})\n- Use this as your absolute reference for all relative time queries like 'today', 'tomorrow', or 'next week'.\n"
-
-    # B. Build structured clinic details
-    clinic_details_md = f"""## 2. Clinic Details
-**Name:** {data['clinic_name']}
-**Address:** {data['clinic_address']}
----
-
-### 🕒 Clinic Days and Hours
-
-| Day       | Hours                |
-|-----------|----------------------|
-"""
-
-    for day, hours in data["clinic_hours"].items():
-        clinic_details_md += f"| {day:<9} | {hours:<20} |\n"
-
-    clinic_details_md += "\n\n### Doctors\n\n"
-
-    clinic_details_md += "| Name            | Specialty                    | Email                       |\n"
-    clinic_details_md += "|-----------------|------------------------------|-----------------------------|\n"
-    for doc in data["doctors"]:
-        clinic_details_md += f"| {doc['name']} | {doc['specialty']} | {doc['email']} |\n"
 
-    clinic_details_md += "\n\n### Services & Durations\n\n"
-    clinic_details_md += "| Service                        | Duration (minutes) |\n"
-    clinic_details_md += "|--------------------------------|---------------------|\n"
-
-    for service, duration in data["services"].items():
-        clinic_details_md += f"| {service:<30} | {duration:<19} |\n"
+def _render_static_prompts(data: dict) -> Dict[str, str]:
+    """
+    Constructs a comprehensive "Operational Manual" shared across all agents,
+    followed by their specific role instructions. Contains nothing time-dependent.
+    """
+    clinic_details_md = _render_clinic_details(data)
 
-    # C. Assemble the complete manual
+    # Assemble the complete manual
     OPERATIONAL_MANUAL = f"""
 # OPERATIONAL MANUAL FOR DENTAL CLINIC
 
 This is your complete source of truth. Refer to this manual for all operational questions.
+The current system time is given at the very end of these instructions.
 
-{time_context_md}
 {clinic_details_md}
 """
     
@@ -73,7 +93,7 @@ Follow these guidelines:
 
 ## Handoff to Specialized Agents
 1. If the patient wants to book an appointment or ask availability for a date, call the `transfer_to_scheduler_agent` tool immediately. 
-2. If the patient wants to cancel appointment, call the `transfer_to_canceling_agent` tool immediately.
+2. If the patient wants to cancel or reschedule (move) an appointment, call the `transfer_to_canceling_agent` tool immediately.
 
 Do NOT say “transferring you to another agent.” Simply continue naturally without telling the user. The respective agent will take over the conversation.
 
@@ -115,12 +135,14 @@ Before you can book an appointment, you MUST collect and validate the following
 1.  **Gather Information:** If the user hasn’t shared full info yet, gently ask one thing at a time. e.g:
     - “What date and time would you prefer?”
     - “What service would you like to book? (e.g., [Mention Our Services] etc.)”
-2.  **Find Available Slots:** Once you have all necessary information, Call `find_free_slots` tool with accurate parameters to check if user's preferred date/time is available. Always check for the whole day (working hours) when calling this tool.
-3.  **Offer Appointment Options:** If the user's mentioned date/time is free, inform them politely. If their preferred time is taken, offer multiple close-by free options.
+2.  **Find Available Slots:** Once you have all necessary information, check availability with a single tool call. Both tools already apply clinic hours, service durations and buffers, and return ready-to-offer slots.
+    - If the patient named a doctor, call the `find_free_slots` tool with the doctor's email, the service, a search window covering the whole day (or days) the user asked about, and their preferred time if they gave one.
+    - If the patient has no doctor preference or asks who is free or for the first opening (e.g. "next week"), call the `search_availability` tool once with the service, the whole search window and, if relevant, a specialty. It checks every suitable doctor at once and lists who is available first.
+3.  **Offer Appointment Options:** If `preferred_time_available` is true, inform them politely. Otherwise offer a few of the returned slots. Only ever offer times that appear in the tool's `slots` list.
 4.  **Gather Information and apply the Golden Rule:**  Once the user agrees on a slot, take information from user step by step. Apply the Golden Rule of Confirmation.
     - **Example:** "Great! Just to be crystal clear, I'm booking a [Service] for [Full Name] on [Date] at [Time]. Shall I go ahead?"
-5.  **Book the Appointment:** Only after they confirm, call the `create_appointment` tool. If the booking call fails, retry once.
-6.  **Send Confirmation:** After a successful booking, inform the user it's confirmed and then call the `send_booking_confirmation` tool to send the email. Tell the user to check their inbox, and spam folder in case they don't find it in inbox.
+5.  **Book the Appointment:** Only after they confirm, call the `create_appointment` tool. If the booking call fails, retry once. If it says the time was just reserved by another patient, apologize, check availability again and offer new slots instead of retrying.
+6.  **Send Confirmation:** After a successful booking, inform the user it's confirmed and then call the `send_booking_confirmation` tool, passing the `google_calendar_event_id` from the booking result, to send the email. Tell the user to check their inbox, and spam folder in case they don't find it in inbox.
 
 ---
 # PRIVACY, RULES & RESTRICTIONS
@@ -134,7 +156,7 @@ When using the tools, make sure you give the correct ISO 8601 format for datetim
 """
     CANCELING_INSTRUCTIONS="""
 # YOUR ROLE
-You are a helpful assistant for our dental clinic. Your goal is to cancel appointment on user's request.
+You are a helpful assistant for our dental clinic. Your goal is to cancel or reschedule appointments on user's request.
 
 ---
 # INFORMATION GATHERING POLICIES
@@ -158,7 +180,17 @@ This is for users who want to cancel an existing booking.
     - **If no appointments are found:** "I'm sorry, I couldn't find any upcoming appointments scheduled for you."
 3.  **Apply the Golden Rule for Cancellation:** If the user confirms they want to cancel, repeat the information before them.
     - **Example:** "Okay, no problem. Just to confirm, I will be **permanently canceling** your appointment for the **Cleaning on Tuesday, June 24th at 2:00 PM**. Is that correct?"
-4.  **Execute & Notify:** After their final confirmation, call `cancel_appointment` tool with the correct `appointment_id`. Then ask the user for their full name and email address (You MUST validate the information). Once you get that, call the `send_cancellation_email` tool and inform the user that their booking is canceled and a confirmation email is on its way.
+4.  **Execute & Notify:** After their final confirmation, call `cancel_appointment` tool with the correct `appointment_id`. Then ask the user for their full name and email address (You MUST validate the information). Once you get that, call the `send_cancellation_email` tool with the `google_calendar_event_id` returned by `cancel_appointment` and inform the user that their booking is canceled and a confirmation email is on its way.
+
+### Workflow: Rescheduling an Appointment
+
+If the user wants to move an appointment to another time, do NOT cancel it and do NOT hand off to the scheduler.
+1.  **Find:** Call the `find_upcoming_appointments` tool and identify the appointment (ask only if there are several).
+2.  **New Time:** Ask for the new date and time if the user has not given it.
+3.  **Confirm:** Apply the Golden Rule, e.g. "Just to confirm, I'll move your **Cleaning** from **Tuesday, June 24th at 2:00 PM** to **Thursday, June 26th at 10:00 AM**. Shall I go ahead?"
+4.  **Reschedule:** After confirmation, call the `reschedule_appointment` tool once with the `appointment_id` and the new start time. It checks availability, updates the booking and emails the patient, so no other tool is needed.
+    - If it returns `unavailable`, offer the returned `alternatives` and call it again with the chosen one.
+    - On success, tell the user the appointment was moved and an email with the new details is on its way.
 ---
 
 # Handoff to Receptionist Agent
@@ -169,3 +201,41 @@ If the patient/user asks questions about our clinic, services, timings, doctors
         'scheduler': SCHEDULER_INSTRUCTIONS,
         'canceling': CANCELING_INSTRUCTIONS
     }
+
+
+def _current_prompts() -> Tuple[Dict[str, str], str]:
+    """Renders the static prompts only once per clinic config version."""
+    fingerprint = get_clinic_config_fingerprint()
+    cached = _prompt_cache.get(fingerprint)
+    if cached is None:
+        data = load_clinic_config_file()
+        cached = (_render_static_prompts(data), data["general_config"]["default_timezone"])
+        # Size of the cacheable prefix per role, for prompt-cache and token accounting.
+        for role, prompt in cached[0].items():
+            metrics.set_gauge("prompt_static_prefix_chars", len(prompt), role=role)
+        _prompt_cache.clear()
+        _prompt_cache[fingerprint] = cached
+    return cached
+
+
+def get_static_prompts() -> Dict[str, str]:
+    return _current_prompts()[0]
+
+
+def make_instructions(role: str) -> Callable[[Any, Any], str]:
+    """
+    Builds a dynamic `instructions` callable for an agent: the cached static prompt for
+    `role` followed by the current-time suffix, evaluated on every run.
+    """
+    def instructions(run_context: Any, agent: Any) -> str:
+        prompts, timezone_str = _current_prompts()
+        return prompts[role] + render_time_context(timezone_str)
+
+    return instructions
+
+
+def build_prompts() -> Dict[str, str]:
+    """Returns fully rendered prompts (static part plus the current time) for every role."""
+    prompts, timezone_str = _current_prompts()
+    time_context = render_time_context(timezone_str)
+    return {role: prompt + time_context for role, prompt in prompts.items()}
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+import pytest
+import pytz
+from googleapiclient.errors import HttpError
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agents.tool_context import ToolContext
+
+from api.models.appointment import Appointment
+from api.security.auth import User
+from core.integrations import CircuitBreaker
+from dental_agents.context import AssistantContext
+from tools import calendar_tools, google_client
+from tools.calendar_mirror import CalendarMirror
+from tools.reminders import ReminderStore
+
+DOCTOR = calendar_tools.config['doctors'][0]
+TZ = pytz.timezone(calendar_tools.config['general_config']['default_timezone'])
+USER = User(id="patient-1", email="ann@example.com", role="patient")
+
+
+class _Request:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self):
+        return self._run()
+
+
+class FakeEvents:
+    """The slice of the Calendar events API the booking tools use, kept in a dict."""
+
+    def __init__(self):
+        self.events = {}
+        self.delete_seconds = 0
+
+    def insert(self, calendarId, body, sendUpdates=None):
+        def run():
+            if body['id'] in self.events:
+                raise HttpError(httplib2.Response({"status": 409}), b"")
+            self.events[body['id']] = {**body, 'status': 'confirmed', 'htmlLink': f"https://calendar/{body['id']}"}
+            return dict(self.events[body['id']])
+        return _Request(run)
+
+    def get(self, calendarId, eventId):
+        return _Request(lambda: dict(self.events[eventId]))
+
+    def update(self, calendarId, eventId, body, sendUpdates=None):
+        def run():
+            self.events[eventId] = {**self.events[eventId], **body}
+            return dict(self.events[eventId])
+        return _Request(run)
+
+    patch = update
+
+    def delete(self, calendarId, eventId):
+        def run():
+            time.sleep(self.delete_seconds)
+            del self.events[eventId]
+        return _Request(run)
+
+
+class FakeService:
+    def __init__(self):
+        self.calendar = FakeEvents()
+
+    def events(self):
+        return self.calendar
+
+
+class FakeSession:
+    def __init__(self, appointment):
+        self.appointment = appointment
+
+    async def exec(self, statement):
+        return self
+
+    def one_or_none(self):
+        return self.appointment
+
+    def add(self, row):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def delete(self, row):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    service = FakeService()
+    monkeypatch.setattr(calendar_tools, "redis_pool", redis)
+    monkeypatch.setattr(calendar_tools, "calendar_mirror", CalendarMirror(redis))
+    monkeypatch.setattr(calendar_tools, "appointment_reminders", ReminderStore(redis))
+    monkeypatch.setattr(calendar_tools, "get_google_service", lambda doctor, scopes: service)
+    monkeypatch.setattr(calendar_tools.settings, "SLOT_HOLDS_ENABLED", False)
+    monkeypatch.setattr(calendar_tools.settings, "REMINDERS_ENABLED", False)
+    monkeypatch.setattr(google_client, "_doctor_semaphores", {})
+    monkeypatch.setattr(google_client.google_calendar_integration, "breaker", CircuitBreaker(100, 30))
+
+    async def no_busy(doctor, conversation_id, time_min, time_max):
+        return []
+
+    async def sent(**kwargs):
+        return {"status": "queued"}
+
+    async def released(event_id):
+        pass
+
+    monkeypatch.setattr(calendar_tools, "_get_bookable_busy", no_busy)
+    monkeypatch.setattr(calendar_tools, "send_reschedule_email", sent)
+    monkeypatch.setattr(calendar_tools, "release_dedupe_keys", released)
+    return service
+
+
+def _invoke(tool, context, **arguments):
+    payload = json.dumps(arguments)
+    tool_context = ToolContext(context=context, tool_name=tool.name, tool_call_id="call-1", tool_arguments=payload)
+    return tool.on_invoke_tool(tool_context, payload)
+
+
+def _next_monday(hour: int) -> datetime:
+    today = datetime.now(TZ).date()
+    monday = today + timedelta(days=7 - today.weekday())
+    return TZ.localize(datetime(monday.year, monday.month, monday.day, hour))
+
+
+def _appointment(start: datetime, event_id: str) -> Appointment:
+    return Appointment(
+        id=1, patient_name="Ann Lee", patient_email="ann@example.com", patient_supabase_id=USER.id,
+        doctor_name=DOCTOR['name'], doctor_email=DOCTOR['email'], clinic_address="Clinic",
+        service_type="Teeth Whitening", start_time=start, end_time=start + timedelta(minutes=30),
+        google_calendar_event_id=event_id, google_calendar_event_link="",
+    )
+
+
+def test_rebooking_a_slot_after_rescheduling_away_from_it_creates_a_new_event(service):
+    original, moved = _next_monday(10), _next_monday(14)
+    booking = {
+        "patient_name": "Ann Lee",
+        "patient_email": "ann@example.com",
+        "doctor_email": DOCTOR['email'],
+        "start_datetime_iso": original.isoformat(),
+        "event_duration_minutes": 30,
+        "service_type": "Teeth Whitening",
+    }
+
+    async def scenario():
+        context = AssistantContext(db=None, user=USER, conversation_id="conv-1")
+        first = await _invoke(calendar_tools.create_appointment, context, **booking)
+        first_id = first["appointment_details"]["google_calendar_event_id"]
+
+        context.db = FakeSession(_appointment(original, first_id))
+        rescheduled = json.loads(await _invoke(
+            calendar_tools.reschedule_appointment, context, appointment_id=1, new_start_datetime_iso=moved.isoformat()
+        ))
+        assert rescheduled["status"] == "success"
+
+        second = await _invoke(calendar_tools.create_appointment, context, **booking)
+        repeated = await _invoke(calendar_tools.create_appointment, context, **booking)
+        return first_id, second, repeated
+
+    first_id, second, repeated = asyncio.run(scenario())
+
+    assert second["status"] == "success"
+    second_id = second["appointment_details"]["google_calendar_event_id"]
+    assert second_id != first_id
+    assert repeated == second
+    events = service.calendar.events
+    assert len(events) == 2
+    assert calendar_tools.date_parse(events[first_id]['start']['dateTime']) == moved
+    assert calendar_tools.date_parse(events[second_id]['start']['dateTime']) == original
+
+
+def test_a_slow_calendar_delete_does_not_stall_other_streams(service):
+    start = _next_monday(10)
+    service.calendar.events["evt1"] = {"id": "evt1", "status": "confirmed"}
+    service.calendar.delete_seconds = 0.3
+    context = AssistantContext(db=FakeSession(_appointment(start, "evt1")), user=USER, conversation_id="conv-1")
+
+    async def stream_tokens(done: asyncio.Event) -> int:
+        # Stands in for another conversation's token stream sharing the event loop.
+        tokens = 0
+        while not done.is_set():
+            tokens += 1
+            await asyncio.sleep(0.005)
+        return tokens
+
+    async def scenario():
+        done = asyncio.Event()
+        producer = asyncio.create_task(stream_tokens(done))
+        started = time.perf_counter()
+        result = await _invoke(calendar_tools.cancel_appointment, context, appointment_id=1, doctor_email=DOCTOR['email'])
+        elapsed = time.perf_counter() - started
+        done.set()
+        return json.loads(result), elapsed, await producer
+
+    result, elapsed, tokens = asyncio.run(scenario())
+
+    assert result["status"] == "success"
+    assert "evt1" not in service.calendar.events
+    assert elapsed >= 0.3
+    # A blocked loop would yield one or two tokens; a free one keeps ticking throughout.
+    assert tokens >= 20
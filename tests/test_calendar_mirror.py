@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from tools.calendar_mirror import CalendarMirror, is_blocking_event, parse_event_interval, settings
+
+CALENDAR = "dr.carter@example.com"
+TZ = pytz.timezone("America/New_York")
+NINE = datetime(2030, 3, 4, 14, 0, tzinfo=pytz.utc)  # 9 AM in New York
+
+
+def _event(event_id: str, start: datetime, minutes: int = 30, **extra):
+    return {
+        "id": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat()},
+        **extra,
+    }
+
+
+@pytest.fixture
+def mirror():
+    return CalendarMirror(fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+
+def test_event_helpers():
+    assert parse_event_interval({"start": {"date": "2030-03-04"}, "end": {"date": "2030-03-05"}}, TZ) == (
+        TZ.localize(datetime(2030, 3, 4)), TZ.localize(datetime(2030, 3, 5)),
+    )
+    assert parse_event_interval({"start": {}, "end": {}}, TZ) is None
+    assert not is_blocking_event({"status": "cancelled"})
+    assert not is_blocking_event({"transparency": "transparent"})
+    assert is_blocking_event({"status": "confirmed"})
+
+
+def test_unsynced_or_stale_mirror_is_a_miss(mirror, monkeypatch):
+    async def scenario():
+        assert await mirror.get_busy(CALENDAR, NINE, NINE + timedelta(hours=8)) is None
+        await mirror.mark_synced(CALENDAR, "token-1")
+        assert await mirror.get_busy(CALENDAR, NINE, NINE + timedelta(hours=8)) == []
+        assert await mirror.get_sync_token(CALENDAR) == "token-1"
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + settings.CALENDAR_MIRROR_MAX_STALENESS_SECONDS + 1)
+        assert await mirror.get_busy(CALENDAR, NINE, NINE + timedelta(hours=8)) is None
+
+    asyncio.run(scenario())
+
+
+def test_applied_events_are_upserted_moved_and_removed(mirror):
+    async def scenario():
+        await mirror.mark_synced(CALENDAR, None)
+        await mirror.apply_events(CALENDAR, [
+            _event("a", NINE),
+            _event("b", NINE + timedelta(hours=2)),
+            _event("free", NINE + timedelta(hours=3), transparency="transparent"),
+        ], TZ)
+        window = (NINE - timedelta(hours=1), NINE + timedelta(hours=8))
+        assert await mirror.get_busy(CALENDAR, *window) == [
+            (NINE, NINE + timedelta(minutes=30)),
+            (NINE + timedelta(hours=2), NINE + timedelta(hours=2, minutes=30)),
+        ]
+
+        # An update replaces the event's old interval; a cancellation removes it.
+        await mirror.apply_events(CALENDAR, [_event("a", NINE + timedelta(hours=4)), {"id": "b", "status": "cancelled"}], TZ)
+        assert await mirror.get_busy(CALENDAR, *window) == [(NINE + timedelta(hours=4), NINE + timedelta(hours=4, minutes=30))]
+
+        await mirror.remove_event(CALENDAR, "a")
+        await mirror.upsert_event(CALENDAR, "ours", NINE, NINE + timedelta(hours=1))
+        assert await mirror.get_busy(CALENDAR, *window) == [(NINE, NINE + timedelta(hours=1))]
+
+    asyncio.run(scenario())
+
+
+def test_busy_window_includes_events_that_started_before_it(mirror):
+    async def scenario():
+        await mirror.mark_synced(CALENDAR, None)
+        await mirror.apply_events(CALENDAR, [_event("long", NINE, minutes=180), _event("early", NINE, minutes=30)], TZ)
+        return await mirror.get_busy(CALENDAR, NINE + timedelta(hours=1), NINE + timedelta(hours=2))
+
+    assert asyncio.run(scenario()) == [(NINE, NINE + timedelta(hours=3))]
+
+
+def test_prune_drops_long_finished_events(mirror):
+    async def scenario():
+        await mirror.mark_synced(CALENDAR, None)
+        old = NINE - timedelta(days=30)
+        await mirror.apply_events(CALENDAR, [_event("old", old), _event("new", NINE)], TZ)
+        await mirror.prune(CALENDAR, NINE - timedelta(days=1))
+        busy = await mirror.get_busy(CALENDAR, old - timedelta(days=1), NINE + timedelta(days=1))
+        assert busy == [(NINE, NINE + timedelta(minutes=30))]
+        assert await mirror.redis.hkeys(f"calendar_busy_events:{CALENDAR}") == ["new"]
+
+    asyncio.run(scenario())
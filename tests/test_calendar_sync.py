@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httplib2
+import pytest
+import pytz
+from dateutil.parser import parse as date_parse
+from googleapiclient.errors import HttpError
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import dental_agents  # noqa: F401  Imports the calendar tools in the order the app does
+from api.workers import calendar_sync
+from tools import google_client
+from tools.calendar_mirror import CalendarMirror
+
+DOCTOR = calendar_sync.clinic_config['doctors'][0]
+
+
+class _Request:
+    def __init__(self, outcome):
+        self._outcome = outcome
+
+    def execute(self):
+        if isinstance(self._outcome, BaseException):
+            raise self._outcome
+        return self._outcome
+
+
+class FakeService:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.requests.append(params)
+        return _Request(self.outcomes.pop(0))
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setattr(google_client, "_doctor_semaphores", {})
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return calendar_sync.CalendarSyncWorker(redis, CalendarMirror(redis))
+
+
+def test_full_syncs_start_at_the_mirror_horizon(worker, monkeypatch):
+    service = FakeService(
+        {"items": [], "nextPageToken": "page-2"},
+        {"items": [], "nextSyncToken": "token-1"},
+        {"items": [], "nextSyncToken": "token-2"},
+        HttpError(httplib2.Response({"status": 410}), b""),
+        {"items": [], "nextSyncToken": "token-3"},
+    )
+    monkeypatch.setattr(calendar_sync, "get_google_service", lambda doctor, scopes: service)
+
+    async def scenario():
+        for _ in range(3):  # Full sync (two pages), incremental sync, expired token
+            await worker.sync_calendar(DOCTOR)
+        return await worker.mirror.get_sync_token(DOCTOR['calendar_id'])
+
+    started = datetime.now(pytz.utc)
+    assert asyncio.run(scenario()) == "token-3"
+
+    full, second_page, incremental, expired, resync = service.requests
+    horizon = worker.mirror.horizon(started)
+    for request in (full, second_page, resync):
+        assert "syncToken" not in request
+        assert horizon <= date_parse(request["timeMin"]) < horizon + timedelta(minutes=1)
+    assert second_page["pageToken"] == "page-2"
+    for request, token in ((incremental, "token-1"), (expired, "token-2")):
+        assert request["syncToken"] == token
+        assert "timeMin" not in request
@@ -0,0 +1,77 @@
+import asyncio
+import contextlib
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from api.db.conversation_store import ConversationStore
+from api.db.event_log import ConversationEventLog
+from api.security.auth import User
+from api.services import chat_runner
+
+USER = User(id="patient-1", email="ann@example.com", role="patient")
+
+
+class _Item:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def to_input_item(self):
+        return self.raw
+
+
+class FakeResult:
+    def __init__(self, new_items, last_agent):
+        self.new_items = [_Item(item) for item in new_items]
+        self.last_agent = last_agent
+
+    async def stream_events(self):
+        return
+        yield
+
+
+def _tool_turn(n):
+    return [
+        {"role": "user", "content": f"question {n}"},
+        {"type": "function_call", "call_id": f"call-{n}", "name": "find_free_slots", "arguments": "{}"},
+        {"type": "function_call_output", "call_id": f"call-{n}", "output": "slots"},
+        {"role": "assistant", "content": f"answer {n}"},
+    ]
+
+
+def test_saving_a_turn_after_compaction_keeps_the_stored_history_verbatim(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(chat_runner, "redis_pool", redis)
+    monkeypatch.setattr(chat_runner, "intent_router", None)
+    monkeypatch.setattr(chat_runner, "faq_cache", None)
+    monkeypatch.setattr(chat_runner, "async_session_maker", lambda: contextlib.nullcontext())
+    monkeypatch.setattr(chat_runner.settings, "HISTORY_RECENT_TURNS", 1)
+
+    history = _tool_turn(1) + _tool_turn(2)
+    reply = {"role": "assistant", "content": "Booked!"}
+    seen_inputs = []
+
+    class FakeRunner:
+        @staticmethod
+        def run_streamed(agent, run_input, context):
+            seen_inputs.append(run_input)
+            return FakeResult([reply], agent)
+
+    monkeypatch.setattr(chat_runner, "Runner", FakeRunner)
+
+    async def scenario():
+        store = ConversationStore(redis, USER.id, "conv-1")
+        await store.append(history, chat_runner.DEFAULT_AGENT_NAME)
+        event_log = ConversationEventLog(redis, USER.id, "conv-1")
+        await event_log.acquire_run("run-1")
+        await chat_runner._execute_run(event_log, "run-1", USER, "conv-1", "book it", False)
+        return await store.load()
+
+    stored, last_agent = asyncio.run(scenario())
+
+    # The agent saw the older turn's tool call collapsed into a note...
+    assert not any(item.get("type") == "function_call" and item["call_id"] == "call-1" for item in seen_inputs[0])
+    # ...but Redis still holds every original item, followed by this turn.
+    assert stored == history + [{"role": "user", "content": "book it"}, reply]
+    assert last_agent == chat_runner.DEFAULT_AGENT_NAME
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import Session, SQLModel, select
+
+from api.db import session as db_session
+from api.models.appointment import Appointment
+
+EVENT_INDEX = "ix_appointment_google_calendar_event_id"
+
+
+def _appointment(event_id: str) -> Appointment:
+    start = datetime(2030, 1, 7, 10, tzinfo=timezone.utc)
+    return Appointment(
+        patient_name="Ann Lee", patient_email="ann@example.com", patient_supabase_id="patient-1",
+        doctor_name="Dr. Carter", doctor_email="dr.carter@example.com", clinic_address="Clinic",
+        service_type="Teeth Whitening", start_time=start, end_time=start,
+        google_calendar_event_id=event_id, google_calendar_event_link="",
+    )
+
+
+@pytest.fixture
+def legacy_engine(monkeypatch):
+    """A database created before the unique event ID index existed, holding duplicate rows."""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX {EVENT_INDEX}"))
+    with Session(engine) as session:
+        session.add_all([_appointment("evt-1"), _appointment("evt-1"), _appointment("evt-2")])
+        session.commit()
+    monkeypatch.setattr(db_session, "engine", engine)
+    return engine
+
+
+def _index_names(engine) -> set:
+    return {index["name"] for index in inspect(engine).get_indexes("appointment")}
+
+
+def test_duplicates_are_removed_before_the_unique_index_is_added(legacy_engine):
+    db_session.create_db_and_tables()
+
+    assert EVENT_INDEX in _index_names(legacy_engine)
+    with Session(legacy_engine) as session:
+        rows = session.exec(select(Appointment).order_by(Appointment.id)).all()
+    assert [(row.id, row.google_calendar_event_id) for row in rows] == [(1, "evt-1"), (3, "evt-2")]
+
+
+def test_an_index_that_cannot_be_built_does_not_stop_startup(legacy_engine, monkeypatch, capsys):
+    monkeypatch.setitem(db_session._INDEX_MIGRATIONS, EVENT_INDEX, lambda connection: None)
+
+    db_session.create_db_and_tables()
+
+    assert EVENT_INDEX not in _index_names(legacy_engine)
+    assert f"Could not create index {EVENT_INDEX}" in capsys.readouterr().out
+    with Session(legacy_engine) as session:
+        assert len(session.exec(select(Appointment)).all()) == 3
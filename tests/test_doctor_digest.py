@@ -0,0 +1,106 @@
+import asyncio
+import contextlib
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+import pytz
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from api.models.appointment import Appointment
+from api.workers import doctor_digest
+from api.workers.doctor_digest import LAST_SENT_KEY, DoctorDigestWorker, current_period_start
+
+TZ = pytz.timezone("America/New_York")
+DOCTORS = doctor_digest.clinic_config['doctors']
+
+
+def _at(hour: int, minute: int = 0) -> datetime:
+    return TZ.localize(datetime(2030, 3, 5, hour, minute))
+
+
+@pytest.mark.parametrize("frequency, now, expected", [
+    ("daily", _at(6, 59), TZ.localize(datetime(2030, 3, 4, 7))),  # Before the digest hour: yesterday's period
+    ("daily", _at(7), _at(7)),
+    ("daily", _at(15, 30), _at(7)),
+    ("hourly", _at(15, 42), _at(15)),
+])
+def test_current_period_start(monkeypatch, frequency, now, expected):
+    monkeypatch.setattr(doctor_digest.settings, "DOCTOR_DIGEST_FREQUENCY", frequency)
+    monkeypatch.setattr(doctor_digest.settings, "DOCTOR_DIGEST_HOUR", 7)
+    assert current_period_start(now, TZ) == expected
+
+
+def _personalization(email: str, body: str = "digest"):
+    return {"to": [{"email": email}], "substitutions": {"-digest_html-": body, "-digest_text-": body}}
+
+
+def test_batches_split_at_the_personalization_limit_and_isolate_large_digests():
+    small = [_personalization(f"dr{n}@example.com") for n in range(2100)]
+    large = _personalization("busy@example.com", "x" * 10001)
+
+    batches = DoctorDigestWorker._batches(small[:1500] + [large] + small[1500:])
+
+    assert [len(batch) for batch in batches] == [1000, 1, 1000, 100]
+    assert batches[1] == [large]
+    assert [p for batch in batches for p in batch if p is not large] == small
+
+
+class FakeSession:
+    def __init__(self, appointments):
+        self.appointments = appointments
+
+    async def exec(self, statement):
+        return self
+
+    def all(self):
+        return self.appointments
+
+
+def _appointment(doctor, now):
+    return Appointment(
+        patient_name="Ann Lee", patient_email="ann@example.com", patient_supabase_id="patient-1",
+        doctor_name=doctor['name'], doctor_email=doctor['email'], clinic_address="Clinic",
+        service_type="Teeth Whitening", start_time=now + timedelta(days=2), end_time=now + timedelta(days=2, hours=1),
+        google_calendar_event_id=f"evt-{doctor['email']}", google_calendar_event_link="", created_at=now,
+    )
+
+
+def test_last_sent_advances_only_for_digests_sendgrid_accepted(monkeypatch):
+    now = datetime.now(pytz.utc)
+    appointments = [_appointment(doctor, now) for doctor in DOCTORS]
+    # What the query returns for the doctors still due: both, then only the one whose send failed.
+    query_results = [appointments, appointments[1:]]
+    monkeypatch.setattr(
+        doctor_digest, "async_session_maker", lambda: contextlib.nullcontext(FakeSession(query_results.pop(0)))
+    )
+    monkeypatch.setattr(doctor_digest, "_MAX_PERSONALIZATIONS", 1)  # One request per doctor
+
+    statuses = [202, 400]
+    sent_to = []
+
+    async def send_mail(payload):
+        sent_to.append(payload["personalizations"][0]["to"][0]["email"])
+        return httpx.Response(statuses.pop(0), text="rejected")
+
+    monkeypatch.setattr(doctor_digest, "send_mail", send_mail)
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    worker = DoctorDigestWorker(redis)
+
+    async def scenario():
+        with pytest.raises(RuntimeError, match="SendGrid rejected"):
+            await worker.send_due_digests()
+        after_failure = await redis.hgetall(LAST_SENT_KEY)
+
+        statuses.append(202)
+        sent = await worker.send_due_digests()  # Only the doctor whose digest failed is still due
+        return after_failure, sent, await redis.hgetall(LAST_SENT_KEY)
+
+    after_failure, sent, after_retry = asyncio.run(scenario())
+
+    first, second = (doctor['email'] for doctor in DOCTORS)
+    assert sent_to == [first, second, second]
+    assert set(after_failure) == {first}
+    assert sent == 1
+    assert set(after_retry) == {first, second}
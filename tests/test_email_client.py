@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from core import email_client
+
+
+@pytest.fixture
+def mock_sendgrid(monkeypatch):
+    """Routes the pooled client to an in-process transport and records what it receives."""
+    requests = []
+    responses = iter([])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return next(responses, httpx.Response(202))
+
+    real_client = httpx.AsyncClient
+
+    def client_factory(**kwargs):
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(email_client.httpx, "AsyncClient", client_factory)
+    monkeypatch.setattr(email_client, "_http_client", None)
+
+    def respond_with(*queued):
+        nonlocal responses
+        responses = iter(queued)
+
+    yield requests, respond_with
+    asyncio.run(email_client.close_email_http_client())
+
+
+def test_client_is_created_once_and_reused(mock_sendgrid):
+    async def scenario():
+        first = email_client.get_email_http_client()
+        assert email_client.get_email_http_client() is first
+        await email_client.send_mail({"n": 1})
+        await email_client.send_mail({"n": 2})
+        assert email_client.get_email_http_client() is first
+        return first
+
+    client = asyncio.run(scenario())
+    requests, _ = mock_sendgrid
+    assert [request.url.path for request in requests] == ["/v3/mail/send", "/v3/mail/send"]
+    assert all(request.headers["Authorization"].startswith("Bearer ") for request in requests)
+    assert str(client.base_url).startswith(email_client.settings.SENDGRID_API_BASE_URL)
+
+
+def test_closed_client_is_replaced(mock_sendgrid):
+    async def scenario():
+        first = email_client.get_email_http_client()
+        await email_client.close_email_http_client()
+        assert first.is_closed
+        second = email_client.get_email_http_client()
+        await email_client.send_mail({})
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second is not first and not second.is_closed
+
+
+def test_send_mail_raises_only_for_retryable_statuses(mock_sendgrid):
+    _, respond_with = mock_sendgrid
+    respond_with(httpx.Response(400, text="bad request"), httpx.Response(429), httpx.Response(503))
+
+    async def scenario():
+        rejected = await email_client.send_mail({})
+        assert rejected.status_code == 400
+        for status_code in (429, 503):
+            with pytest.raises(httpx.HTTPStatusError) as error:
+                await email_client.send_mail({})
+            assert error.value.response.status_code == status_code
+
+    asyncio.run(scenario())
+
+
+def test_deliver_email_sends_html_and_text_through_the_shared_client(mock_sendgrid):
+    requests, _ = mock_sendgrid
+
+    async def scenario():
+        response = await email_client.deliver_email("patient@example.com", "Hello", "<p>Hi</p>", "Hi")
+        await email_client.deliver_email("doctor@example.com", "Hello", "<p>Hi</p>")
+        return response
+
+    assert asyncio.run(scenario()).status_code == 202
+    first, second = (json.loads(request.content) for request in requests)
+    assert first["personalizations"][0]["to"] == [{"email": "patient@example.com"}]
+    assert [content["type"] for content in first["content"]] == ["text/plain", "text/html"]
+    assert [content["type"] for content in second["content"]] == ["text/html"]
@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+from tools.email_templates import (
+    DOCTOR_DIGEST,
+    DOCTOR_NOTIFICATION,
+    PATIENT_CONFIRMATION,
+    render_email,
+)
+
+NAME = '<script>alert("x")</script>'
+TAG = re.compile(r"</?[a-zA-Z!][^>]*>")
+
+CONFIRMATION = dict(
+    patient_name=NAME, service_type="Teeth Whitening", formatted_date="Monday, March 04, 2030",
+    formatted_time="10:00 AM", duration_minutes=60, doctor_name="Dr. Emily Carter",
+    clinic_address="216 Dental Way", google_event_link="https://calendar.google.com/event?eid=1",
+    patient_add_to_calendar_link="https://www.google.com/calendar/render?action=TEMPLATE&text=A",
+)
+NOTIFICATION = dict(
+    doctor_name="Dr. Emily Carter", patient_name=NAME, patient_email="ann@example.com",
+    service_type="Teeth Whitening", formatted_date="Monday, March 04, 2030", formatted_time="10:00 AM",
+    google_event_link="https://calendar.google.com/event?eid=1",
+)
+DIGEST = dict(
+    doctor_name="Dr. Emily Carter",
+    new_bookings=[{"when": "Mar 04, 10:00 AM", "patient_name": NAME, "patient_email": "ann@example.com", "service_type": "Teeth Whitening"}],
+    upcoming=[{"when": "Mar 04, 10:00 AM", "patient_name": NAME, "service_type": "Teeth Whitening"}],
+    since="Mar 03, 08:00 AM", period_label="Monday, March 04",
+)
+
+
+@pytest.mark.parametrize("name, context", [
+    (PATIENT_CONFIRMATION, CONFIRMATION),
+    (DOCTOR_NOTIFICATION, NOTIFICATION),
+    (DOCTOR_DIGEST, DIGEST),
+], ids=["confirmation", "doctor-notification", "digest"])
+def test_values_are_escaped_in_html_and_verbatim_in_text(name, context):
+    email = render_email(name, **context)
+
+    assert "<script>" not in email.html
+    assert "&lt;script&gt;alert(&#34;x&#34;)&lt;/script&gt;" in email.html
+
+    # The text part carries the name as typed, and none of the template's markup.
+    assert NAME in email.text
+    assert "&lt;" not in email.text
+    assert not TAG.search(email.text.replace(NAME, ""))
+
+
+def test_text_part_keeps_links_readable():
+    text = render_email(PATIENT_CONFIRMATION, **{**CONFIRMATION, "patient_name": "Ann Lee"}).text
+
+    assert text.startswith("Your Appointment is Confirmed!\n\nDear Ann Lee,")
+    assert f"Add to Your Calendar: {CONFIRMATION['patient_add_to_calendar_link']}" in text
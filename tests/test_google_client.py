@@ -0,0 +1,207 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+import httplib2
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.errors import HttpError
+
+from core.integrations import CircuitBreaker
+from tools import google_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_limits(monkeypatch):
+    """Per-doctor semaphores and the breaker are process-wide; give each test its own."""
+    monkeypatch.setattr(google_client, "_doctor_semaphores", {})
+    monkeypatch.setattr(google_client.google_calendar_integration, "breaker", CircuitBreaker(100, 30))
+    monkeypatch.setattr(
+        google_client.google_calendar_integration, "_slots", asyncio.Semaphore(google_client.settings.GOOGLE_API_MAX_WORKERS)
+    )
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_RETRY_BASE_DELAY_SECONDS", 0)
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_MAX_RETRIES", 2)
+
+
+def _http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+def _flaky(*outcomes):
+    """A blocking call that raises/returns the given outcomes in turn, counting its attempts."""
+    attempts = []
+
+    def call():
+        outcome = outcomes[len(attempts)]
+        attempts.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    return call, attempts
+
+
+def test_each_thread_gets_its_own_reused_transport():
+    transport = google_client._ThreadLocalTransport(credentials=object())
+    main_http = transport.http()
+    assert transport.http() is main_http
+
+    seen = []
+    worker = threading.Thread(target=lambda: seen.extend([transport.http(), transport.http()]))
+    worker.start()
+    worker.join()
+    assert seen[0] is seen[1]
+    assert seen[0] is not main_http
+
+
+def test_doctor_concurrency_limit_and_overrides(monkeypatch):
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_MAX_CONCURRENCY_PER_DOCTOR", 3)
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_DOCTOR_CONCURRENCY", {"busy@example.com": 1})
+    lock = threading.Lock()
+    running = {"busy@example.com": 0, "other@example.com": 0}
+    peak = dict(running)
+
+    def call(doctor):
+        def run():
+            with lock:
+                running[doctor] += 1
+                peak[doctor] = max(peak[doctor], running[doctor])
+            time.sleep(0.02)
+            with lock:
+                running[doctor] -= 1
+        return run
+
+    async def scenario():
+        await asyncio.gather(*(
+            google_client.run_calendar_call(doctor, call(doctor))
+            for doctor in running
+            for _ in range(6)
+        ))
+
+    asyncio.run(scenario())
+    assert peak == {"busy@example.com": 1, "other@example.com": 3}
+
+
+def test_transient_errors_are_retried():
+    call, attempts = _flaky(_http_error(503), ConnectionResetError(), "event")
+    assert asyncio.run(google_client.run_calendar_call("dr@example.com", call)) == "event"
+    assert len(attempts) == 3
+
+
+def test_retries_give_up_after_the_limit():
+    call, attempts = _flaky(_http_error(429), _http_error(500), _http_error(502))
+    with pytest.raises(HttpError):
+        asyncio.run(google_client.run_calendar_call("dr@example.com", call))
+    assert len(attempts) == 3
+
+
+@pytest.mark.parametrize("status", [400, 404, 409])
+def test_client_errors_are_not_retried(status):
+    call, attempts = _flaky(_http_error(status), "event")
+    with pytest.raises(HttpError):
+        asyncio.run(google_client.run_calendar_call("dr@example.com", call))
+    assert len(attempts) == 1
+
+
+def test_unsafe_calls_can_opt_out_of_retries():
+    call, attempts = _flaky(_http_error(503), "event")
+    with pytest.raises(HttpError):
+        asyncio.run(google_client.run_calendar_call("dr@example.com", call, retry=False))
+    assert len(attempts) == 1
+
+
+def test_each_attempt_has_a_deadline(monkeypatch):
+    monkeypatch.setattr(google_client.google_calendar_integration, "timeout", 0.01)
+    attempts = []
+
+    def slow():
+        attempts.append(1)
+        time.sleep(0.05)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await google_client.run_calendar_call("dr@example.com", slow)
+        await asyncio.sleep(0.1)  # Let the abandoned threads finish and free their slots
+        return google_client.google_calendar_integration.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == 0
+    assert len(attempts) == 3
+
+
+class FakeCalendarHttp(httplib2.Http):
+    """
+    Answers Calendar API requests locally. It records which threads used each instance
+    and how many requests per calendar were in flight, and echoes the requested IDs
+    back so a response delivered to the wrong caller would be noticed.
+    """
+
+    lock = threading.Lock()
+    instances = []
+    running = {}
+    peak = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+        self.in_use = False
+        self.overlapped = False
+        with self.lock:
+            self.instances.append(self)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        self.threads.add(threading.get_ident())
+        self.overlapped = self.overlapped or self.in_use
+        self.in_use = True
+        # .../calendars/{calendarId}/events/{eventId}
+        parts = [unquote(part) for part in urlparse(uri).path.split("/")]
+        calendar_id, event_id = parts[-3], parts[-1]
+        with self.lock:
+            self.running[calendar_id] = self.running.get(calendar_id, 0) + 1
+            self.peak[calendar_id] = max(self.peak.get(calendar_id, 0), self.running[calendar_id])
+        time.sleep(0.002)
+        with self.lock:
+            self.running[calendar_id] -= 1
+        self.in_use = False
+        content = json.dumps({"id": event_id, "organizer": {"email": calendar_id}}).encode()
+        return httplib2.Response({"status": 200, "content-type": "application/json"}), content
+
+
+def test_concurrent_calls_through_shared_clients_stay_on_their_thread(monkeypatch):
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_MAX_CONCURRENCY_PER_DOCTOR", 4)
+    monkeypatch.setattr(google_client.settings, "GOOGLE_API_DOCTOR_CONCURRENCY", {"dr.a@example.com": 2})
+    monkeypatch.setattr(FakeCalendarHttp, "instances", [])
+    monkeypatch.setattr(FakeCalendarHttp, "running", {})
+    monkeypatch.setattr(FakeCalendarHttp, "peak", {})
+    monkeypatch.setattr(google_client.httplib2, "Http", FakeCalendarHttp)
+    monkeypatch.setattr(
+        google_client.service_account.Credentials, "from_service_account_info",
+        lambda info, scopes: AnonymousCredentials(),
+    )
+    monkeypatch.setenv("STRESS_CREDS_B64", base64.b64encode(b"{}").decode())
+    doctors = [
+        {"email": f"dr.{name}@example.com", "name": f"Dr. {name}", "google_credentials_env_var": "STRESS_CREDS"}
+        for name in "abc"
+    ]
+    factory = google_client.GoogleCalendarClientFactory(doctors)
+
+    async def fetch(doctor_email, n):
+        service = factory.get(doctor_email, ["calendar"])
+        event = await google_client.run_calendar_call(
+            doctor_email, lambda: service.events().get(calendarId=doctor_email, eventId=f"evt{n}").execute()
+        )
+        return doctor_email, n, event
+
+    async def scenario():
+        return await asyncio.gather(*(fetch(doctor["email"], n) for n in range(100) for doctor in doctors))
+
+    results = asyncio.run(scenario())
+
+    assert len(results) == 300
+    assert all(event == {"id": f"evt{n}", "organizer": {"email": email}} for email, n, event in results)
+    used = [http for http in FakeCalendarHttp.instances if http.threads]
+    assert used and all(len(http.threads) == 1 and not http.overlapped for http in used)
+    assert FakeCalendarHttp.peak["dr.a@example.com"] <= 2
+    assert all(FakeCalendarHttp.peak[doctor["email"]] <= 4 for doctor in doctors)
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.integrations import CircuitBreaker, CircuitOpenError, Integration
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    breaker.record_success()  # A success resets the count
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_lets_one_trial_through_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # Only one trial at a time
+
+    breaker.record_failure()  # A failed trial re-opens the circuit
+    assert breaker.state == "open"
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_ignored_trial_frees_the_half_open_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_ignored()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_bulkhead_caps_concurrent_async_calls():
+    async def scenario():
+        integration = Integration("test_async", max_concurrency=2, timeout=5)
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "ok"
+
+        results = await asyncio.gather(*(integration.run_async(call) for _ in range(6)))
+        integration.shutdown()
+        return results, peak, integration.stats()
+
+    results, peak, stats = asyncio.run(scenario())
+    assert results == ["ok"] * 6
+    assert peak == 2
+    assert stats == {"queue_depth": 0, "in_flight": 0, "circuit_open": 0}
+
+
+def test_bulkhead_runs_blocking_calls_on_its_own_pool():
+    async def scenario():
+        integration = Integration("test_blocking", max_concurrency=2, timeout=5)
+        threads = set()
+
+        def call():
+            threads.add(threading.current_thread().name)
+            time.sleep(0.01)
+            return 1
+
+        total = sum(await asyncio.gather(*(integration.run(call) for _ in range(6))))
+        integration.shutdown()
+        return total, threads
+
+    total, threads = asyncio.run(scenario())
+    assert total == 6
+    assert 1 <= len(threads) <= 2
+    assert all(name.startswith("test_blocking") for name in threads)
+
+
+def test_timed_out_call_holds_its_slot_until_it_finishes():
+    async def scenario():
+        integration = Integration("test_timeout", max_concurrency=1, timeout=0.01)
+
+        def slow():
+            time.sleep(0.05)
+            return "late"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await integration.run(slow)
+        assert integration.stats()["in_flight"] == 1  # The thread is still running
+
+        await asyncio.sleep(0.1)
+        assert integration.stats()["in_flight"] == 0
+        assert await integration.run(lambda: "next", timeout=1) == "next"
+        integration.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_fails_fast_and_only_counts_provider_failures():
+    class Rejected(Exception):
+        pass
+
+    async def scenario():
+        integration = Integration(
+            "test_breaker", max_concurrency=2, timeout=1, failure_threshold=2, reset_timeout=60,
+            is_failure=lambda e: not isinstance(e, Rejected),
+        )
+        calls = 0
+
+        async def fail(error):
+            nonlocal calls
+            calls += 1
+            raise error
+
+        for _ in range(3):
+            with pytest.raises(Rejected):
+                await integration.run_async(lambda: fail(Rejected()))
+        assert integration.breaker.state == "closed"
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await integration.run_async(lambda: fail(ConnectionError()))
+        assert integration.breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await integration.run_async(lambda: fail(ConnectionError()))
+        integration.shutdown()
+        return calls, integration.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == 5  # The rejected call never reached the provider
+    assert stats["circuit_open"] == 1
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from core.config import get_settings
+from dental_agents.intent_router import (
+    BOOK_INTENT,
+    CANCEL_INTENT,
+    RESCHEDULE_INTENT,
+    IntentRouter,
+    KeywordIntentClassifier,
+)
+
+ROUTES = [
+    # Action requests are routed
+    ("I want to cancel my appointment", CANCEL_INTENT),
+    ("I need to cancel my appointment", CANCEL_INTENT),
+    ("Hi, I’d like to cancel my cleaning on Friday", CANCEL_INTENT),
+    ("Please cancel my appointment tomorrow", CANCEL_INTENT),
+    ("Cancel my 3pm appointment", CANCEL_INTENT),
+    ("Can I book a cleaning for next Tuesday?", BOOK_INTENT),
+    ("I'd like to schedule a checkup", BOOK_INTENT),
+    ("I need a new appointment", BOOK_INTENT),
+    ("Could you set up an appointment with Dr. Lee for me?", BOOK_INTENT),
+    ("Book me in with Dr. Smith on Friday", BOOK_INTENT),
+    ("I'd like to reschedule my cleaning", RESCHEDULE_INTENT),
+    ("I need to change my appointment to next week", RESCHEDULE_INTENT),
+    ("Can't make it on Friday, can we move it to Monday?", RESCHEDULE_INTENT),
+    # Questions about the clinic go to the receptionist
+    ("What services are available?", None),
+    ("What do I need to bring to my appointment?", None),
+    ("Do you schedule appointments on Saturdays?", None),
+    ("How do I get to my appointment?", None),
+    ("How can I get to the clinic?", None),
+    ("What's your cancellation policy?", None),
+    ("Is there a fee if I cancel late?", None),
+    ("Do you take my insurance?", None),
+    # Conflicting, negated or keyword-only messages are not confident enough
+    ("I want to cancel and book another one", None),
+    ("I don't want to cancel, just checking the time", None),
+    ("Is there any availability this week?", None),
+    ("cancellation", None),
+    ("Hello!", None),
+]
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter([KeywordIntentClassifier()], threshold=get_settings().INTENT_ROUTER_CONFIDENCE_THRESHOLD)
+
+
+@pytest.mark.parametrize("message, expected", ROUTES)
+def test_keyword_routes(router, message, expected):
+    prediction = asyncio.run(router.route(message))
+    assert (prediction.intent if prediction else None) == expected
+
+
+def test_keyword_matches_are_weaker_than_action_requests():
+    classifier = KeywordIntentClassifier()
+    weak = asyncio.run(classifier.classify("Is there any availability this week?"))
+    strong = asyncio.run(classifier.classify("I'd like to book a cleaning"))
+    assert weak.intent == strong.intent == BOOK_INTENT
+    assert weak.confidence < get_settings().INTENT_ROUTER_CONFIDENCE_THRESHOLD <= strong.confidence
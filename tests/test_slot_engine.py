@@ -0,0 +1,71 @@
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from tools.slot_engine import compute_free_slots, merge_intervals, parse_clinic_hours, rank_slots, subtract_interval
+
+TZ = pytz.timezone("America/New_York")
+HOURS = parse_clinic_hours({
+    "Monday": "9:00 AM - 12:00 PM",
+    "Tuesday": "9 AM - 5 PM",
+    "Saturday": "Closed",
+})
+MONDAY = datetime(2030, 3, 4)  # A Monday
+
+
+def _at(day: datetime, hour: int, minute: int = 0) -> datetime:
+    return TZ.localize(day.replace(hour=hour, minute=minute))
+
+
+def _labels(slots):
+    return [slot.strftime("%a %H:%M") for slot in slots]
+
+
+def test_parse_clinic_hours_skips_closed_days():
+    assert HOURS == {0: (time(9), time(12)), 1: (time(9), time(17))}
+
+
+def test_merge_intervals_joins_overlapping_and_touching_blocks():
+    blocks = [(_at(MONDAY, 10), _at(MONDAY, 11)), (_at(MONDAY, 9), _at(MONDAY, 10)), (_at(MONDAY, 13), _at(MONDAY, 14))]
+    assert merge_intervals(blocks) == [(_at(MONDAY, 9), _at(MONDAY, 11)), (_at(MONDAY, 13), _at(MONDAY, 14))]
+    assert merge_intervals(blocks, padding=timedelta(hours=1)) == [(_at(MONDAY, 8), _at(MONDAY, 15))]
+
+
+def test_subtract_interval_trims_and_splits_merged_blocks():
+    merged = [(_at(MONDAY, 9), _at(MONDAY, 12))]
+    assert subtract_interval(merged, (_at(MONDAY, 10), _at(MONDAY, 11))) == [
+        (_at(MONDAY, 9), _at(MONDAY, 10)),
+        (_at(MONDAY, 11), _at(MONDAY, 12)),
+    ]
+    assert subtract_interval(merged, (_at(MONDAY, 9), _at(MONDAY, 10))) == [(_at(MONDAY, 10), _at(MONDAY, 12))]
+    assert subtract_interval(merged, (_at(MONDAY, 9), _at(MONDAY, 12))) == []
+    assert subtract_interval(merged, (_at(MONDAY, 13), _at(MONDAY, 14))) == merged
+
+
+def test_free_slots_respect_busy_time_buffers_and_opening_hours():
+    busy = [(_at(MONDAY, 10), _at(MONDAY, 10, 30))]
+    slots = compute_free_slots(
+        _at(MONDAY, 0), _at(MONDAY + timedelta(days=1), 11), busy, HOURS,
+        duration_minutes=30, tz=TZ, buffer_minutes=15, granularity_minutes=30,
+    )
+    assert _labels(slots) == [
+        "Mon 09:00",  # 09:30 would end within 15 minutes of the 10:00 booking
+        "Mon 11:00", "Mon 11:30",  # 10:30 is inside the buffer; 12:00 is closing time
+        "Tue 09:00", "Tue 09:30", "Tue 10:00", "Tue 10:30",  # The window ends at 11:00
+    ]
+
+
+def test_free_slots_skip_closed_days_and_times_before_not_before():
+    saturday = MONDAY + timedelta(days=5)
+    assert compute_free_slots(_at(saturday, 0), _at(saturday, 23), [], HOURS, 30, TZ) == []
+
+    slots = compute_free_slots(
+        _at(MONDAY, 0), _at(MONDAY, 23), [], HOURS, 60, TZ, not_before=_at(MONDAY, 10, 5),
+    )
+    assert _labels(slots) == ["Mon 10:15", "Mon 10:30", "Mon 10:45", "Mon 11:00"]
+
+
+def test_rank_slots_prefers_the_closest_times():
+    slots = [_at(MONDAY, hour) for hour in (9, 10, 11, 14, 15)]
+    assert rank_slots(slots, _at(MONDAY, 14, 20), limit=2) == [_at(MONDAY, 14), _at(MONDAY, 15)]
+    assert rank_slots(slots, None, limit=2) == [_at(MONDAY, 9), _at(MONDAY, 10)]
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # Lua scripting support for fakeredis
+
+from tools.slot_holds import SlotHoldStore
+
+DOCTOR = "dr.smith@example.com"
+NINE = datetime(2030, 3, 4, 9, 0, tzinfo=pytz.utc)
+
+
+def _slot(start: datetime, minutes: int = 30):
+    return start, start + timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def store():
+    return SlotHoldStore(fakeredis.aioredis.FakeRedis(decode_responses=True), ttl_seconds=120)
+
+
+def test_claim_blocks_overlapping_slots_for_other_conversations(store):
+    async def scenario():
+        assert await store.claim(DOCTOR, "conv-a", *_slot(NINE))
+        assert await store.claim(DOCTOR, "conv-a", *_slot(NINE))  # Own hold is refreshed
+        assert not await store.claim(DOCTOR, "conv-b", *_slot(NINE + timedelta(minutes=15)))
+        assert await store.claim(DOCTOR, "conv-b", *_slot(NINE + timedelta(minutes=30)))  # Touching is fine
+        assert await store.claim("dr.lee@example.com", "conv-b", *_slot(NINE))  # Holds are per doctor
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_claims_for_one_slot_have_a_single_winner(store):
+    async def scenario():
+        # Overlapping but not identical windows, so every claimant collides with every other.
+        return await asyncio.gather(*(
+            store.claim(DOCTOR, f"conv-{n}", *_slot(NINE + timedelta(minutes=n % 3 * 5)))
+            for n in range(50)
+        ))
+
+    results = asyncio.run(scenario())
+    assert results.count(True) == 1
+
+
+def test_hold_skips_taken_slots_and_replace_drops_earlier_offers(store):
+    async def scenario():
+        await store.hold(DOCTOR, "conv-a", [_slot(NINE)])
+        offered = [_slot(NINE), _slot(NINE + timedelta(hours=1)), _slot(NINE + timedelta(hours=2))]
+        held = await store.hold(DOCTOR, "conv-b", offered)
+        assert held == [NINE + timedelta(hours=1), NINE + timedelta(hours=2)]
+
+        # A new offer replaces conv-b's previous holds, freeing them for others.
+        await store.hold(DOCTOR, "conv-b", [_slot(NINE + timedelta(hours=3))])
+        assert await store.claim(DOCTOR, "conv-c", *_slot(NINE + timedelta(hours=1)))
+        assert sorted(await store.held_by_others(DOCTOR, "conv-c")) == [_slot(NINE), _slot(NINE + timedelta(hours=3))]
+
+    asyncio.run(scenario())
+
+
+def test_release_frees_only_the_conversations_holds(store):
+    async def scenario():
+        await store.hold(DOCTOR, "conv-a", [_slot(NINE)])
+        await store.hold(DOCTOR, "conv-b", [_slot(NINE + timedelta(hours=1))])
+        assert await store.release(DOCTOR, "conv-a") == 1
+        assert await store.claim(DOCTOR, "conv-c", *_slot(NINE))
+        assert not await store.claim(DOCTOR, "conv-c", *_slot(NINE + timedelta(hours=1)))
+
+    asyncio.run(scenario())
+
+
+def test_conversation_ids_containing_the_separator(store):
+    async def scenario():
+        assert await store.claim(DOCTOR, "client|chosen|id", *_slot(NINE))
+        assert not await store.claim(DOCTOR, "client", *_slot(NINE))
+        assert not await store.claim(DOCTOR, "client|chosen", *_slot(NINE))
+        assert await store.claim(DOCTOR, "client|chosen|id", *_slot(NINE))
+        assert await store.held_by_others(DOCTOR, "client|chosen|id") == []
+        assert await store.held_by_others(DOCTOR, "client") == [_slot(NINE)]
+        assert await store.release(DOCTOR, "client|chosen|id") == 1
+        assert await store.claim(DOCTOR, "client", *_slot(NINE))
+
+    asyncio.run(scenario())
+
+
+def test_expired_and_unreadable_holds_are_ignored(store, monkeypatch):
+    async def scenario():
+        await store.hold(DOCTOR, "conv-a", [_slot(NINE)])
+        key = store._key(DOCTOR)
+        await store.redis.hset(key, f"{int((NINE + timedelta(hours=1)).timestamp())}|{int((NINE + timedelta(hours=2)).timestamp())}", "conv-old|123")
+        assert await store.held_by_others(DOCTOR, "conv-b") == [_slot(NINE)]
+        assert await store.claim(DOCTOR, "conv-b", *_slot(NINE + timedelta(hours=1)))
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 121)
+        assert await store.held_by_others(DOCTOR, "conv-b") == []
+        assert await store.claim(DOCTOR, "conv-b", *_slot(NINE))
+        assert list(await store.redis.hgetall(key)) == [f"{int(NINE.timestamp())}|{int((NINE + timedelta(minutes=30)).timestamp())}"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from api.models.chat import StreamEvent
+from api.services.sse import TextDeltaCoalescer, encode_event, encode_text_event
+
+
+def test_encode_text_event_matches_the_pydantic_model():
+    for delta in ["Hello", 'quote " and \\ backslash', "line\nbreak\ttab", "Café ☕ 🦷", ""]:
+        expected = StreamEvent(event="text", data={"delta": delta}).model_dump_json()
+        assert encode_text_event(delta) == expected
+        assert json.loads(encode_text_event(delta)) == {"event": "text", "data": {"delta": delta}}
+
+
+def test_encode_event_uses_the_model():
+    assert json.loads(encode_event("tool_start", {"name": "search"})) == {
+        "event": "tool_start",
+        "data": {"name": "search"},
+    }
+
+
+def _collector():
+    sent = []
+
+    async def sink(payload: str):
+        sent.append(json.loads(payload)["data"]["delta"])
+
+    return sent, sink
+
+
+def test_deltas_within_the_window_are_sent_as_one_event():
+    async def scenario():
+        sent, sink = _collector()
+        coalescer = TextDeltaCoalescer(sink, window_ms=20, max_bytes=1024)
+        for delta in ["Your ", "appointment ", "is ", "booked."]:
+            await coalescer.add(delta)
+        assert sent == []
+        await asyncio.sleep(0.05)
+        return sent
+
+    assert asyncio.run(scenario()) == ["Your appointment is booked."]
+
+
+def test_reaching_max_bytes_flushes_immediately():
+    async def scenario():
+        sent, sink = _collector()
+        coalescer = TextDeltaCoalescer(sink, window_ms=10_000, max_bytes=8)
+        await coalescer.add("abcd")
+        await coalescer.add("éfg")  # 4 bytes in UTF-8, bringing the buffer to 8
+        assert sent == ["abcdéfg"]
+        await coalescer.add("h")
+        await coalescer.flush()
+        return sent
+
+    assert asyncio.run(scenario()) == ["abcdéfg", "h"]
+
+
+def test_flush_preserves_order_and_cancels_the_timer():
+    async def scenario():
+        sent, sink = _collector()
+        coalescer = TextDeltaCoalescer(sink, window_ms=20, max_bytes=1024)
+        await coalescer.add("before tool")
+        await coalescer.flush()
+        sent.append("<tool_start>")
+        await asyncio.sleep(0.05)  # The cancelled timer must not emit anything
+        await coalescer.add("after tool")
+        await coalescer.flush()
+        await coalescer.flush()  # Flushing an empty buffer sends nothing
+        return sent
+
+    assert asyncio.run(scenario()) == ["before tool", "<tool_start>", "after tool"]
+
+
+def test_empty_deltas_are_ignored():
+    async def scenario():
+        sent, sink = _collector()
+        coalescer = TextDeltaCoalescer(sink, window_ms=20, max_bytes=1024)
+        await coalescer.add("")
+        await coalescer.flush()
+        return sent
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,148 @@
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+from dateutil.parser import parse as date_parse
+from redis.asyncio import Redis
+
+from api.db.cache import redis_pool
+from core.config import get_settings
+from core.metrics import metrics
+from tools.slot_engine import Interval
+
+settings = get_settings()
+
+
+def parse_event_interval(event: Dict[str, Any], tz) -> Optional[Interval]:
+    """Returns the (start, end) of a Google Calendar event, handling all-day events."""
+    start, end = event.get("start", {}), event.get("end", {})
+    if "dateTime" in start and "dateTime" in end:
+        return date_parse(start["dateTime"]), date_parse(end["dateTime"])
+    if "date" in start and "date" in end:
+        return (
+            tz.localize(datetime.combine(date_parse(start["date"]).date(), datetime.min.time())),
+            tz.localize(datetime.combine(date_parse(end["date"]).date(), datetime.min.time())),
+        )
+    return None
+
+
+def is_blocking_event(event: Dict[str, Any]) -> bool:
+    """Cancelled and 'free' (transparent) events do not block a doctor's time."""
+    return event.get("status") != "cancelled" and event.get("transparency") != "transparent"
+
+
+class CalendarMirror:
+    """
+    Local mirror of each doctor's busy intervals, kept in Redis.
+
+    Per calendar, a sorted set holds one member per event (`event_id|start|end`, scored by
+    start epoch) and a hash maps event IDs to their current member so updates can replace
+    them. Sync state (sync token, last sync time) lives in a separate hash.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    @staticmethod
+    def _keys(calendar_id: str) -> Tuple[str, str, str]:
+        return (
+            f"calendar_busy:{calendar_id}",
+            f"calendar_busy_events:{calendar_id}",
+            f"calendar_sync:{calendar_id}",
+        )
+
+    @staticmethod
+    def _member(event_id: str, start: datetime, end: datetime) -> str:
+        return f"{event_id}|{start.timestamp()}|{end.timestamp()}"
+
+    async def get_busy(self, calendar_id: str, window_start: datetime, window_end: datetime) -> Optional[List[Interval]]:
+        """
+        Returns busy intervals overlapping the window, or None when the mirror is missing or
+        older than `CALENDAR_MIRROR_MAX_STALENESS_SECONDS` (callers then query Google live).
+        """
+        busy_key, _, sync_key = self._keys(calendar_id)
+        lookback = settings.CALENDAR_MIRROR_MAX_EVENT_HOURS * 3600
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hget(sync_key, "synced_at")
+            pipe.zrangebyscore(busy_key, window_start.timestamp() - lookback, window_end.timestamp())
+            synced_at, members = await pipe.execute()
+
+        if synced_at is None or time.time() - float(synced_at) > settings.CALENDAR_MIRROR_MAX_STALENESS_SECONDS:
+            metrics.incr("calendar_mirror_misses")
+            return None
+
+        metrics.incr("calendar_mirror_hits")
+        window_start_ts, intervals = window_start.timestamp(), []
+        for member in members:
+            _, start_ts, end_ts = member.rsplit("|", 2)
+            if float(end_ts) > window_start_ts:
+                intervals.append(
+                    (datetime.fromtimestamp(float(start_ts), pytz.utc), datetime.fromtimestamp(float(end_ts), pytz.utc))
+                )
+        return intervals
+
+    async def apply_events(self, calendar_id: str, events: Iterable[Dict[str, Any]], tz):
+        """Applies a page of Google events: blocking ones are upserted, the rest removed."""
+        busy_key, events_key, _ = self._keys(calendar_id)
+        events = list(events)
+        event_ids = [event["id"] for event in events]
+        if not event_ids:
+            return
+        old_members = await self.redis.hmget(events_key, event_ids)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for event, old_member in zip(events, old_members):
+                if old_member:
+                    pipe.zrem(busy_key, old_member)
+                interval = parse_event_interval(event, tz) if is_blocking_event(event) else None
+                if interval:
+                    member = self._member(event["id"], *interval)
+                    pipe.zadd(busy_key, {member: interval[0].timestamp()})
+                    pipe.hset(events_key, event["id"], member)
+                else:
+                    pipe.hdel(events_key, event["id"])
+            await pipe.execute()
+
+    async def upsert_event(self, calendar_id: str, event_id: str, start: datetime, end: datetime):
+        """Write-through for events we create ourselves, so they are visible before the next sync."""
+        await self.apply_events(
+            calendar_id,
+            [{"id": event_id, "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}}],
+            pytz.utc,
+        )
+
+    async def remove_event(self, calendar_id: str, event_id: str):
+        await self.apply_events(calendar_id, [{"id": event_id, "status": "cancelled"}], pytz.utc)
+
+    @staticmethod
+    def horizon(now: datetime) -> datetime:
+        """Events starting before this are pruned, so syncs never need anything older."""
+        return now - timedelta(hours=settings.CALENDAR_MIRROR_MAX_EVENT_HOURS)
+
+    async def prune(self, calendar_id: str, before: datetime):
+        """Drops events that ended long ago to keep the mirror small."""
+        busy_key, events_key, _ = self._keys(calendar_id)
+        cutoff = self.horizon(before).timestamp()
+        stale = await self.redis.zrangebyscore(busy_key, "-inf", cutoff)
+        if stale:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.zrem(busy_key, *stale)
+                pipe.hdel(events_key, *[member.split("|", 1)[0] for member in stale])
+                await pipe.execute()
+
+    async def reset(self, calendar_id: str):
+        await self.redis.delete(*self._keys(calendar_id))
+
+    async def get_sync_token(self, calendar_id: str) -> Optional[str]:
+        return await self.redis.hget(self._keys(calendar_id)[2], "sync_token")
+
+    async def mark_synced(self, calendar_id: str, sync_token: Optional[str]):
+        _, _, sync_key = self._keys(calendar_id)
+        mapping = {"synced_at": time.time()}
+        if sync_token:
+            mapping["sync_token"] = sync_token
+        await self.redis.hset(sync_key, mapping=mapping)
+
+
+calendar_mirror = CalendarMirror(redis_pool)
@@ -1,80 +1,47 @@
 import asyncio
 import pytz
 import json
-import base64
-import os
+import hashlib
 from dotenv import load_dotenv
 from datetime import datetime, time, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 
-from sqlmodel import Session, select
+from sqlmodel import select
 from api.models.appointment import Appointment
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-
 from dateutil.parser import parse as date_parse
+from googleapiclient.errors import HttpError
 from urllib.parse import quote_plus
 
 from agents import function_tool, RunContextWrapper
 
-from core.config import clinic_config as config
+from api.db.cache import redis_pool
+from api.workers.email_outbox import release_dedupe_keys
+from core.config import clinic_config as config, get_settings
+from core.metrics import metrics
 from dental_agents.context import AssistantContext
+from tools.calendar_mirror import calendar_mirror
+from tools.google_client import google_clients, run_calendar_call
+from tools.email_tools import send_reschedule_email
+from tools.reminders import appointment_reminders
+from tools.slot_holds import slot_holds
+from tools.slot_engine import Interval, compute_free_slots, parse_clinic_hours, rank_slots, subtract_interval
 
 _: bool = load_dotenv()
 
-# --- Google Service Caching ---
-_service_cache = {}
+settings = get_settings()
+
+_opening_hours = parse_clinic_hours(config['clinic_hours'])
+
 
-# *** THE CORRECTED FUNCTION ***
 def get_google_service(doctor_identifier: str, scopes: List[str]) -> Any:
-    """Securely creates and caches a Google API service client for a specific doctor.
-    It reads the doctor's credentials from an environment variable defined in clinics.json.
+    """Returns the warm Google Calendar client for a doctor (by email or name).
 
     Args:
         doctor_identifier (str): The email or name of the doctor.
         scopes (List[str]): The Google API scopes required.
     """
-    # Sort the scopes to ensure the key is consistent regardless of order
-    # Use a consistent cache key
-    scopes_tuple = tuple(sorted(scopes))
-    cache_key = (doctor_identifier, scopes_tuple)
-
-    if cache_key in _service_cache:
-        return _service_cache[cache_key]
-    
-    doctor_info = None
-    for doctor in config['doctors']:
-        if doctor['email'] == doctor_identifier or doctor['name'] == doctor_identifier:
-            doctor_info = doctor
-            break
-    
-    if not doctor_info:
-        raise ValueError(f"Could not find configuration for doctor: {doctor_identifier}")
-    
-    # Get the name of the environment variable from the config
-    env_var_name = doctor_info.get("google_credentials_env_var") + "_B64"
-    if not env_var_name:
-        raise ValueError(f"Missing 'google_credentials_env_var' setting for doctor: {doctor_identifier}")
-    
-    # Read the Base64 content from the environment variable
-    creds_b64_str = os.getenv(env_var_name)
-    if not creds_b64_str:
-        raise ValueError(f"Environment variable '{env_var_name}' is not set or empty.")
-
-    try:
-        creds_json_str = base64.b64decode(creds_b64_str).decode('utf-8')
-        
-        creds_info = json.loads(creds_json_str)
-        creds = service_account.Credentials.from_service_account_info(creds_info, scopes=scopes)
-        service = build('calendar', 'v3', credentials=creds)
-
-        _service_cache[cache_key] = service
-        return service
-    except json.JSONDecodeError:
-        raise ValueError(f"Could not parse JSON from environment variable '{env_var_name}'.")
-    except Exception as e:
-        raise RuntimeError(f"Failed to create Google service for {doctor_identifier}: {e}")
+    return google_clients.get(doctor_identifier, scopes)
 
 
 def _create_google_calendar_universal_link(
@@ -109,44 +76,391 @@ def _create_google_calendar_universal_link(
     return f"https://www.google.com/calendar/render?{'&'.join([f'{k}={v}' for k, v in params.items()])}"
 
 
+def _find_doctor(doctor_email: str) -> Optional[Dict[str, Any]]:
+    doctor = google_clients.find_doctor(doctor_email)
+    return doctor if doctor and doctor['email'] == doctor_email else None
+
+
+def _resolve_service_duration(service_type: str) -> Optional[Tuple[str, int]]:
+    """Matches a service name from clinic_info.json case-insensitively (exact, then partial)."""
+    services = config['services']
+    wanted = service_type.strip().lower()
+    for name, minutes in services.items():
+        if name.lower() == wanted:
+            return name, minutes
+    for name, minutes in services.items():
+        if wanted in name.lower() or name.lower() in wanted:
+            return name, minutes
+    return None
+
+
+async def _fetch_busy_window(service, doctor: Dict[str, Any], time_min: datetime, time_max: datetime) -> List[Interval]:
+    body = {
+        "timeMin": time_min.isoformat(),
+        "timeMax": time_max.isoformat(),
+        "timeZone": config['general_config']['default_timezone'],
+        "items": [{"id": doctor['calendar_id']}]
+    }
+    results = await run_calendar_call(doctor['email'], lambda: service.freebusy().query(body=body).execute())
+
+    calendar = results['calendars'].get(doctor['calendar_id'], {})
+    if calendar.get('errors'):
+        raise RuntimeError(f"Free/Busy error for {doctor['email']}: {calendar['errors']}")
+    return [(date_parse(busy['start']), date_parse(busy['end'])) for busy in calendar.get('busy', [])]
+
+
+async def _fetch_busy_intervals(doctor: Dict[str, Any], time_min: datetime, time_max: datetime) -> List[Interval]:
+    """
+    Queries Google Free/Busy for a doctor's calendar and parses the busy intervals.
+    Long ranges are split into windows Google accepts and queried concurrently.
+    """
+    service = get_google_service(doctor['email'], config['general_config']['google_api_scopes_calendar'])
+    max_window = timedelta(days=settings.CALENDAR_FREEBUSY_MAX_WINDOW_DAYS)
+    windows = []
+    window_start = time_min
+    while window_start < time_max:
+        window_end = min(window_start + max_window, time_max)
+        windows.append((window_start, window_end))
+        window_start = window_end
+
+    chunks = await asyncio.gather(*(_fetch_busy_window(service, doctor, start, end) for start, end in windows))
+    return [interval for chunk in chunks for interval in chunk]
+
+
+async def _get_busy_intervals(doctor: Dict[str, Any], time_min: datetime, time_max: datetime) -> List[Interval]:
+    """Answers from the local calendar mirror when it is fresh, otherwise asks Google directly."""
+    try:
+        busy = await calendar_mirror.get_busy(doctor['calendar_id'], time_min, time_max)
+        if busy is not None:
+            return busy
+    except Exception as e:
+        print(f"❌ CALENDAR MIRROR ERROR: {e}. Falling back to a live Free/Busy query.")
+    return await _fetch_busy_intervals(doctor, time_min, time_max)
+
+
+def _parse_local_datetime(value: str, tz) -> datetime:
+    """Parses an ISO 8601 string, assuming the clinic's timezone when no offset is given."""
+    parsed = date_parse(value)
+    return tz.localize(parsed) if parsed.tzinfo is None else parsed
+
+
+def _compute_doctor_slots(
+    window_start: datetime, window_end: datetime, busy: List[Interval], duration_minutes: int, tz
+) -> List[datetime]:
+    general = config['general_config']
+    return compute_free_slots(
+        window_start,
+        window_end,
+        busy,
+        _opening_hours,
+        duration_minutes,
+        tz,
+        buffer_minutes=general.get('appointment_buffer_minutes', 0),
+        granularity_minutes=general.get('slot_granularity_minutes', 15),
+        not_before=datetime.now(tz),
+    )
+
+
+def _doctor_offers(doctor: Dict[str, Any], service_name: str, specialty: Optional[str]) -> bool:
+    """Doctors without a `services` list in clinic_info.json are assumed to offer every service."""
+    if specialty and specialty.strip().lower() not in doctor['specialty'].lower():
+        return False
+    return service_name in doctor.get('services', config['services'])
+
+
+async def _get_bookable_busy(
+    doctor: Dict[str, Any], conversation_id: str, time_min: datetime, time_max: datetime
+) -> List[Interval]:
+    """Busy intervals plus the slots other conversations are currently holding."""
+    busy = await _get_busy_intervals(doctor, time_min, time_max)
+    if settings.SLOT_HOLDS_ENABLED:
+        try:
+            busy = busy + await slot_holds.held_by_others(doctor['email'], conversation_id)
+        except Exception as e:
+            print(f"❌ SLOT HOLD ERROR: Could not read holds for {doctor['email']}: {e}")
+    return busy
+
+
+async def _hold_offered_slots(
+    doctor: Dict[str, Any], conversation_id: str, offered: List[datetime], duration_minutes: int
+) -> List[datetime]:
+    """Holds the slots about to be offered and drops any another conversation grabbed first."""
+    if not settings.SLOT_HOLDS_ENABLED or not offered:
+        return offered
+    duration = timedelta(minutes=duration_minutes)
+    try:
+        held = set(await slot_holds.hold(doctor['email'], conversation_id, [(slot, slot + duration) for slot in offered]))
+    except Exception as e:
+        print(f"❌ SLOT HOLD ERROR: Could not hold slots for {doctor['email']}: {e}")
+        return offered
+    return [slot for slot in offered if slot in held]
+
+
+def _format_slot(start: datetime, duration_minutes: int) -> Dict[str, str]:
+    end = start + timedelta(minutes=duration_minutes)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "label": start.strftime("%A, %B %d at %I:%M %p"),
+    }
+
+
+# How many event IDs one booking may try when earlier ones belong to appointments moved elsewhere
+_MAX_BOOKING_ID_GENERATIONS = 5
+
+
+def _booking_idempotency_key(
+    conversation_id: str, doctor_email: str, start: datetime, patient_email: str, generation: int = 0
+) -> str:
+    """
+    Hex SHA-256 of the booking's identity. Hex digits are valid base32hex, so the key
+    doubles as the Google Calendar event ID. A non-zero `generation` salts the key once
+    the earlier IDs are taken by appointments that were rescheduled away from this slot.
+    """
+    parts = [conversation_id, doctor_email, start.astimezone(pytz.utc).isoformat(), patient_email.strip().lower()]
+    if generation:
+        parts.append(str(generation))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+async def _get_cached_booking(idempotency_key: str) -> Optional[Dict[str, Any]]:
+    try:
+        cached = await redis_pool.get(f"booking_result:{idempotency_key}")
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        print(f"❌ BOOKING CACHE ERROR: {e}")
+        return None
+
+
+async def _cache_booking(idempotency_key: str, result: Dict[str, Any]):
+    try:
+        await redis_pool.set(
+            f"booking_result:{idempotency_key}", json.dumps(result), ex=settings.BOOKING_IDEMPOTENCY_TTL_SECONDS
+        )
+    except Exception as e:
+        print(f"❌ BOOKING CACHE ERROR: {e}")
+
+
+def _same_times(event: Dict[str, Any], event_body: Dict[str, Any]) -> bool:
+    try:
+        return all(
+            date_parse(event[edge]['dateTime']) == date_parse(event_body[edge]['dateTime']) for edge in ('start', 'end')
+        )
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+async def _insert_event_idempotently(doctor: Dict[str, Any], event_body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Inserts an event with a caller-chosen ID. If the ID already exists the earlier insert
+    went through, so that event is returned (and restored if it was cancelled since).
+    Returns None when the existing event is at a different time: it was rescheduled, so
+    the ID belongs to another appointment now and the caller must pick a new one.
+    """
+    service = get_google_service(doctor['email'], config['general_config']['google_api_scopes_calendar'])
+    try:
+        return await run_calendar_call(doctor['email'],
+            lambda: service.events().insert(
+                calendarId=doctor['calendar_id'],
+                body=event_body,
+                sendUpdates="all" # Send invites to attendees
+            ).execute()
+        )
+    except HttpError as e:
+        if e.resp.status != 409:
+            raise
+
+    metrics.incr("create_appointment_duplicate_inserts")
+    existing = await run_calendar_call(doctor['email'],
+        lambda: service.events().get(calendarId=doctor['calendar_id'], eventId=event_body['id']).execute()
+    )
+    if existing.get('status') != 'cancelled':
+        return existing if _same_times(existing, event_body) else None
+    return await run_calendar_call(doctor['email'],
+        lambda: service.events().update(
+            calendarId=doctor['calendar_id'],
+            eventId=event_body['id'],
+            body={**event_body, 'status': 'confirmed'},
+            sendUpdates="all"
+        ).execute()
+    )
+
+
+async def _claim_slot(doctor_email: str, conversation_id: str, start: datetime, end: datetime) -> bool:
+    try:
+        return await slot_holds.claim(doctor_email, conversation_id, start, end)
+    except Exception as e:
+        # Holds only prevent wasted inserts; Google remains the source of truth for conflicts.
+        print(f"❌ SLOT HOLD ERROR: Could not claim slot for {doctor_email}: {e}")
+        return True
+
+
+async def _release_holds(conversation_id: str):
+    """Frees every slot a conversation was holding, once it has booked."""
+    try:
+        await asyncio.gather(*(slot_holds.release(doc['email'], conversation_id) for doc in config['doctors']))
+    except Exception as e:
+        print(f"❌ SLOT HOLD ERROR: Could not release holds for conversation {conversation_id}: {e}")
+
+
 # --- AGENT TOOLS ---
 @function_tool
 async def find_free_slots(
-    calendar_ids: List[str],
+    context_wrapper: RunContextWrapper[AssistantContext],
     doctor_email: str,
+    service_type: str,
     time_min: str,
-    time_max: str
+    time_max: str,
+    preferred_time_iso: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Checks Google Calendar for busy times within a specified window for a list of calendars.
+    Finds concrete bookable appointment start times for a doctor and service.
+    Clinic hours, the service duration and buffers between appointments are already applied,
+    and the returned slots are reserved for this conversation for a few minutes.
 
     Args:
-        calendar_ids (List[str]): List of Google Calendar IDs to check.
         doctor_email (str): The email of the dentist whose calendar is to be checked.
+        service_type (str): The service to book (e.g. 'Teeth Whitening'); determines the duration.
         time_min (str): The start of the search window in ISO 8601 format.
         time_max (str): The end of the search window in ISO 8601 format.
+        preferred_time_iso (Optional[str]): The patient's preferred start time in ISO 8601 format, if any.
+            Slots closest to it are returned first.
 
     Returns:
-        A dictionary containing the raw 'busy' intervals returned by the Google Free/Busy API.
+        A dictionary with a short, chronologically ordered list of bookable slots.
     """
     try:
-        service = get_google_service(doctor_email, config['general_config']['google_api_scopes_calendar'])
-        body = {
-            "timeMin": time_min,
-            "timeMax": time_max,
-            "timeZone": "America/New_York",
-            "items": [{"id": cal_id} for cal_id in calendar_ids]
+        doctor = _find_doctor(doctor_email)
+        if doctor is None:
+            raise ValueError("Incorrect doctor email provided.")
+
+        service = _resolve_service_duration(service_type)
+        if service is None:
+            raise ValueError(f"Unknown service '{service_type}'. Available services: {', '.join(config['services'])}.")
+        service_name, duration_minutes = service
+
+        general = config['general_config']
+        tz = pytz.timezone(general['default_timezone'])
+        window_start = _parse_local_datetime(time_min, tz)
+        window_end = _parse_local_datetime(time_max, tz)
+        preferred = _parse_local_datetime(preferred_time_iso, tz) if preferred_time_iso else None
+
+        conversation_id = context_wrapper.context.conversation_id
+        busy = await _get_bookable_busy(doctor, conversation_id, window_start, window_end)
+        slots = _compute_doctor_slots(window_start, window_end, busy, duration_minutes, tz)
+        offered = rank_slots(slots, preferred, limit=general.get('max_offered_slots', 8))
+        offered = await _hold_offered_slots(doctor, conversation_id, offered, duration_minutes)
+
+        response = {
+            "status": "success",
+            "doctor_name": doctor['name'],
+            "doctor_email": doctor['email'],
+            "service_type": service_name,
+            "duration_minutes": duration_minutes,
+            "total_available": len(slots),
+            "slots": [_format_slot(slot, duration_minutes) for slot in offered],
         }
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(None, lambda: service.freebusy().query(body=body).execute())
-        
-        # Return the raw busy data. The agent's intelligence will process this.
-        return {"status": "success", "data": results['calendars']}
+        if preferred is not None:
+            response["preferred_time_available"] = preferred.astimezone(tz) in offered
+        return response
     except Exception as e:
         return {"status": "error", "message": f"Failed to check calendar availability: {str(e)}"}
 
+@function_tool
+async def search_availability(
+    context_wrapper: RunContextWrapper[AssistantContext],
+    service_type: str,
+    time_min: str,
+    time_max: str,
+    specialty: Optional[str] = None,
+    preferred_time_iso: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Searches every doctor who offers a service at once and returns each doctor's earliest
+    bookable slots, ordered by who is available first. Use it when the patient has no
+    doctor preference or asks who is free (e.g. "first opening next week").
+
+    Args:
+        service_type (str): The service to book (e.g. 'Teeth Whitening'); determines the duration.
+        time_min (str): The start of the search window in ISO 8601 format.
+        time_max (str): The end of the search window in ISO 8601 format. May span several weeks.
+        specialty (Optional[str]): Only search doctors whose specialty contains this text (e.g. 'Orthodontics').
+        preferred_time_iso (Optional[str]): The patient's preferred start time in ISO 8601 format, if any.
+            Each doctor's slots closest to it are returned first.
+
+    Returns:
+        A dictionary with one entry per matching doctor, earliest availability first.
+    """
+    try:
+        service = _resolve_service_duration(service_type)
+        if service is None:
+            raise ValueError(f"Unknown service '{service_type}'. Available services: {', '.join(config['services'])}.")
+        service_name, duration_minutes = service
+
+        general = config['general_config']
+        tz = pytz.timezone(general['default_timezone'])
+        window_start = _parse_local_datetime(time_min, tz)
+        window_end = min(
+            _parse_local_datetime(time_max, tz),
+            window_start + timedelta(days=settings.AVAILABILITY_SEARCH_MAX_DAYS),
+        )
+        preferred = _parse_local_datetime(preferred_time_iso, tz) if preferred_time_iso else None
+
+        doctors = [doc for doc in config['doctors'] if _doctor_offers(doc, service_name, specialty)]
+        if not doctors:
+            raise ValueError(f"No doctor offers '{service_name}'" + (f" with specialty '{specialty}'." if specialty else "."))
+
+        conversation_id = context_wrapper.context.conversation_id
+        busy_by_doctor = await asyncio.gather(
+            *(_get_bookable_busy(doc, conversation_id, window_start, window_end) for doc in doctors),
+            return_exceptions=True,
+        )
+
+        candidates, unavailable = [], []
+        for doctor, busy in zip(doctors, busy_by_doctor):
+            if isinstance(busy, Exception):
+                print(f"❌ AVAILABILITY SEARCH ERROR for {doctor['email']}: {busy}")
+                unavailable.append(doctor['name'])
+                continue
+            slots = _compute_doctor_slots(window_start, window_end, busy, duration_minutes, tz)
+            if slots:
+                offered = rank_slots(slots, preferred, limit=settings.AVAILABILITY_SEARCH_SLOTS_PER_DOCTOR)
+                candidates.append((doctor, slots, offered))
+
+        held_by_doctor = await asyncio.gather(
+            *(_hold_offered_slots(doctor, conversation_id, offered, duration_minutes) for doctor, _, offered in candidates)
+        )
+
+        results = []
+        for (doctor, slots, _), offered in zip(candidates, held_by_doctor):
+            if not offered:
+                continue
+            results.append({
+                "doctor_name": doctor['name'],
+                "doctor_email": doctor['email'],
+                "specialty": doctor['specialty'],
+                "earliest_slot": _format_slot(offered[0], duration_minutes),
+                "total_available": len(slots),
+                "slots": [_format_slot(slot, duration_minutes) for slot in offered],
+            })
+
+        results.sort(key=lambda result: result["earliest_slot"]["start"])
+        response = {
+            "status": "success",
+            "service_type": service_name,
+            "duration_minutes": duration_minutes,
+            "searched_until": window_end.astimezone(tz).isoformat(),
+            "doctors": results,
+        }
+        if unavailable:
+            response["doctors_not_checked"] = unavailable
+        return response
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to search availability: {str(e)}"}
+
 @function_tool
 async def create_appointment(
+    context_wrapper: RunContextWrapper[AssistantContext],
     patient_name: str,
     patient_email: str,
     doctor_email: str,
@@ -170,16 +484,31 @@ async def create_appointment(
     """
     try:
         
-        doctor = next((doc for doc in config['doctors'] if doc["email"] == doctor_email), None)
+        doctor = _find_doctor(doctor_email)
 
         if doctor is None:
             raise ValueError(f"Incorrect doctor email provided.")
 
-        tz_str = config['timezone']
+        tz_str = config['general_config']['default_timezone']
         tz = pytz.timezone(tz_str)
-        start_dt = date_parse(start_datetime_iso).astimezone(tz)
+        start_dt = _parse_local_datetime(start_datetime_iso, tz).astimezone(tz)
         end_dt = start_dt + timedelta(minutes=event_duration_minutes)
 
+        # A repeat of a booking that already succeeded returns the original result.
+        conversation_id = context_wrapper.context.conversation_id
+        idempotency_key = _booking_idempotency_key(conversation_id, doctor_email, start_dt, patient_email)
+        cached = await _get_cached_booking(idempotency_key)
+        if cached is not None:
+            metrics.incr("create_appointment_deduplicated")
+            return cached
+
+        # Make sure no other conversation is holding this time; our own hold is refreshed.
+        if settings.SLOT_HOLDS_ENABLED and not await _claim_slot(doctor_email, conversation_id, start_dt, end_dt):
+            return {
+                "status": "error",
+                "message": "This time was just reserved by another patient. Please offer the patient a different slot.",
+            }
+
         event_summary = f"Appointment: {patient_name} - {service_type}"
         event_description = f"Patient: {patient_name}\nEmail: {patient_email}\nService: {service_type}"
 
@@ -198,15 +527,30 @@ async def create_appointment(
             },
         }
 
-        service = get_google_service(doctor_email, config['general_config']['google_api_scopes_calendar'])
-        loop = asyncio.get_event_loop()
-        created_event = await loop.run_in_executor(None, 
-            lambda: service.events().insert(
-                calendarId=doctor['calendar_id'], 
-                body=event_body,
-                sendUpdates="all" # Send invites to attendees
-            ).execute()
-        )
+        # The event ID is derived from the idempotency key, so a retried insert that Google
+        # already accepted comes back as a 409 instead of creating a duplicate event.
+        for generation in range(_MAX_BOOKING_ID_GENERATIONS):
+            if generation:
+                # The previous ID went to an appointment that was moved away from this slot.
+                idempotency_key = _booking_idempotency_key(conversation_id, doctor_email, start_dt, patient_email, generation)
+                cached = await _get_cached_booking(idempotency_key)
+                if cached is not None:
+                    metrics.incr("create_appointment_deduplicated")
+                    return cached
+            created_event = await _insert_event_idempotently(doctor, {**event_body, 'id': idempotency_key})
+            if created_event is not None:
+                break
+        else:
+            raise RuntimeError("This slot was booked and moved too many times in this conversation.")
+
+        # Write through so the new booking is unavailable before the next calendar sync.
+        try:
+            await calendar_mirror.upsert_event(doctor['calendar_id'], created_event['id'], start_dt, end_dt)
+        except Exception as e:
+            print(f"❌ CALENDAR MIRROR ERROR: Could not record event {created_event.get('id')}: {e}")
+
+        if settings.SLOT_HOLDS_ENABLED:
+            await _release_holds(conversation_id)
 
         patient_calendar_link = _create_google_calendar_universal_link(
             text=event_summary,
@@ -216,7 +560,7 @@ async def create_appointment(
             location=config['clinic_address'],
             timezone=tz_str
         )
-        return {
+        result = {
             "status": "success",
             "message": "Appointment created successfully.",
             "appointment_details": {
@@ -233,12 +577,20 @@ async def create_appointment(
                 "patient_add_to_calendar_link": patient_calendar_link
             }
         }
+        if settings.REMINDERS_ENABLED:
+            try:
+                await appointment_reminders.schedule(result["appointment_details"])
+            except Exception as e:
+                # The next reconciliation pass schedules it from the database.
+                print(f"❌ REMINDER ERROR: Could not schedule reminders for event {created_event.get('id')}: {e}")
+        await _cache_booking(idempotency_key, result)
+        return result
     except Exception as e:
         return {"status": "error", "message": f"Failed to create appointment: {str(e)}"}
 
 
 @function_tool
-def find_upcoming_appointments(context_wrapper: RunContextWrapper[AssistantContext]) -> str:
+async def find_upcoming_appointments(context_wrapper: RunContextWrapper[AssistantContext]) -> str:
     """
     Finds all future appointments for the currently logged-in user from the database.
     Returns a JSON string list of appointments of the user.
@@ -253,19 +605,20 @@ def find_upcoming_appointments(context_wrapper: RunContextWrapper[AssistantConte
         .where(Appointment.start_time > now_utc)
         .order_by(Appointment.start_time.asc())
     )
-    appointments = db.exec(statement).all()
+    appointments = (await db.exec(statement)).all()
 
     if not appointments:
         return json.dumps({"status": "success", "data": [], "message": "No upcoming appointments found for this user."})
 
     # Format the output
     formatted_appointments = []
+    tz = pytz.timezone(config['general_config']['default_timezone'])
 
     for app in appointments:
-        start_local = app.start_time.astimezone(pytz.timezone('America/New_York'))
+        start_local = app.start_time.astimezone(tz)
         formatted_appointments.append({
             "appointment_id": app.id,
-            "appointment_details": f"{app.service} on {start_local.strftime('%A, %B %d at %I:%M %p')} with {app.doctor_name} ({app.doctor_email})",
+            "appointment_details": f"{app.service_type} on {start_local.strftime('%A, %B %d at %I:%M %p')} with {app.doctor_name} ({app.doctor_email})",
             "patient_details": f"Name: {app.patient_name}. Email: {app.patient_email}.",
         })
     
@@ -273,7 +626,7 @@ def find_upcoming_appointments(context_wrapper: RunContextWrapper[AssistantConte
 
 
 @function_tool
-def cancel_appointment(
+async def cancel_appointment(
     context_wrapper: RunContextWrapper[AssistantContext],
     appointment_id: int,
     doctor_email: str,
@@ -298,28 +651,204 @@ def cancel_appointment(
         .where(Appointment.id == appointment_id)
         .where(Appointment.patient_supabase_id == patient_supabase_id)
     )
-    appointment = db.exec(statement).one_or_none()
+    appointment = (await db.exec(statement)).one_or_none()
 
     if not appointment:
         return json.dumps({"status": "error", "message": "Appointment not found or you do not have permission to cancel it."})
 
     # 1. Delete from Google Calendar
+    doctor = _find_doctor(appointment.doctor_email)
+    calendar_id = doctor['calendar_id'] if doctor else appointment.doctor_email
     try:
-        service = get_google_service(doctor_email, config['general_config']['google_api_scopes_calendar'])
-        service.events().delete(
-            calendarId=appointment.doctor_email,
-            eventId=appointment.google_calendar_event_id
-        ).execute()
-    except Exception as e:
+        service = get_google_service(appointment.doctor_email, config['general_config']['google_api_scopes_calendar'])
+        await run_calendar_call(appointment.doctor_email,
+            lambda: service.events().delete(
+                calendarId=calendar_id,
+                eventId=appointment.google_calendar_event_id
+            ).execute()
+        )
+    except HttpError as e:
         # If the event is already deleted from calendar, we can proceed. Otherwise, it's an error.
-        print(f"Could not delete Google Calendar event (it may already be gone): {e}")
+        if e.resp.status not in (404, 410):
+            print(f"❌ GOOGLE CALENDAR ERROR: Could not delete event {appointment.google_calendar_event_id}: {e}")
+            return json.dumps({"status": "error", "message": "Failed to cancel appointment due to a calendar error. Please try again."})
+        print(f"INFO:     Google Calendar event {appointment.google_calendar_event_id} was already deleted.")
+    except Exception as e:
+        print(f"❌ GOOGLE CALENDAR ERROR: Could not delete event {appointment.google_calendar_event_id}: {e}")
+        return json.dumps({"status": "error", "message": "Failed to cancel appointment due to a calendar error. Please try again."})
+
+    try:
+        await calendar_mirror.remove_event(calendar_id, appointment.google_calendar_event_id)
+        # Event IDs double as booking idempotency keys; forget the cached result so the
+        # same slot can be booked again, and remember the cancellation for `send_cancellation_email`.
+        async with redis_pool.pipeline(transaction=True) as pipe:
+            pipe.delete(f"booking_result:{appointment.google_calendar_event_id}")
+            pipe.set(f"cancelled_booking:{appointment.google_calendar_event_id}", appointment.id, ex=settings.BOOKING_IDEMPOTENCY_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        print(f"❌ CALENDAR MIRROR ERROR: Could not remove event {appointment.google_calendar_event_id}: {e}")
+    try:
+        await appointment_reminders.unschedule(appointment.google_calendar_event_id)
+    except Exception as e:
+        print(f"❌ REMINDER ERROR: Could not drop reminders for event {appointment.google_calendar_event_id}: {e}")
+    try:
+        # Rebooking the same slot in this conversation reuses the event ID; its emails must
+        # not be dropped as duplicates of this booking's.
+        await release_dedupe_keys(appointment.google_calendar_event_id)
+    except Exception as e:
+        print(f"❌ EMAIL OUTBOX ERROR: Could not release email keys for event {appointment.google_calendar_event_id}: {e}")
 
     # 2. Delete from our database
     try:
-        db.delete(appointment)
-        db.commit()
-        return json.dumps({"status": "success", "message": "Appointment successfully canceled from both calendar and database."})
+        await db.delete(appointment)
+        await db.commit()
+        return json.dumps({
+            "status": "success",
+            "message": "Appointment successfully canceled from both calendar and database.",
+            "google_calendar_event_id": appointment.google_calendar_event_id,
+        })
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Failed to delete appointment {appointment_id} from database: {e}")
         return json.dumps({"status": "error", "message": "Failed to cancel appointment due to a database error."})
+
+
+@function_tool
+async def reschedule_appointment(
+    context_wrapper: RunContextWrapper[AssistantContext],
+    appointment_id: int,
+    new_start_datetime_iso: str,
+) -> str:
+    """
+    Moves one of the user's appointments to a new start time in a single step.
+    It checks the new time is free, moves the calendar event and the booking record in place,
+    and emails the patient and the doctor the updated details. The doctor, service and duration stay the same.
+
+    Args:
+        appointment_id (int): The unique identifier of the appointment to move.
+        new_start_datetime_iso (str): The requested new start time in ISO 8601 format.
+
+    Returns:
+        A JSON string with the outcome. If the new time is not available, it lists the closest
+        alternative slots on the same day.
+    """
+    db = context_wrapper.context.db
+    patient_supabase_id = context_wrapper.context.user.id
+    conversation_id = context_wrapper.context.conversation_id
+
+    statement = (
+        select(Appointment)
+        .where(Appointment.id == appointment_id)
+        .where(Appointment.patient_supabase_id == patient_supabase_id)
+    )
+    appointment = (await db.exec(statement)).one_or_none()
+    if not appointment:
+        return json.dumps({"status": "error", "message": "Appointment not found or you do not have permission to change it."})
+
+    doctor = _find_doctor(appointment.doctor_email)
+    if doctor is None:
+        return json.dumps({"status": "error", "message": "The doctor for this appointment is no longer available."})
+
+    tz = pytz.timezone(config['general_config']['default_timezone'])
+    try:
+        new_start = _parse_local_datetime(new_start_datetime_iso, tz).astimezone(tz)
+    except Exception:
+        return json.dumps({"status": "error", "message": "Invalid new start time. Use ISO 8601 format."})
+    duration_minutes = int((appointment.end_time - appointment.start_time).total_seconds() // 60)
+    new_end = new_start + timedelta(minutes=duration_minutes)
+    previous_start = appointment.start_time.astimezone(tz)
+
+    # 1. Check the requested day, ignoring the appointment that is being moved
+    day_start = tz.localize(datetime.combine(new_start.date(), time.min))
+    day_end = tz.localize(datetime.combine(new_start.date() + timedelta(days=1), time.min))
+    try:
+        busy = await _get_bookable_busy(doctor, conversation_id, day_start, day_end)
+    except Exception as e:
+        print(f"❌ RESCHEDULE ERROR: Could not check availability for {doctor['email']}: {e}")
+        return json.dumps({"status": "error", "message": "Failed to check availability for the new time."})
+    busy = subtract_interval(busy, (appointment.start_time, appointment.end_time))
+    slots = _compute_doctor_slots(day_start, day_end, busy, duration_minutes, tz)
+
+    if new_start not in slots or (
+        settings.SLOT_HOLDS_ENABLED and not await _claim_slot(doctor['email'], conversation_id, new_start, new_end)
+    ):
+        alternatives = rank_slots([slot for slot in slots if slot != new_start], new_start, limit=3)
+        alternatives = await _hold_offered_slots(doctor, conversation_id, alternatives, duration_minutes)
+        return json.dumps({
+            "status": "unavailable",
+            "message": "The requested time is not available.",
+            "alternatives": [_format_slot(slot, duration_minutes) for slot in alternatives],
+        })
+
+    # 2. Move the existing calendar event in place
+    try:
+        service = get_google_service(doctor['email'], config['general_config']['google_api_scopes_calendar'])
+        moved_event = await run_calendar_call(doctor['email'],
+            lambda: service.events().patch(
+                calendarId=doctor['calendar_id'],
+                eventId=appointment.google_calendar_event_id,
+                body={
+                    'start': {'dateTime': new_start.isoformat(), 'timeZone': tz.zone},
+                    'end': {'dateTime': new_end.isoformat(), 'timeZone': tz.zone},
+                },
+                sendUpdates="all"
+            ).execute()
+        )
+    except Exception as e:
+        print(f"❌ GOOGLE CALENDAR ERROR: Could not move event {appointment.google_calendar_event_id}: {e}")
+        return json.dumps({"status": "error", "message": "Failed to reschedule appointment due to a calendar error. Please try again."})
+
+    # 3. Update the booking record in place
+    try:
+        appointment.start_time = new_start
+        appointment.end_time = new_end
+        db.add(appointment)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        print(f"Failed to update appointment {appointment_id} in database: {e}")
+        return json.dumps({"status": "error", "message": "Failed to reschedule appointment due to a database error."})
+
+    try:
+        await calendar_mirror.upsert_event(doctor['calendar_id'], appointment.google_calendar_event_id, new_start, new_end)
+        await redis_pool.delete(f"booking_result:{appointment.google_calendar_event_id}")
+    except Exception as e:
+        print(f"❌ CALENDAR MIRROR ERROR: Could not move event {appointment.google_calendar_event_id}: {e}")
+    if settings.SLOT_HOLDS_ENABLED:
+        await _release_holds(conversation_id)
+    try:
+        await appointment_reminders.unschedule(appointment.google_calendar_event_id)
+        if settings.REMINDERS_ENABLED:
+            await appointment_reminders.schedule({
+                "google_calendar_event_id": appointment.google_calendar_event_id,
+                "patient_name": appointment.patient_name,
+                "patient_email": appointment.patient_email,
+                "doctor_name": appointment.doctor_name,
+                "service_type": appointment.service_type,
+                "clinic_address": appointment.clinic_address,
+                "start_time": new_start.isoformat(),
+            })
+    except Exception as e:
+        print(f"❌ REMINDER ERROR: Could not move reminders for event {appointment.google_calendar_event_id}: {e}")
+
+    # 4. Email the patient and the doctor the new details
+    email_result = await send_reschedule_email(
+        patient_name=appointment.patient_name,
+        patient_email=appointment.patient_email,
+        service_type=appointment.service_type,
+        doctor_name=appointment.doctor_name,
+        doctor_email=doctor['email'],
+        clinic_address=appointment.clinic_address,
+        previous_start=previous_start,
+        new_start=new_start,
+        duration_minutes=duration_minutes,
+        google_calendar_event_id=appointment.google_calendar_event_id,
+        google_event_link=moved_event.get('htmlLink', ''),
+    )
+
+    return json.dumps({
+        "status": "success",
+        "message": "Appointment rescheduled.",
+        "appointment_details": f"{appointment.service_type} on {new_start.strftime('%A, %B %d at %I:%M %p')} with {appointment.doctor_name}",
+        "email_status": email_result.get("status"),
+    })
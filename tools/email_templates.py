@@ -1,67 +1,29 @@
-PATIENT_CONFIRMATION_HTML = """
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from jinja2 import DictLoader, Environment, StrictUndefined, meta
+
+# --- Layout and Partials ---
+
+_LAYOUT = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Appointment Confirmation</title>
+    <title>{% block title %}{% endblock %}</title>
 </head>
 <body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
-    <table align="center" border="0" cellpadding="0" cellspacing="0" width="600" style="border-collapse: collapse; margin: 20px auto; border: 1px solid #dddddd;">
-        <!-- ... header part of email ... -->
+    <table align="center" border="0" cellpadding="0" cellspacing="0" width="600" style="border-collapse: collapse; margin: 20px auto; border: 1px solid #dddddd; background-color: #ffffff;">
         <tr>
-            <td align="center" bgcolor="#ffffff" style="padding: 40px 0 30px 0;">
-                <h1 style="color: #333333; margin-top: 20px;">Your Appointment is Confirmed!</h1>
+            <td align="center" bgcolor="{% block header_color %}#4C78AF{% endblock %}" style="padding: 30px 0; color: {% block header_text_color %}#ffffff{% endblock %};">
+                <h1 style="margin: 0;">{{ self.title() }}</h1>
             </td>
         </tr>
         <tr>
-            <td bgcolor="#ffffff" style="padding: 40px 30px 40px 30px;">
-                <table border="0" cellpadding="0" cellspacing="0" width="100%">
-                    <!-- ... intro and details table ... -->
-                    <tr>
-                        <td style="color: #333333; font-size: 16px;">
-                            <p>Dear {patient_name},</p>
-                            <p>This email confirms your upcoming appointment with us. Please find the details below:</p>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 20px 0;">
-                            <table border="0" cellpadding="10" cellspacing="0" width="100%" style="border: 1px solid #dddddd;">
-                                <tr style="background-color: #f9f9f9;">
-                                    <td width="150" style="font-weight: bold;">Service:</td>
-                                    <td>{service_type}</td>
-                                </tr>
-                                <tr>
-                                    <td style="font-weight: bold;">Date:</td>
-                                    <td>{formatted_date}</td>
-                                </tr>
-                                <tr style="background-color: #f9f9f9;">
-                                    <td style="font-weight: bold;">Time:</td>
-                                    <td>{formatted_time} (Duration: {duration_minutes} mins)</td>
-                                </tr>
-                                <tr>
-                                    <td style="font-weight: bold;">With:</td>
-                                    <td>{doctor_name}</td>
-                                </tr>
-                                <tr style="background-color: #f9f9f9;">
-                                    <td style="font-weight: bold;">Location:</td>
-                                    <td>{clinic_address}</td>
-                                </tr>
-                            </table>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td align="center" style="padding: 20px 0;">
-                            <a href="{patient_add_to_calendar_link}" style="background-color: #4CAF50; color: white; padding: 12px 25px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px; font-size: 16px;">Add to Your Calendar</a>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td>
-                            <p>If you need to cancel, please contact us at least 24 hours in advance.</p>
-                            <p>We look forward to seeing you!</p>
-                        </td>
-                    </tr>
-                </table>
+            <td style="padding: 40px 30px; color: #333333; font-size: 16px;">
+                {% block content %}{% endblock %}
             </td>
         </tr>
     </table>
@@ -69,98 +31,298 @@ PATIENT_CONFIRMATION_HTML = """
 </html>
 """
 
-DOCTOR_NOTIFICATION_HTML = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>New Appointment Notification</title>
-</head>
-<body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
-    <table align="center" border="0" cellpadding="0" cellspacing="0" width="600" style="border-collapse: collapse; margin: 20px auto; border: 1px solid #dddddd;">
-        <tr>
-            <td align="center" bgcolor="#4C78AF" style="padding: 30px 0; color: #ffffff;">
-                <h1 style="margin: 0;">New Appointment Booked</h1>
-            </td>
-        </tr>
-        <tr>
-            <td bgcolor="#ffffff" style="padding: 40px 30px 40px 30px;">
-                <table border="0" cellpadding="0" cellspacing="0" width="100%">
-                    <tr>
-                        <td style="color: #333333; font-size: 16px;">
-                            <p>Hello {doctor_name},</p>
-                            <p>A new appointment has been booked on your calendar via the AI assistant:</p>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 20px 0;">
-                            <table border="0" cellpadding="10" cellspacing="0" width="100%" style="border: 1px solid #dddddd;">
-                                <tr style="background-color: #f9f9f9;">
-                                    <td width="150" style="font-weight: bold;">Patient:</td>
-                                    <td>{patient_name} (<a href="mailto:{patient_email}">{patient_email}</a>)</td>
-                                </tr>
-                                <tr>
-                                    <td style="font-weight: bold;">Service:</td>
-                                    <td>{service_type}</td>
-                                </tr>
-                                <tr style="background-color: #f9f9f9;">
-                                    <td style="font-weight: bold;">When:</td>
-                                    <td>{formatted_date} at {formatted_time}</td>
-                                </tr>
-                            </table>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td align="center" style="padding: 20px 0;">
-                            <a href="{google_event_link}" style="background-color: #007bff; color: white; padding: 12px 25px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px; font-size: 16px;">View Event in Google Calendar</a>
-                        </td>
-                    </tr>
-                </table>
-            </td>
-        </tr>
+_PARTIALS = """
+{% macro details() -%}
+    <table border="0" cellpadding="10" cellspacing="0" width="100%" style="border: 1px solid #dddddd; margin-top: 20px;">
+        {{ caller() }}
     </table>
-</body>
-</html>
+{%- endmacro %}
+
+{% macro row(label, shaded=False, value_style=None) -%}
+    <tr{% if shaded %} style="background-color: #f9f9f9;"{% endif %}>
+        <td width="150" style="font-weight: bold;">{{ label }}:</td>
+        <td{% if value_style %} style="{{ value_style }}"{% endif %}>{{ caller() }}</td>
+    </tr>
+{%- endmacro %}
+
+{% macro button(href, label, color) -%}
+    <p align="center" style="padding: 20px 0;">
+        <a href="{{ href }}" style="background-color: {{ color }}; color: white; padding: 12px 25px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px; font-size: 16px;">{{ label }}</a>
+    </p>
+{%- endmacro %}
 """
 
-CANCELLATION_CONFIRMATION_HTML = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>Appointment Cancellation</title>
-</head>
-<body style="margin: 0; padding: 0; font-family: Arial, sans-serif; background-color: #f4f4f4;">
-    <table align="center" border="0" cellpadding="0" cellspacing="0" width="600" style="border-collapse: collapse; margin: 20px auto; border: 1px solid #dddddd; background-color: #ffffff;">
-        <tr>
-            <td align="center" bgcolor="#dc3545" style="padding: 30px 0; color: #ffffff;">
-                <h1 style="margin: 0;">Appointment Canceled</h1>
-            </td>
-        </tr>
-        <tr>
-            <td style="padding: 40px 30px;">
-                <p style="font-size: 16px;">Dear {patient_name},</p>
-                <p style="font-size: 16px;">This email confirms that your appointment has been successfully canceled as requested. The details are below:</p>
-                <table border="0" cellpadding="10" cellspacing="0" width="100%" style="border: 1px solid #dddddd; margin-top: 20px;">
-                    <tr style="background-color: #f9f9f9;">
-                        <td width="150" style="font-weight: bold;">Service:</td>
-                        <td>{service_type}</td>
-                    </tr>
-                    <tr>
-                        <td style="font-weight: bold;">Date:</td>
-                        <td>{formatted_date}</td>
-                    </tr>
-                    <tr style="background-color: #f9f9f9;">
-                        <td style="font-weight: bold;">Time:</td>
-                        <td>{formatted_time}</td>
-                    </tr>
-                </table>
-                <p style="font-size: 16px; margin-top: 30px;">If you wish to book a new appointment in the future, please don't hesitate to use our AI assistant or contact us directly.</p>
-                <p style="font-size: 16px;">Best regards</p>
-            </td>
-        </tr>
-    </table>
-</body>
-</html>
-"""
\ No newline at end of file
+# --- Emails ---
+
+_PATIENT_CONFIRMATION = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Your Appointment is Confirmed!{% endblock %}
+{% block header_color %}#ffffff{% endblock %}
+{% block header_text_color %}#333333{% endblock %}
+{% block content %}
+    <p>Dear {{ patient_name }},</p>
+    <p>This email confirms your upcoming appointment with us. Please find the details below:</p>
+    {% call ui.details() %}
+        {% call ui.row("Service", shaded=True) %}{{ service_type }}{% endcall %}
+        {% call ui.row("Date") %}{{ formatted_date }}{% endcall %}
+        {% call ui.row("Time", shaded=True) %}{{ formatted_time }} (Duration: {{ duration_minutes }} mins){% endcall %}
+        {% call ui.row("With") %}{{ doctor_name }}{% endcall %}
+        {% call ui.row("Location", shaded=True) %}{{ clinic_address }}{% endcall %}
+    {% endcall %}
+    {{ ui.button(patient_add_to_calendar_link, "Add to Your Calendar", "#4CAF50") }}
+    <p>If you need to cancel, please contact us at least 24 hours in advance.</p>
+    <p>We look forward to seeing you!</p>
+{% endblock %}
+"""
+
+_DOCTOR_NOTIFICATION = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}New Appointment Booked{% endblock %}
+{% block content %}
+    <p>Hello {{ doctor_name }},</p>
+    <p>A new appointment has been booked on your calendar via the AI assistant:</p>
+    {% call ui.details() %}
+        {% call ui.row("Patient", shaded=True) %}{{ patient_name }} (<a href="mailto:{{ patient_email }}">{{ patient_email }}</a>){% endcall %}
+        {% call ui.row("Service") %}{{ service_type }}{% endcall %}
+        {% call ui.row("When", shaded=True) %}{{ formatted_date }} at {{ formatted_time }}{% endcall %}
+    {% endcall %}
+    {{ ui.button(google_event_link, "View Event in Google Calendar", "#007bff") }}
+{% endblock %}
+"""
+
+_CANCELLATION_CONFIRMATION = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Appointment Canceled{% endblock %}
+{% block header_color %}#dc3545{% endblock %}
+{% block content %}
+    <p>Dear {{ patient_name }},</p>
+    <p>This email confirms that your appointment has been successfully canceled as requested. The details are below:</p>
+    {% call ui.details() %}
+        {% call ui.row("Service", shaded=True) %}{{ service_type }}{% endcall %}
+        {% call ui.row("Date") %}{{ formatted_date }}{% endcall %}
+        {% call ui.row("Time", shaded=True) %}{{ formatted_time }}{% endcall %}
+    {% endcall %}
+    <p style="margin-top: 30px;">If you wish to book a new appointment in the future, please don't hesitate to use our AI assistant or contact us directly.</p>
+    <p>Best regards</p>
+{% endblock %}
+"""
+
+_RESCHEDULE_CONFIRMATION = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Appointment Rescheduled{% endblock %}
+{% block header_color %}#1e88e5{% endblock %}
+{% block content %}
+    <p>Dear {{ patient_name }},</p>
+    <p>Your appointment has been moved as requested. Here are the updated details:</p>
+    {% call ui.details() %}
+        {% call ui.row("Service", shaded=True) %}{{ service_type }}{% endcall %}
+        {% call ui.row("New Date") %}{{ formatted_date }}{% endcall %}
+        {% call ui.row("New Time", shaded=True) %}{{ formatted_time }} (Duration: {{ duration_minutes }} mins){% endcall %}
+        {% call ui.row("With") %}{{ doctor_name }}{% endcall %}
+        {% call ui.row("Location", shaded=True) %}{{ clinic_address }}{% endcall %}
+        {% call ui.row("Previously", value_style="color: #888888; text-decoration: line-through;") %}{{ previous_date }} at {{ previous_time }}{% endcall %}
+    {% endcall %}
+    <p style="margin-top: 30px;">If you need to make further changes, please contact us at least 24 hours in advance.</p>
+    <p>Best regards</p>
+{% endblock %}
+"""
+
+_DOCTOR_RESCHEDULE_NOTIFICATION = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Appointment Rescheduled{% endblock %}
+{% block content %}
+    <p>Hello {{ doctor_name }},</p>
+    <p>An appointment on your calendar was moved via the AI assistant:</p>
+    {% call ui.details() %}
+        {% call ui.row("Patient", shaded=True) %}{{ patient_name }} (<a href="mailto:{{ patient_email }}">{{ patient_email }}</a>){% endcall %}
+        {% call ui.row("Service") %}{{ service_type }}{% endcall %}
+        {% call ui.row("New Time", shaded=True) %}{{ formatted_date }} at {{ formatted_time }}{% endcall %}
+        {% call ui.row("Previously", value_style="color: #888888; text-decoration: line-through;") %}{{ previous_date }} at {{ previous_time }}{% endcall %}
+    {% endcall %}
+    {{ ui.button(google_event_link, "View Event in Google Calendar", "#007bff") }}
+{% endblock %}
+"""
+
+_APPOINTMENT_REMINDER = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Appointment Reminder{% endblock %}
+{% block header_color %}#4CAF50{% endblock %}
+{% block content %}
+    <p>Dear {{ patient_name }},</p>
+    <p>This is a friendly reminder of your upcoming appointment {{ time_until }}:</p>
+    {% call ui.details() %}
+        {% call ui.row("Service", shaded=True) %}{{ service_type }}{% endcall %}
+        {% call ui.row("Date") %}{{ formatted_date }}{% endcall %}
+        {% call ui.row("Time", shaded=True) %}{{ formatted_time }}{% endcall %}
+        {% call ui.row("With") %}{{ doctor_name }}{% endcall %}
+        {% call ui.row("Location", shaded=True) %}{{ clinic_address }}{% endcall %}
+    {% endcall %}
+    <p style="margin-top: 30px;">If you can no longer make it, please cancel or reschedule through our AI assistant as early as possible.</p>
+    <p>We look forward to seeing you!</p>
+{% endblock %}
+"""
+
+_DOCTOR_DIGEST = """
+{% extends "layout.html" %}
+{% import "partials.html" as ui %}
+{% block title %}Your Appointment Digest{% endblock %}
+{% block content %}
+    <p>Hello {{ doctor_name }},</p>
+    {% if new_bookings %}
+        <p>{{ new_bookings|length }} new appointment(s) were booked via the AI assistant since {{ since }}:</p>
+        {% call ui.details() %}
+            {% for booking in new_bookings %}
+                {% call ui.row(booking.when, shaded=loop.index is odd) %}{{ booking.patient_name }} (<a href="mailto:{{ booking.patient_email }}">{{ booking.patient_email }}</a>) - {{ booking.service_type }}{% endcall %}
+            {% endfor %}
+        {% endcall %}
+    {% endif %}
+    {% if upcoming %}
+        <p style="margin-top: 30px;">Your schedule for {{ period_label }}:</p>
+        {% call ui.details() %}
+            {% for booking in upcoming %}
+                {% call ui.row(booking.when, shaded=loop.index is odd) %}{{ booking.patient_name }} - {{ booking.service_type }}{% endcall %}
+            {% endfor %}
+        {% endcall %}
+    {% else %}
+        <p style="margin-top: 30px;">You have no appointments scheduled for {{ period_label }}.</p>
+    {% endif %}
+{% endblock %}
+"""
+
+PATIENT_CONFIRMATION = "patient_confirmation.html"
+DOCTOR_NOTIFICATION = "doctor_notification.html"
+CANCELLATION_CONFIRMATION = "cancellation_confirmation.html"
+RESCHEDULE_CONFIRMATION = "reschedule_confirmation.html"
+DOCTOR_RESCHEDULE_NOTIFICATION = "doctor_reschedule_notification.html"
+APPOINTMENT_REMINDER = "appointment_reminder.html"
+DOCTOR_DIGEST = "doctor_digest.html"
+
+_SOURCES = {
+    "layout.html": _LAYOUT,
+    "partials.html": _PARTIALS,
+    PATIENT_CONFIRMATION: _PATIENT_CONFIRMATION,
+    DOCTOR_NOTIFICATION: _DOCTOR_NOTIFICATION,
+    CANCELLATION_CONFIRMATION: _CANCELLATION_CONFIRMATION,
+    RESCHEDULE_CONFIRMATION: _RESCHEDULE_CONFIRMATION,
+    DOCTOR_RESCHEDULE_NOTIFICATION: _DOCTOR_RESCHEDULE_NOTIFICATION,
+    APPOINTMENT_REMINDER: _APPOINTMENT_REMINDER,
+    DOCTOR_DIGEST: _DOCTOR_DIGEST,
+}
+_EMAILS = [
+    PATIENT_CONFIRMATION, DOCTOR_NOTIFICATION, CANCELLATION_CONFIRMATION, RESCHEDULE_CONFIRMATION,
+    DOCTOR_RESCHEDULE_NOTIFICATION, APPOINTMENT_REMINDER,
+]
+# Templates that loop over their data cannot be pre-rendered with markers; their text is converted per render.
+_LIST_EMAILS = [DOCTOR_DIGEST]
+
+
+def _minify(source: str) -> str:
+    """Drops the indentation between tags, so the minifying cost is paid once per template."""
+    source = re.sub(r"<!--.*?-->", "", source, flags=re.DOTALL)
+    source = re.sub(r"(>|%\})\s+(<|\{%)", r"\1\2", source)
+    source = re.sub(r"\s*\n\s*", " ", source)
+    return source.strip()
+
+
+class _TextConverter(HTMLParser):
+    """Turns rendered email HTML into a readable plain-text alternative."""
+
+    _BLOCKS = {"p", "tr", "h1", "br", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._href = None
+        self._link_text: List[str] = []
+        self._skip = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("head", "style"):
+            self._skip = True
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+            self._link_text = []
+        elif tag == "td" and self.parts and not self.parts[-1].endswith("\n"):
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in ("head", "style"):
+            self._skip = False
+        elif tag == "a" and self._href is not None:
+            text = "".join(self._link_text).strip()
+            target = self._href.removeprefix("mailto:")
+            self.parts.append(text if target == text else f"{text}: {target}")
+            self._href = None
+        elif tag in self._BLOCKS:
+            self.parts.append("\n\n" if tag in ("p", "h1", "table") else "\n")
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        (self._link_text if self._href is not None else self.parts).append(data)
+
+    def text(self) -> str:
+        lines = (re.sub(r"[ \t]+", " ", line).strip() for line in "".join(self.parts).splitlines())
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n"
+
+
+def _html_to_text(html: str) -> str:
+    converter = _TextConverter()
+    converter.feed(html)
+    converter.close()
+    return converter.text()
+
+
+class _TextTemplate:
+    """
+    The plain-text version of an email, derived from its HTML template once: the HTML is
+    rendered with a marker for each variable, converted to text, and split on the markers.
+    Rendering is then a single join, with values inserted unescaped.
+    """
+
+    _MARKER = "\ue000{}\ue000"  # A private-use character, which never appears in the templates
+
+    def __init__(self, template, variables):
+        html = template.render({name: self._MARKER.format(name) for name in variables})
+        self._parts = _html_to_text(html).split("\ue000")
+
+    def render(self, context: Dict[str, Any]) -> str:
+        return "".join(part if i % 2 == 0 else str(context[part]) for i, part in enumerate(self._parts))
+
+
+class RenderedEmail(NamedTuple):
+    html: str
+    text: str
+
+
+_environment = Environment(
+    loader=DictLoader({name: _minify(source) for name, source in _SOURCES.items()}),
+    autoescape=True,  # Every value (patient names, addresses, links) is HTML-escaped
+    undefined=StrictUndefined,
+    auto_reload=False,
+)
+
+
+def _compile(name: str) -> Tuple[Any, _TextTemplate]:
+    template = _environment.get_template(name)
+    variables = meta.find_undeclared_variables(_environment.parse(_environment.loader.get_source(_environment, name)[0]))
+    return template, _TextTemplate(template, variables)
+
+
+# Compiled once at import, i.e. at startup
+_compiled = {name: _compile(name) for name in _EMAILS}
+_compiled.update({name: (_environment.get_template(name), None) for name in _LIST_EMAILS})
+
+
+def render_email(name: str, **context: Any) -> RenderedEmail:
+    """Renders one of the email templates above into minified HTML and a plain-text alternative."""
+    template, text_template = _compiled[name]
+    html = template.render(context)
+    text = text_template.render(context) if text_template else _html_to_text(html)
+    return RenderedEmail(html=html, text=text)
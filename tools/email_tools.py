@@ -1,47 +1,73 @@
-import asyncio
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional
 from dateutil.parser import parse as date_parse
+from sqlmodel import select
 
-# SendGrid specific imports
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, From, To, Subject, HtmlContent
-
-from .email_templates import PATIENT_CONFIRMATION_HTML, DOCTOR_NOTIFICATION_HTML, CANCELLATION_CONFIRMATION_HTML
+from .email_templates import (
+    PATIENT_CONFIRMATION,
+    DOCTOR_NOTIFICATION,
+    CANCELLATION_CONFIRMATION,
+    RESCHEDULE_CONFIRMATION,
+    DOCTOR_RESCHEDULE_NOTIFICATION,
+    RenderedEmail,
+    render_email,
+)
 
 from agents import function_tool
 
+from api.db.cache import redis_pool
+from api.db.session import async_session_maker
+from api.models.appointment import Appointment
+from api.workers.email_outbox import send_emails
 from core.config import get_settings
 
 settings = get_settings()
 
-# --- Helper for sending a single email ---
-async def _send_email_task(
-    recipient: str, 
-    subject: str, 
-    html_body: str, 
-    client: SendGridAPIClient,
-    from_email: From
-) -> Dict[str, Any]:
-    """Internal helper to create and send one email using SendGrid."""
-    message = Mail(
-        from_email=from_email,
-        to_emails=To(recipient),
-        subject=Subject(subject),
-        html_content=HtmlContent(html_body)
-    )
+# Emails are written to the outbox table and delivered by `email_outbox_worker`, so a
+# slow SendGrid never holds up the agent's turn. With the outbox disabled they are sent inline.
+_DELIVERY_STATUS = "queued" if settings.EMAIL_OUTBOX_ENABLED else "sent"
+
+
+async def _resolve_event_id(google_calendar_event_id: str, canceled: bool = False) -> Optional[str]:
+    """
+    Returns the event ID if it is one this server booked (or, with `canceled`, just canceled),
+    otherwise None. The ID comes from the model and keys the outbox dedupe, so an empty or
+    made-up value must never reach the outbox, where it could suppress another booking's emails.
+    """
+    event_id = (google_calendar_event_id or "").strip()
+    if not event_id:
+        return None
+    cache_key = f"cancelled_booking:{event_id}" if canceled else f"booking_result:{event_id}"
     try:
-        loop = asyncio.get_event_loop()
-        # The sendgrid library's send method is synchronous, so we run it in an executor
-        response = await loop.run_in_executor(None, lambda: client.send(message))
-        
-        if 200 <= response.status_code < 300:
-            return {"recipient": recipient, "status": "success", "status_code": response.status_code}
-        else:
-            return {"recipient": recipient, "status": "error", "status_code": response.status_code, "body": response.body}
-            
+        if await redis_pool.exists(cache_key):
+            return event_id
     except Exception as e:
-        print(f"ERROR sending SendGrid email to {recipient}: {e}")
-        return {"recipient": recipient, "status": "error", "message": str(e)}
+        print(f"❌ BOOKING CACHE ERROR: {e}")
+    if canceled:
+        return None
+    # The cached booking result expires; the booking record outlives it.
+    async with async_session_maker() as session:
+        statement = select(Appointment.id).where(Appointment.google_calendar_event_id == event_id)
+        found = (await session.exec(statement)).first()
+    return event_id if found is not None else None
+
+def _outbox_message(
+    kind: str,
+    dedupe_key: str,
+    recipient: str,
+    subject: str,
+    email: RenderedEmail,
+    google_calendar_event_id: str = None,
+) -> Dict[str, Any]:
+    return {
+        "kind": kind,
+        "dedupe_key": dedupe_key,
+        "recipient": recipient,
+        "subject": subject,
+        "html_body": email.html,
+        "text_body": email.text,
+        "google_calendar_event_id": google_calendar_event_id,
+    }
 
 
 @function_tool
@@ -56,10 +82,11 @@ async def send_booking_confirmation(
     service_type: str,
     google_event_link: str,
     patient_add_to_calendar_link: str,
+    google_calendar_event_id: str,
 ) -> Dict[str, Any]:
     """
-    Sends professional booking confirmation emails to both the patient and the doctor.
-    This single tool handles all formatting and sending logic.
+    Queues professional booking confirmation emails to both the patient and the doctor.
+    This single tool handles all formatting; the emails are delivered in the background.
 
     Args:
         patient_name (str): Full name of the patient.
@@ -72,11 +99,12 @@ async def send_booking_confirmation(
         service_type (str): A user-friendly description of the service.
         google_event_link (str): The direct link for the DOCTOR to view the event.
         patient_add_to_calendar_link (str): The universal link for the PATIENT to add the event.
+        google_calendar_event_id (str): The `google_calendar_event_id` returned by `create_appointment`.
 
     Returns:
-        A dictionary summarizing the outcome of the email sending operations.
+        A dictionary summarizing the outcome of queueing the emails.
     """
-    # --- 1. Prepare Data and Client ---
+    # --- 1. Prepare Data ---
     try:
         api_key = settings.SENDGRID_API_KEY
         from_address = settings.SENDGRID_FROM_EMAIL
@@ -85,9 +113,6 @@ async def send_booking_confirmation(
         if not all([api_key, from_address, from_name]):
             raise ValueError("SendGrid API key, from_email, or from_name is not configured")
 
-        sendgrid_client = SendGridAPIClient(api_key)
-        from_email_obj = From(email=from_address, name=from_name)
-        
         start_dt = date_parse(start_time_iso)
         end_dt = date_parse(end_time_iso)
         
@@ -98,8 +123,16 @@ async def send_booking_confirmation(
     except Exception as e:
         return {"status": "error", "message": f"Failed during data preparation: {e}", "email_statuses": []}
 
+    event_id = await _resolve_event_id(google_calendar_event_id)
+    if event_id is None:
+        return {
+            "status": "error",
+            "message": "Unknown google_calendar_event_id. Pass the exact `google_calendar_event_id` returned by `create_appointment`.",
+        }
+
     # --- 2. Craft Email Bodies ---
-    patient_html = PATIENT_CONFIRMATION_HTML.format(
+    patient_email_body = render_email(
+        PATIENT_CONFIRMATION,
         patient_name=patient_name, service_type=service_type,
         formatted_date=formatted_date, formatted_time=formatted_time,
         duration_minutes=duration_minutes, doctor_name=doctor_name,
@@ -108,26 +141,36 @@ async def send_booking_confirmation(
         patient_add_to_calendar_link=patient_add_to_calendar_link
     )
     
-    doctor_html = DOCTOR_NOTIFICATION_HTML.format(
-        doctor_name=doctor_name, patient_name=patient_name,
-        patient_email=patient_email, service_type=service_type,
-        formatted_date=formatted_date, formatted_time=formatted_time,
-        google_event_link=google_event_link
-    )
-
-    # --- 3. Create and Run Sending Tasks Concurrently ---
-    tasks = [
-        _send_email_task(patient_email, f"Appointment Confirmation", patient_html, sendgrid_client, from_email_obj),
-        _send_email_task(doctor_email, f"[New Booking] {patient_name} - {formatted_date}", doctor_html, sendgrid_client, from_email_obj)
+    messages = [
+        _outbox_message(
+            "booking_confirmation", f"booking_confirmation:{event_id}",
+            patient_email, "Appointment Confirmation", patient_email_body, event_id,
+        ),
     ]
-    
-    results = await asyncio.gather(*tasks)
-    all_successful = all(res['status'] == 'success' for res in results)
-    
+    # In digest mode the doctor hears about the booking in their next digest instead.
+    if not settings.DOCTOR_DIGEST_ENABLED:
+        doctor_email_body = render_email(
+            DOCTOR_NOTIFICATION,
+            doctor_name=doctor_name, patient_name=patient_name,
+            patient_email=patient_email, service_type=service_type,
+            formatted_date=formatted_date, formatted_time=formatted_time,
+            google_event_link=google_event_link
+        )
+        messages.append(_outbox_message(
+            "doctor_notification", f"doctor_notification:{event_id}",
+            doctor_email, f"[New Booking] {patient_name} - {formatted_date}", doctor_email_body, event_id,
+        ))
+
+    # --- 3. Queue the Emails for Delivery ---
+    try:
+        await send_emails(messages)
+    except Exception as e:
+        print(f"❌ EMAIL OUTBOX ERROR: Could not send confirmation for event {event_id}: {e}")
+        return {"status": "error", "message": f"Failed to send confirmation emails: {e}"}
+
     return {
-        "status": "success" if all_successful else "partial_failure",
-        "message": "Email confirmation process finished via SendGrid.",
-        "email_statuses": results
+        "status": _DELIVERY_STATUS,
+        "message": f"Confirmation emails are {_DELIVERY_STATUS} and will be delivered via SendGrid shortly.",
     }
 
 @function_tool
@@ -135,47 +178,109 @@ async def send_cancellation_email(
     patient_name: str,
     patient_email: str,
     service_type: str,
-    start_time_iso: str
+    start_time_iso: str,
+    google_calendar_event_id: str
 ) -> Dict[str, Any]:
-    """Sends a cancellation confirmation email to the patient.
+    """Queues a cancellation confirmation email to the patient.
     
     Args:
         patient_name (str): Full name of the patient.
         patient_email (str): Email address of the patient.
         start_time_iso (str): The appointment start time in ISO 8601 format (e.g., 2024-12-29T10:00:00-04:00).
         service_type (str): A user-friendly description of the service.
+        google_calendar_event_id (str): The `google_calendar_event_id` returned by `cancel_appointment`.
 
     Returns:
-        The status of cancellation email sending process (success or error)
+        The status of queueing the cancellation email (queued or error)
     """
+    event_id = await _resolve_event_id(google_calendar_event_id, canceled=True)
+    if event_id is None:
+        return {
+            "status": "error",
+            "message": "Unknown google_calendar_event_id. Pass the exact `google_calendar_event_id` returned by `cancel_appointment`.",
+        }
     try:
-        api_key = settings.SENDGRID_API_KEY
-        from_email_obj = From(email=settings.SENDGRID_FROM_EMAIL, name=settings.SENDGRID_FROM_NAME)
-        sendgrid_client = SendGridAPIClient(api_key)
-
         start_dt = date_parse(start_time_iso)
         
         formatted_date = start_dt.strftime("%A, %B %d, %Y")
         formatted_time = start_dt.strftime("%I:%M %p %Z")
 
-        html_body = CANCELLATION_CONFIRMATION_HTML.format(
+        email_body = render_email(
+            CANCELLATION_CONFIRMATION,
             patient_name=patient_name,
             service_type=service_type,
             formatted_date=formatted_date,
             formatted_time=formatted_time
         )
 
-        email_task = _send_email_task(
-            patient_email,
-            f"Cancellation Confirmation",
-            html_body,
-            sendgrid_client,
-            from_email_obj,
+        await send_emails([_outbox_message(
+            "cancellation", f"cancellation:{event_id}",
+            patient_email, "Cancellation Confirmation", email_body, event_id,
+        )])
+        return {"status": _DELIVERY_STATUS, "message": f"Cancellation email is {_DELIVERY_STATUS} and will be delivered shortly."}
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to send the cancellation email: {e}"}
+
+async def send_reschedule_email(
+    patient_name: str,
+    patient_email: str,
+    service_type: str,
+    doctor_name: str,
+    doctor_email: str,
+    clinic_address: str,
+    previous_start: datetime,
+    new_start: datetime,
+    duration_minutes: int,
+    google_calendar_event_id: str,
+    google_event_link: str,
+) -> Dict[str, Any]:
+    """
+    Queues the "appointment rescheduled" emails to the patient and the doctor. Called by
+    `reschedule_appointment`.
+    """
+    try:
+        formatted_date = new_start.strftime("%A, %B %d, %Y")
+        formatted_time = new_start.strftime("%I:%M %p %Z")
+        previous_date = previous_start.strftime("%A, %B %d, %Y")
+        previous_time = previous_start.strftime("%I:%M %p %Z")
+        patient_email_body = render_email(
+            RESCHEDULE_CONFIRMATION,
+            patient_name=patient_name,
+            service_type=service_type,
+            formatted_date=formatted_date,
+            formatted_time=formatted_time,
+            duration_minutes=duration_minutes,
+            doctor_name=doctor_name,
+            clinic_address=clinic_address,
+            previous_date=previous_date,
+            previous_time=previous_time,
+        )
+        # The event has no attendees, so Google's own update notice never reaches the doctor.
+        # Unlike new bookings this is not left to the digest: the slot may now be today.
+        doctor_email_body = render_email(
+            DOCTOR_RESCHEDULE_NOTIFICATION,
+            doctor_name=doctor_name,
+            patient_name=patient_name,
+            patient_email=patient_email,
+            service_type=service_type,
+            formatted_date=formatted_date,
+            formatted_time=formatted_time,
+            previous_date=previous_date,
+            previous_time=previous_time,
+            google_event_link=google_event_link,
         )
-        result = await email_task
-        if result["status"] == "success":
-            return {"status": "success", "message": "Cancellation email sent successfully."}
-        else:
-            return result
+        # Each move of the appointment gets its own emails; a repeat of the same move does not.
+        move_id = f"{google_calendar_event_id}:{int(new_start.timestamp())}"
+        await send_emails([
+            _outbox_message(
+                "reschedule", f"reschedule:{move_id}",
+                patient_email, "Appointment Rescheduled", patient_email_body, google_calendar_event_id,
+            ),
+            _outbox_message(
+                "doctor_reschedule", f"doctor_reschedule:{move_id}",
+                doctor_email, f"[Rescheduled] {patient_name} - {formatted_date}", doctor_email_body, google_calendar_event_id,
+            ),
+        ])
+        return {"status": _DELIVERY_STATUS}
     except Exception as e:
-        return {"status": "error", "message": f"Failed during email preparation: {e}"}
\ No newline at end of file
+        return {"status": "error", "message": f"Failed to send the reschedule emails: {e}"}
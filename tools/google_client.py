@@ -0,0 +1,200 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httplib2
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from core.config import clinic_config, get_settings
+from core.integrations import Integration, register_integration
+from core.metrics import metrics
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_calendar_discovery_doc: Optional[Dict[str, Any]] = None
+
+
+def _get_calendar_discovery_doc() -> Dict[str, Any]:
+    """Parses the Calendar v3 discovery document bundled with googleapiclient once, offline."""
+    global _calendar_discovery_doc
+    if _calendar_discovery_doc is None:
+        doc = get_static_doc("calendar", "v3")
+        if doc is None:
+            raise RuntimeError("The bundled Calendar v3 discovery document is missing from googleapiclient.")
+        _calendar_discovery_doc = json.loads(doc)
+    return _calendar_discovery_doc
+
+
+class _ThreadLocalTransport:
+    """
+    httplib2 connections are not thread-safe, so each executor thread gets its own
+    authorized transport per client. Connections are still reused by every call that
+    thread makes, and the thread count is bounded by the Google Calendar bulkhead.
+    """
+
+    def __init__(self, credentials):
+        self._credentials = credentials
+        self._local = threading.local()
+
+    def http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=settings.GOOGLE_API_SOCKET_TIMEOUT_SECONDS))
+            self._local.http = http
+            metrics.incr("google_api_transports_created")
+        return http
+
+    def request_builder(self, _http, *args, **kwargs) -> HttpRequest:
+        return HttpRequest(self.http(), *args, **kwargs)
+
+
+class GoogleCalendarClientFactory:
+    """
+    Builds and caches one Google Calendar client per doctor and scope set.
+
+    Clients are built from the bundled static discovery document (no network fetch), and
+    doctors are indexed by email and name. Call `preload()` at startup so the first
+    booking after a deploy does not pay for decoding credentials and building the client.
+    Every request a client makes goes through a per-thread transport, so clients can be
+    shared safely across executor threads.
+    """
+
+    def __init__(self, doctors: List[Dict[str, Any]]):
+        self._doctors: Dict[str, Dict[str, Any]] = {}
+        for doctor in doctors:
+            self._doctors[doctor['email']] = doctor
+            self._doctors[doctor['name']] = doctor
+        self._clients: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        self._lock = threading.Lock()
+
+    def find_doctor(self, doctor_identifier: str) -> Optional[Dict[str, Any]]:
+        """Looks a doctor up by email or name."""
+        return self._doctors.get(doctor_identifier)
+
+    def get(self, doctor_identifier: str, scopes: List[str]) -> Any:
+        """Returns the cached client for a doctor, building it on first use."""
+        doctor = self.find_doctor(doctor_identifier)
+        if not doctor:
+            raise ValueError(f"Could not find configuration for doctor: {doctor_identifier}")
+
+        cache_key = (doctor['email'], tuple(sorted(scopes)))
+        client = self._clients.get(cache_key)
+        if client is not None:
+            metrics.incr("google_client_requests", cache="warm")
+            return client
+
+        with self._lock:
+            client = self._clients.get(cache_key)
+            if client is None:
+                started = time.perf_counter()
+                client = self._build(doctor, scopes)
+                metrics.observe("google_client_build_seconds", time.perf_counter() - started)
+                self._clients[cache_key] = client
+                metrics.incr("google_client_requests", cache="cold")
+        return client
+
+    def preload(self, scopes: List[str]) -> Dict[str, float]:
+        """Builds clients for every configured doctor. Returns the build time per doctor."""
+        timings = {}
+        for doctor in {id(doc): doc for doc in self._doctors.values()}.values():
+            started = time.perf_counter()
+            try:
+                self.get(doctor['email'], scopes)
+                timings[doctor['email']] = time.perf_counter() - started
+            except Exception as e:
+                print(f"❌ GOOGLE CLIENT ERROR: Could not preload client for {doctor['email']}: {e}")
+        metrics.set_gauge("google_clients_loaded", len(self._clients))
+        return timings
+
+    @staticmethod
+    def _build(doctor: Dict[str, Any], scopes: List[str]) -> Any:
+        # Read the Base64-encoded service account JSON named in clinic_info.json
+        env_var_prefix = doctor.get("google_credentials_env_var")
+        if not env_var_prefix:
+            raise ValueError(f"Missing 'google_credentials_env_var' setting for doctor: {doctor['email']}")
+        env_var_name = env_var_prefix + "_B64"
+
+        creds_b64_str = os.getenv(env_var_name)
+        if not creds_b64_str:
+            raise ValueError(f"Environment variable '{env_var_name}' is not set or empty.")
+
+        try:
+            creds_info = json.loads(base64.b64decode(creds_b64_str).decode('utf-8'))
+        except json.JSONDecodeError:
+            raise ValueError(f"Could not parse JSON from environment variable '{env_var_name}'.")
+
+        try:
+            creds = service_account.Credentials.from_service_account_info(creds_info, scopes=scopes)
+            transport = _ThreadLocalTransport(creds)
+            return build_from_document(
+                _get_calendar_discovery_doc(),
+                http=transport.http(),
+                requestBuilder=transport.request_builder,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to create Google service for {doctor['email']}: {e}")
+
+
+google_clients = GoogleCalendarClientFactory(clinic_config['doctors'])
+
+_doctor_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _doctor_semaphore(doctor_email: str) -> asyncio.Semaphore:
+    semaphore = _doctor_semaphores.get(doctor_email)
+    if semaphore is None:
+        limit = settings.GOOGLE_API_DOCTOR_CONCURRENCY.get(doctor_email, settings.GOOGLE_API_MAX_CONCURRENCY_PER_DOCTOR)
+        semaphore = _doctor_semaphores[doctor_email] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS_CODES
+    return isinstance(error, (asyncio.TimeoutError, OSError, httplib2.HttpLib2Error))
+
+
+google_calendar_integration = register_integration(Integration(
+    "google_calendar",
+    max_concurrency=settings.GOOGLE_API_MAX_WORKERS,
+    timeout=settings.GOOGLE_API_CALL_TIMEOUT_SECONDS,
+    failure_threshold=settings.INTEGRATION_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=settings.INTEGRATION_CIRCUIT_RESET_SECONDS,
+    is_failure=_is_retryable,
+))
+
+
+async def run_calendar_call(doctor_email: str, call: Callable[[], T], retry: bool = True) -> T:
+    """
+    Runs a blocking Google Calendar call (e.g. `lambda: request.execute()`) through the
+    Google Calendar bulkhead, capped at the doctor's concurrency limit.
+
+    Each attempt is bounded by `GOOGLE_API_CALL_TIMEOUT_SECONDS`. Timeouts, connection
+    errors, 429s and 5xx responses are retried with full-jitter exponential backoff.
+    Pass `retry=False` for calls that are not safe to repeat.
+    """
+    attempts = 1 + (settings.GOOGLE_API_MAX_RETRIES if retry else 0)
+    for attempt in range(attempts):
+        try:
+            async with _doctor_semaphore(doctor_email):
+                return await google_calendar_integration.run(call)
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                metrics.incr("google_api_call_failures")
+                raise
+            metrics.incr("google_api_call_retries")
+            await asyncio.sleep(random.uniform(0, settings.GOOGLE_API_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
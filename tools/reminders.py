@@ -0,0 +1,158 @@
+import json
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+
+from dateutil.parser import parse as date_parse
+from redis.asyncio import Redis
+
+from api.db.cache import redis_pool
+from core.config import get_settings
+from core.metrics import metrics
+
+settings = get_settings()
+
+DUE_KEY = "reminders:due"  # Sorted set: job id scored by fire time (epoch seconds)
+PROCESSING_KEY = "reminders:processing"  # Sorted set: popped job id scored by lease expiry
+JOBS_KEY = "reminders:jobs"  # Hash: job id -> JSON payload
+
+# KEYS: due, processing, jobs, event index. ARGV: index expiry (epoch seconds), then
+# id/fire time/payload triples. Jobs a worker is currently sending are left alone.
+# Returns the number of jobs that were not already queued.
+_SCHEDULE_SCRIPT = """
+local added = 0
+for i = 2, #ARGV, 3 do
+    local id = ARGV[i]
+    if not redis.call('ZSCORE', KEYS[2], id) then
+        added = added + redis.call('ZADD', KEYS[1], ARGV[i + 1], id)
+        redis.call('HSET', KEYS[3], id, ARGV[i + 2])
+        redis.call('SADD', KEYS[4], id)
+    end
+end
+redis.call('EXPIREAT', KEYS[4], ARGV[1])
+return added
+"""
+
+_UNSCHEDULE_SCRIPT = """
+local ids = redis.call('SMEMBERS', KEYS[4])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('HDEL', KEYS[3], id)
+end
+redis.call('DEL', KEYS[4])
+return #ids
+"""
+
+# Moves up to ARGV[2] jobs due by ARGV[1] into the processing set with a lease until
+# ARGV[3], and returns them as id/payload pairs.
+_POP_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local popped = {}
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    local payload = redis.call('HGET', KEYS[3], id)
+    if payload then
+        redis.call('ZADD', KEYS[2], ARGV[3], id)
+        table.insert(popped, id)
+        table.insert(popped, payload)
+    end
+end
+return popped
+"""
+
+# Returns jobs whose lease ran out (their worker died mid-batch) to the due set.
+_REQUEUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], ARGV[1], id)
+end
+return #ids
+"""
+
+
+class ReminderStore:
+    """
+    Time-indexed queue of patient reminder emails.
+
+    Each appointment gets one job per `REMINDER_OFFSETS_HOURS` entry, scored by the time it
+    should fire, so finding due reminders is a range read on the sorted set no matter how
+    many are pending. Workers pop due jobs into a processing set with a lease and only
+    delete them once handled, which gives at-least-once delivery.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self._schedule = redis.register_script(_SCHEDULE_SCRIPT)
+        self._unschedule = redis.register_script(_UNSCHEDULE_SCRIPT)
+        self._pop = redis.register_script(_POP_SCRIPT)
+        self._requeue = redis.register_script(_REQUEUE_SCRIPT)
+
+    @staticmethod
+    def _event_key(event_id: str) -> str:
+        return f"reminders:event:{event_id}"
+
+    @staticmethod
+    def _keys(event_id: str = "") -> List[str]:
+        return [DUE_KEY, PROCESSING_KEY, JOBS_KEY, ReminderStore._event_key(event_id)]
+
+    async def schedule(self, appointment: Dict[str, Any]) -> int:
+        """
+        Schedules the reminders for an appointment given as `appointment_details` (see
+        `create_appointment`). Reminders whose time has already passed are skipped, and
+        scheduling the same appointment again is a no-op. Returns the number newly queued.
+        """
+        event_id = appointment["google_calendar_event_id"]
+        start = date_parse(appointment["start_time"])
+        now = time.time()
+        args = [int(start.timestamp()) + 86400]
+        payload = json.dumps({
+            key: appointment[key]
+            for key in ("google_calendar_event_id", "patient_name", "patient_email", "doctor_name",
+                        "service_type", "clinic_address", "start_time")
+        })
+        for hours in settings.REMINDER_OFFSETS_HOURS:
+            fire_at = (start - timedelta(hours=hours)).timestamp()
+            if fire_at > now:
+                # The start time is part of the ID, so a rescheduled appointment gets fresh jobs.
+                args += [f"{event_id}:{int(start.timestamp())}:{hours}h", fire_at, payload]
+        if len(args) == 1:
+            return 0
+        scheduled = await self._schedule(keys=self._keys(event_id), args=args)
+        metrics.incr("reminders_scheduled", scheduled)
+        return scheduled
+
+    async def unschedule(self, event_id: str) -> int:
+        """Drops every pending reminder of an appointment, e.g. when it is canceled or moved."""
+        return await self._unschedule(keys=self._keys(event_id), args=[])
+
+    async def pop_due(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        now = time.time()
+        popped = await self._pop(keys=self._keys(), args=[now, limit, now + settings.REMINDER_LEASE_SECONDS])
+        return [(popped[i], json.loads(popped[i + 1])) for i in range(0, len(popped), 2)]
+
+    async def ack(self, job_ids: List[str]):
+        """Deletes handled jobs. Their per-appointment index expires on its own."""
+        if not job_ids:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(PROCESSING_KEY, *job_ids)
+            pipe.hdel(JOBS_KEY, *job_ids)
+            await pipe.execute()
+
+    async def requeue_expired(self, limit: int) -> int:
+        return await self._requeue(keys=self._keys(), args=[time.time(), limit])
+
+    async def backlog(self) -> Tuple[int, int, float]:
+        """Returns (pending, in processing, seconds the oldest due job is overdue)."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(DUE_KEY)
+            pipe.zcard(PROCESSING_KEY)
+            pipe.zrange(DUE_KEY, 0, 0, withscores=True)
+            pending, processing, oldest = await pipe.execute()
+        overdue = max(0.0, time.time() - oldest[0][1]) if oldest else 0.0
+        return pending, processing, overdue
+
+
+appointment_reminders = ReminderStore(redis_pool)
@@ -0,0 +1,137 @@
+import re
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+_HOURS_PATTERN = re.compile(
+    r"^\s*(\d{1,2}(?::\d{2})?\s*[AaPp][Mm])\s*-\s*(\d{1,2}(?::\d{2})?\s*[AaPp][Mm])\s*$"
+)
+
+
+def _parse_clock(value: str) -> time:
+    value = value.replace(" ", "").upper()
+    fmt = "%I:%M%p" if ":" in value else "%I%p"
+    return datetime.strptime(value, fmt).time()
+
+
+def parse_clinic_hours(clinic_hours: Dict[str, str]) -> Dict[int, Tuple[time, time]]:
+    """
+    Parses `clinic_hours` from clinic_info.json (e.g. "9:00 AM - 5:00 PM" or "Closed")
+    into a weekday (Monday=0) -> (open, close) mapping. Closed days are omitted.
+    """
+    weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    parsed = {}
+    for day, hours in clinic_hours.items():
+        match = _HOURS_PATTERN.match(hours)
+        if match:
+            parsed[weekdays.index(day.lower())] = (_parse_clock(match.group(1)), _parse_clock(match.group(2)))
+    return parsed
+
+
+def merge_intervals(intervals: Iterable[Interval], padding: timedelta = timedelta(0)) -> List[Interval]:
+    """Sorts and merges overlapping (or touching) intervals, optionally padding each side."""
+    merged: List[Interval] = []
+    for start, end in sorted((start - padding, end + padding) for start, end in intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_interval(intervals: Iterable[Interval], removed: Interval) -> List[Interval]:
+    """
+    Removes `removed` from each interval, trimming or splitting the ones it overlaps. Free/busy
+    responses merge adjacent events into one block, so an event cannot be dropped by equality.
+    """
+    remaining: List[Interval] = []
+    for start, end in intervals:
+        if end <= removed[0] or start >= removed[1]:
+            remaining.append((start, end))
+            continue
+        if start < removed[0]:
+            remaining.append((start, removed[0]))
+        if end > removed[1]:
+            remaining.append((removed[1], end))
+    return remaining
+
+
+def _align_up(moment: datetime, granularity: timedelta) -> datetime:
+    """Rounds up to the next multiple of `granularity` past midnight."""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    steps = -(-(moment - midnight) // granularity)
+    return midnight + steps * granularity
+
+
+def compute_free_slots(
+    window_start: datetime,
+    window_end: datetime,
+    busy: Iterable[Interval],
+    opening_hours: Dict[int, Tuple[time, time]],
+    duration_minutes: int,
+    tz,
+    buffer_minutes: int = 0,
+    granularity_minutes: int = 15,
+    not_before: Optional[datetime] = None,
+) -> List[datetime]:
+    """
+    Returns every bookable start time in `[window_start, window_end)`, in the clinic's
+    `tz` (a pytz timezone).
+
+    A start is bookable when the whole appointment fits inside the clinic's opening hours
+    for that day and does not come within `buffer_minutes` of a busy interval. Busy
+    intervals are merged once, and each day's gaps are found with a single forward walk
+    over the merged list, so the cost is linear in days + busy intervals + slots.
+    """
+    duration = timedelta(minutes=duration_minutes)
+    granularity = timedelta(minutes=granularity_minutes)
+    merged = merge_intervals(busy, padding=timedelta(minutes=buffer_minutes))
+    busy_ends = [end for _, end in merged]
+
+    window_start = window_start.astimezone(tz)
+    window_end = window_end.astimezone(tz)
+    if not_before is not None:
+        window_start = max(window_start, not_before.astimezone(tz))
+
+    slots: List[datetime] = []
+    day = window_start.date()
+    while day <= window_end.date():
+        hours = opening_hours.get(day.weekday())
+        if hours:
+            day_start = max(tz.localize(datetime.combine(day, hours[0])), window_start)
+            day_end = min(tz.localize(datetime.combine(day, hours[1])), window_end)
+
+            # First busy interval that ends after the day opens.
+            i = bisect_right(busy_ends, day_start)
+            cursor = day_start
+            while cursor < day_end:
+                gap_end = day_end
+                if i < len(merged) and merged[i][0] < day_end:
+                    gap_end = min(day_end, merged[i][0])
+
+                start = _align_up(cursor, granularity)
+                while start + duration <= gap_end:
+                    slots.append(start)
+                    start += granularity
+
+                if gap_end >= day_end:
+                    break
+                cursor = max(cursor, merged[i][1])
+                i += 1
+        day += timedelta(days=1)
+    return slots
+
+
+def rank_slots(slots: List[datetime], preferred: Optional[datetime], limit: int) -> List[datetime]:
+    """
+    Picks the slots to offer: the closest ones to the preferred time when given,
+    otherwise the earliest ones. The result is returned in chronological order.
+    """
+    if preferred is not None:
+        chosen = sorted(slots, key=lambda slot: abs((slot - preferred).total_seconds()))[:limit]
+    else:
+        chosen = slots[:limit]
+    return sorted(chosen)
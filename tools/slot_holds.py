@@ -0,0 +1,140 @@
+import time
+from datetime import datetime
+from typing import Iterable, List
+
+import pytz
+from redis.asyncio import Redis
+
+from api.db.cache import redis_pool
+from core.config import get_settings
+from core.metrics import metrics
+from tools.slot_engine import Interval
+
+settings = get_settings()
+
+# Each doctor has one hash of holds: field "start|end" (epoch seconds), value
+# "expires_at_ms|conversation_id". The expiry goes first because conversation IDs come from
+# the client and may contain "|"; both sides split on the first one. Expired (or unreadable)
+# holds are swept whenever the hash is touched.
+_SCAN_HOLDS = """
+local key, conversation, now = KEYS[1], ARGV[1], tonumber(ARGV[2])
+local foreign, own = {}, {}
+local entries = redis.call('HGETALL', key)
+for i = 1, #entries, 2 do
+    local field, value = entries[i], entries[i + 1]
+    local value_sep = string.find(value, '|', 1, true)
+    local expires = value_sep and tonumber(string.sub(value, 1, value_sep - 1))
+    local owner = value_sep and string.sub(value, value_sep + 1)
+    if not expires or expires <= now then
+        redis.call('HDEL', key, field)
+    elseif owner == conversation then
+        table.insert(own, field)
+    else
+        local field_sep = string.find(field, '|', 1, true)
+        table.insert(foreign, {tonumber(string.sub(field, 1, field_sep - 1)), tonumber(string.sub(field, field_sep + 1))})
+    end
+end
+"""
+
+# ARGV: conversation_id, now_ms, ttl_ms, mode ("replace" drops the conversation's other
+# holds at this doctor, "add" keeps them), then start/end pairs. Returns the held starts.
+_HOLD_SCRIPT = _SCAN_HOLDS + """
+local ttl, mode = tonumber(ARGV[3]), ARGV[4]
+if mode == 'replace' then
+    for _, field in ipairs(own) do
+        redis.call('HDEL', key, field)
+    end
+end
+local held = {}
+for i = 5, #ARGV, 2 do
+    local slot_start, slot_end = tonumber(ARGV[i]), tonumber(ARGV[i + 1])
+    local free = true
+    for _, hold in ipairs(foreign) do
+        if slot_start < hold[2] and hold[1] < slot_end then
+            free = false
+            break
+        end
+    end
+    if free then
+        redis.call('HSET', key, ARGV[i] .. '|' .. ARGV[i + 1], (now + ttl) .. '|' .. conversation)
+        table.insert(held, ARGV[i])
+    end
+end
+if redis.call('HLEN', key) > 0 then
+    redis.call('PEXPIRE', key, ttl)
+end
+return held
+"""
+
+_RELEASE_SCRIPT = _SCAN_HOLDS + """
+for _, field in ipairs(own) do
+    redis.call('HDEL', key, field)
+end
+return #own
+"""
+
+
+class SlotHoldStore:
+    """
+    Short-lived slot reservations that keep two conversations from being offered, and
+    then booking, the same slot while the patient is still confirming details.
+
+    Holds are checked and written atomically by Lua scripts, so concurrent conversations
+    can never both hold overlapping times at the same doctor.
+    """
+
+    def __init__(self, redis: Redis, ttl_seconds: int):
+        self.redis = redis
+        self.ttl_ms = ttl_seconds * 1000
+        self._hold = redis.register_script(_HOLD_SCRIPT)
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def _key(doctor_email: str) -> str:
+        return f"slot_holds:{doctor_email}"
+
+    async def held_by_others(self, doctor_email: str, conversation_id: str) -> List[Interval]:
+        """Returns the times other conversations currently hold at a doctor."""
+        entries = await self.redis.hgetall(self._key(doctor_email))
+        now_ms = time.time() * 1000
+        intervals = []
+        for field, value in entries.items():
+            expires_ms, _, owner = value.partition("|")
+            try:
+                active = float(expires_ms) > now_ms
+            except ValueError:
+                continue  # Unreadable (e.g. an older format); the next script run sweeps it
+            if owner != conversation_id and active:
+                start, end = field.split("|", 1)
+                intervals.append((datetime.fromtimestamp(int(start), pytz.utc), datetime.fromtimestamp(int(end), pytz.utc)))
+        return intervals
+
+    async def hold(self, doctor_email: str, conversation_id: str, slots: Iterable[Interval], replace: bool = True) -> List[datetime]:
+        """
+        Holds the given slots for a conversation, skipping any that overlap another
+        conversation's hold. Returns the start times that were held.
+        """
+        args = [conversation_id, int(time.time() * 1000), self.ttl_ms, "replace" if replace else "add"]
+        starts = {}
+        for start, end in slots:
+            args += [int(start.timestamp()), int(end.timestamp())]
+            starts[str(int(start.timestamp()))] = start
+        held = await self._hold(keys=[self._key(doctor_email)], args=args)
+        metrics.incr("slot_holds_requested", len(starts))
+        metrics.incr("slot_holds_conflicts", len(starts) - len(held))
+        return [starts[start] for start in held]
+
+    async def claim(self, doctor_email: str, conversation_id: str, start: datetime, end: datetime) -> bool:
+        """
+        Confirms a conversation may book this time: True if it is free or already held by
+        the conversation (the hold is refreshed), False if another conversation holds it.
+        """
+        held = await self.hold(doctor_email, conversation_id, [(start, end)], replace=False)
+        return bool(held)
+
+    async def release(self, doctor_email: str, conversation_id: str) -> int:
+        """Drops every hold the conversation has at a doctor, e.g. once it has booked."""
+        return await self._release(keys=[self._key(doctor_email)], args=[conversation_id, int(time.time() * 1000)])
+
+
+slot_holds = SlotHoldStore(redis_pool, settings.SLOT_HOLD_TTL_SECONDS)